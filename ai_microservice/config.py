@@ -1,6 +1,6 @@
 from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List, Union
+from typing import List, Optional, Union
 from functools import lru_cache
 
 class Settings(BaseSettings):
@@ -16,6 +16,43 @@ class Settings(BaseSettings):
     # CORS - Accepts comma-separated list of origins or "*" for all
     CORS_ORIGINS: Union[str, List[str]] = "*"
     
+    # Uploads - Size limit and in-memory spool threshold (bytes)
+    MAX_UPLOAD_BYTES: int = 100 * 1024 * 1024
+    UPLOAD_SPOOL_MEMORY_BYTES: int = 1024 * 1024
+    
+    # Admission control - Concurrent requests, queued requests and the longest
+    # expected queue wait (seconds) before new requests are shed with a 503
+    MAX_CONCURRENT_REQUESTS: int = 4
+    MAX_QUEUED_REQUESTS: int = 16
+    MAX_QUEUE_WAIT_SECONDS: float = 30.0
+    
+    # Training - Wall-clock budget for model fitting, unset for no limit
+    TRAINING_TIME_BUDGET_SECONDS: Optional[float] = None
+    
+    # Sampling - Uploads with at least SAMPLING_MIN_ROWS rows train on a
+    # stratified sample that grows until validation accuracy plateaus
+    SAMPLING_MIN_ROWS: int = 50000
+    SAMPLING_INITIAL_SIZE: int = 1000
+    SAMPLING_GROWTH_FACTOR: float = 2.0
+    SAMPLING_TOLERANCE: float = 0.005
+    
+    # Profiling - Rows per CSV chunk, quantile sketch size and the most
+    # distinct target labels counted individually
+    PROFILE_CHUNK_ROWS: int = 50000
+    PROFILE_SKETCH_SIZE: int = 256
+    PROFILE_MAX_CLASSES: int = 1000
+    
+    # Model comparison - Default candidates (hidden layer sizes), worker
+    # processes, and the most candidates, layers and units per layer accepted
+    COMPARE_CANDIDATES: List[str] = ["10,5", "32", "64,32", "128,64,32"]
+    COMPARE_MAX_WORKERS: int = 4
+    COMPARE_MAX_CANDIDATES: int = 8
+    COMPARE_MAX_LAYERS: int = 4
+    COMPARE_MAX_LAYER_SIZE: int = 512
+    
+    # Rows per predict_proba call when scoring an upload
+    PREDICT_BATCH_SIZE: int = 10000
+    
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
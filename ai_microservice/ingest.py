@@ -0,0 +1,50 @@
+"""
+Upload ingestion for the CSV analysis service.
+
+Starlette already spools every uploaded file into a ``SpooledTemporaryFile``
+while it parses the multipart form: small files stay in memory and larger
+ones roll over to disk (``UPLOAD_SPOOL_MEMORY_BYTES``, see ``main``). pandas
+parses straight from that binary file, so the upload is neither copied
+again nor read into memory with ``await file.read()``, and only the parsed
+DataFrame is held in full.
+
+The request body limit is enforced before the form is parsed, by
+``admission.AdmissionControlMiddleware`` (``Content-Length`` up front, then
+a running count in the receive stream). ``open_upload`` only checks the size
+of the file part itself.
+"""
+import logging
+import os
+from typing import BinaryIO
+
+from fastapi import HTTPException, UploadFile, status
+
+logger = logging.getLogger(__name__)
+
+
+def open_upload(file: UploadFile, max_bytes: int) -> BinaryIO:
+    """
+    Return the upload's spooled binary file, positioned at its start.
+
+    Args:
+        file: The uploaded file
+        max_bytes: Maximum accepted file size in bytes
+
+    Returns:
+        Starlette's spooled file for the upload. Closing it early is safe.
+
+    Raises:
+        HTTPException: 413 if the file exceeds ``max_bytes``
+    """
+    size = file.size
+    if size is None:
+        size = file.file.seek(0, os.SEEK_END)
+    if size > max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds the maximum upload size of {max_bytes} bytes"
+        )
+
+    file.file.seek(0)
+    logger.info(f"Reading upload {file.filename} ({size} bytes)")
+    return file.file
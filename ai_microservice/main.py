@@ -1,7 +1,12 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from starlette.formparsers import MultiPartParser
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Union, BinaryIO
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 import pandas as pd
 import numpy as np
@@ -10,6 +15,18 @@ from io import StringIO
 import logging
 
 from config import get_settings
+from admission import AdmissionController, AdmissionControlMiddleware
+from ingest import open_upload
+from profiling import DatasetProfile
+from training import (
+    train_with_budget,
+    train_with_sampling,
+    predict_proba_in_batches,
+    create_comparison_pool,
+    prepare_comparison,
+    submit_comparison,
+    pick_winner
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,13 +35,39 @@ logger = logging.getLogger(__name__)
 # Initialize settings
 settings = get_settings()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One process pool for /compare-models, shared by all requests
+    app.state.comparison_pool = create_comparison_pool(settings.COMPARE_MAX_WORKERS)
+    try:
+        yield
+    finally:
+        app.state.comparison_pool.shutdown(wait=False, cancel_futures=True)
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
     description="A microservice for analyzing CSV files with a neural network",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
+)
+
+# Uploaded files above this size are spooled to disk while the form is parsed
+MultiPartParser.spool_max_size = settings.UPLOAD_SPOOL_MEMORY_BYTES
+
+# Admission control - Limit concurrent work and shed load with 503 + Retry-After.
+# Added before CORS so that rejections still carry CORS headers.
+admission = AdmissionController(
+    max_concurrency=settings.MAX_CONCURRENT_REQUESTS,
+    max_queue=settings.MAX_QUEUED_REQUESTS,
+    max_queue_wait=settings.MAX_QUEUE_WAIT_SECONDS
+)
+app.add_middleware(
+    AdmissionControlMiddleware,
+    controller=admission,
+    max_body_bytes=settings.MAX_UPLOAD_BYTES
 )
 
 # Add CORS middleware
@@ -41,6 +84,19 @@ class AnalysisResult(BaseModel):
     predictions: List[float]
     metadata: Dict[str, Any]
 
+class ProfileResult(BaseModel):
+    rows: int
+    target: str
+    columns: Dict[str, Dict[str, Any]]
+    target_null_count: int
+    class_distribution: Dict[str, int]
+    other_class_count: int
+
+class ComparisonResult(BaseModel):
+    candidates: List[Dict[str, Any]]
+    winner: Dict[str, Any]
+    metadata: Dict[str, Any]
+
 # Dummy neural network model
 def train_dummy_model(X: np.ndarray, y: np.ndarray) -> MLPClassifier:
     """Train a simple neural network model."""
@@ -52,11 +108,28 @@ def train_dummy_model(X: np.ndarray, y: np.ndarray) -> MLPClassifier:
     model.fit(X, y)
     return model
 
-def process_csv(file_content: str) -> Dict[str, Any]:
-    """Process CSV file and return predictions."""
+def process_csv(
+    file_content: Union[str, BinaryIO],
+    time_budget: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Process CSV file and return predictions.
+
+    ``file_content`` is either the decoded CSV text or a binary file
+    positioned at its start (see ``ingest.open_upload``).
+
+    Uploads with at least ``SAMPLING_MIN_ROWS`` rows are trained on an
+    adaptively grown stratified sample (``training.train_with_sampling``).
+    Otherwise, when ``time_budget`` is set, the model is trained with
+    ``training.train_with_budget``. Training metadata is included in the
+    response, along with the number of rows the model was fitted on.
+    """
     try:
         # Read CSV into DataFrame
-        df = pd.read_csv(StringIO(file_content))
+        if isinstance(file_content, str):
+            df = pd.read_csv(StringIO(file_content))
+        else:
+            df = pd.read_csv(file_content, encoding='utf-8')
         
         # Simple preprocessing
         # Assuming last column is the target and others are features
@@ -64,18 +137,40 @@ def process_csv(file_content: str) -> Dict[str, Any]:
         y = df.iloc[:, -1].values
         
         # Train a simple model (in production, you'd load a pre-trained model)
-        model = train_dummy_model(X, y)
+        training_metadata = None
+        sample_size = len(X)
+        if len(X) >= settings.SAMPLING_MIN_ROWS:
+            model, training_metadata = train_with_sampling(
+                X, y,
+                initial_size=settings.SAMPLING_INITIAL_SIZE,
+                growth_factor=settings.SAMPLING_GROWTH_FACTOR,
+                tolerance=settings.SAMPLING_TOLERANCE,
+                time_budget=time_budget
+            )
+            sample_size = training_metadata["sample_size"]
+        elif time_budget:
+            model, training_metadata = train_with_budget(X, y, time_budget)
+            sample_size = training_metadata["train_size"]
+        else:
+            model = train_dummy_model(X, y)
+        
+        # Make predictions on every row (here we're just using the training data for demo)
+        predictions = predict_proba_in_batches(
+            model, X, settings.PREDICT_BATCH_SIZE
+        )[:, 1].tolist()
         
-        # Make predictions (here we're just using the training data for demo)
-        predictions = model.predict_proba(X)[:, 1].tolist()
+        metadata = {
+            "samples_processed": len(X),
+            "sample_size": sample_size,
+            "features_used": X.shape[1],
+            "model_type": "MLPClassifier"
+        }
+        if training_metadata:
+            metadata["training"] = training_metadata
         
         return {
             "predictions": predictions,
-            "metadata": {
-                "samples_processed": len(X),
-                "features_used": X.shape[1],
-                "model_type": "MLPClassifier"
-            }
+            "metadata": metadata
         }
     except Exception as e:
         logger.error(f"Error processing CSV: {str(e)}")
@@ -86,12 +181,23 @@ def process_csv(file_content: str) -> Dict[str, Any]:
 
 # Single endpoint for CSV analysis
 @app.post("/analyze-csv", response_model=AnalysisResult)
-async def analyze_csv(file: UploadFile = File(...)) -> AnalysisResult:
+async def analyze_csv(
+    file: UploadFile = File(...),
+    time_budget: Optional[float] = Query(
+        None,
+        gt=0,
+        description="Training time budget in seconds. Defaults to TRAINING_TIME_BUDGET_SECONDS."
+    )
+) -> AnalysisResult:
     """
     Analyze a CSV file using a neural network.
     
     The CSV should have features in all columns except the last one,
     which will be treated as the target variable.
+    
+    If a time budget is given (or configured), training stops early once
+    the training loss converges or the deadline passes, and the epoch with
+    the best validation accuracy is used for the predictions.
     """
     if not file.filename.endswith('.csv'):
         raise HTTPException(
@@ -100,9 +206,17 @@ async def analyze_csv(file: UploadFile = File(...)) -> AnalysisResult:
         )
     
     try:
-        content = await file.read()
-        result = process_csv(content.decode('utf-8'))
+        # Parse Starlette's spooled upload instead of holding raw and decoded copies in memory
+        with open_upload(file, settings.MAX_UPLOAD_BYTES) as spooled:
+            # Train off the event loop so /health stays responsive
+            result = await run_in_threadpool(
+                process_csv,
+                spooled,
+                time_budget=time_budget or settings.TRAINING_TIME_BUDGET_SECONDS
+            )
         return AnalysisResult(**result)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in analyze_csv: {str(e)}")
         raise HTTPException(
@@ -110,11 +224,173 @@ async def analyze_csv(file: UploadFile = File(...)) -> AnalysisResult:
             detail=f"An error occurred while processing the file: {str(e)}"
         )
 
+def profile_csv_file(file_content: BinaryIO, target: Optional[str] = None) -> DatasetProfile:
+    """Summarize a binary CSV file in one pass of PROFILE_CHUNK_ROWS-row chunks."""
+    profile = DatasetProfile(target, settings.PROFILE_SKETCH_SIZE, settings.PROFILE_MAX_CLASSES)
+    for chunk in pd.read_csv(
+        file_content,
+        encoding='utf-8',
+        chunksize=settings.PROFILE_CHUNK_ROWS
+    ):
+        profile.update(chunk)
+    return profile
+
+# Dataset profiling endpoint
+@app.post("/profile-csv", response_model=ProfileResult)
+async def profile_csv(
+    file: UploadFile = File(...),
+    target: Optional[str] = Query(
+        None,
+        description="Target column name. Defaults to the last column."
+    )
+) -> ProfileResult:
+    """
+    Compute column statistics for a CSV file without training a model.
+    
+    The file is read in chunks of PROFILE_CHUNK_ROWS rows and summarized in
+    a single pass, so memory use does not grow with the file size. Numeric
+    columns report count, mean, variance, min/max, null counts and
+    approximate quantiles; the target column reports its class distribution,
+    capped at PROFILE_MAX_CLASSES labels.
+    """
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(
+            status_code=400,
+            detail="Only CSV files are supported"
+        )
+    
+    try:
+        with open_upload(file, settings.MAX_UPLOAD_BYTES) as spooled:
+            # Parse off the event loop so /health stays responsive
+            profile = await run_in_threadpool(profile_csv_file, spooled, target)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error profiling CSV: {str(e)}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Error profiling CSV: {str(e)}"
+        )
+    
+    return ProfileResult(**profile.to_dict())
+
+def load_comparison_split(file_content: BinaryIO) -> Tuple[Dict[str, np.ndarray], int, int]:
+    """Parse a binary CSV file and split it for comparison; returns the split, rows and features."""
+    df = pd.read_csv(file_content, encoding='utf-8')
+    X = df.iloc[:, :-1].values
+    y = df.iloc[:, -1].values
+    return prepare_comparison(X, y), X.shape[0], X.shape[1]
+
+def parse_architecture(spec: str) -> Tuple[int, ...]:
+    """
+    Parse a hidden layer spec such as "64,32" into (64, 32).
+    
+    Raises:
+        ValueError: If the spec is malformed, or has more than COMPARE_MAX_LAYERS
+            layers or a layer larger than COMPARE_MAX_LAYER_SIZE
+    """
+    try:
+        layers = tuple(int(size) for size in spec.split(","))
+    except ValueError:
+        raise ValueError(f"Invalid architecture '{spec}': expected comma-separated layer sizes")
+    if not layers or any(size <= 0 for size in layers):
+        raise ValueError(f"Invalid architecture '{spec}': layer sizes must be positive")
+    if len(layers) > settings.COMPARE_MAX_LAYERS:
+        raise ValueError(f"Invalid architecture '{spec}': at most {settings.COMPARE_MAX_LAYERS} layers")
+    if max(layers) > settings.COMPARE_MAX_LAYER_SIZE:
+        raise ValueError(f"Invalid architecture '{spec}': at most {settings.COMPARE_MAX_LAYER_SIZE} units per layer")
+    return layers
+
+# Model comparison endpoint
+@app.post("/compare-models", response_model=ComparisonResult)
+async def compare_models(
+    file: UploadFile = File(...),
+    candidates: Optional[List[str]] = Query(
+        None,
+        max_length=settings.COMPARE_MAX_CANDIDATES,
+        description="Hidden layer sizes per candidate, e.g. ?candidates=10,5&candidates=64,32. "
+                    "Defaults to COMPARE_CANDIDATES; at most COMPARE_MAX_CANDIDATES."
+    )
+) -> ComparisonResult:
+    """
+    Fit several MLP architectures on the same data and compare them.
+    
+    The CSV is parsed and split into train/validation sets once; the
+    candidates are then fitted concurrently in the service's process pool,
+    reading those matrices from shared memory. Each candidate reports validation accuracy, fit time and
+    prediction latency, and the most accurate one is returned as the winner.
+    
+    Candidate lists and architectures over the COMPARE_MAX_* limits are
+    rejected with a 422, so one request cannot tie up the shared pool.
+    """
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(
+            status_code=400,
+            detail="Only CSV files are supported"
+        )
+    
+    try:
+        architectures = [
+            parse_architecture(spec)
+            for spec in (candidates or settings.COMPARE_CANDIDATES)
+        ]
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    try:
+        with open_upload(file, settings.MAX_UPLOAD_BYTES) as spooled:
+            # Parse and split off the event loop so /health stays responsive
+            split, rows, features = await run_in_threadpool(load_comparison_split, spooled)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading CSV for comparison: {str(e)}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Error processing CSV: {str(e)}"
+        )
+    
+    pool = app.state.comparison_pool
+    block, futures = None, []
+    try:
+        # A pool that is already broken raises here rather than in a future
+        block, futures = submit_comparison(pool, split, architectures)
+        # Wait on the pool without blocking the event loop
+        results = await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+    except Exception as e:
+        for future in futures:
+            future.cancel()
+        if isinstance(e, BrokenProcessPool) and app.state.comparison_pool is pool:
+            # A worker died (e.g. out of memory); later requests get a fresh pool
+            app.state.comparison_pool = create_comparison_pool(settings.COMPARE_MAX_WORKERS)
+            pool.shutdown(wait=False, cancel_futures=True)
+        logger.error(f"Error comparing models: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"An error occurred while comparing models: {str(e)}"
+        )
+    finally:
+        if block is not None:
+            block.close()
+            block.unlink()
+    
+    return ComparisonResult(
+        candidates=results,
+        winner=pick_winner(results),
+        metadata={
+            "samples_processed": rows,
+            "features_used": features,
+            "model_type": "MLPClassifier",
+            "train_size": len(split["y_train"]),
+            "validation_size": len(split["y_val"])
+        }
+    )
+
 # Health check endpoint
 @app.get("/health")
-async def health_check() -> Dict[str, str]:
-    """Health check endpoint for monitoring"""
-    return {"status": "healthy"}
+async def health_check() -> Dict[str, Any]:
+    """Health check endpoint for monitoring, including current in-flight work"""
+    return {"status": "healthy", "load": admission.stats()}
 
 # Root endpoint with service information
 @app.get("/")
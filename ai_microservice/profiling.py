@@ -0,0 +1,278 @@
+"""
+Single-pass dataset profiling for the CSV analysis service.
+
+Statistics are accumulated chunk by chunk in fixed-size, mergeable state:
+
+- ``RunningMoments``: count, mean, variance, min and max (Welford, with
+  Chan's pairwise update for whole chunks)
+- ``QuantileSketch``: a KLL-style compactor sketch for approximate quantiles
+- ``DatasetProfile``: per-column moments, sketches and null counts, plus the
+  class distribution of the target column, capped at ``max_classes``
+  distinct labels so a continuous target cannot grow it to one entry per row
+
+Every class has a ``merge`` method, so chunks can be profiled by separate
+workers and the partial profiles combined afterwards.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Quantiles reported for every numeric column
+DEFAULT_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+# Distinct target labels counted individually; later ones share one bucket
+DEFAULT_MAX_CLASSES = 1000
+
+
+class RunningMoments:
+    """Streaming count, mean, variance, min and max of a numeric column."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values: np.ndarray) -> None:
+        """Add a batch of non-null values."""
+        if len(values) == 0:
+            return
+        batch = RunningMoments()
+        batch.count = len(values)
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean) ** 2).sum())
+        batch.min = float(values.min())
+        batch.max = float(values.max())
+        self.merge(batch)
+
+    def merge(self, other: "RunningMoments") -> "RunningMoments":
+        """Combine another partial result into this one and return self."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return self
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self) -> Optional[float]:
+        """Sample variance (ddof=1), as pandas reports it."""
+        if self.count < 2:
+            return None
+        return self.m2 / (self.count - 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        empty = self.count == 0
+        return {
+            "count": self.count,
+            "mean": None if empty else self.mean,
+            "variance": self.variance,
+            "min": None if empty else self.min,
+            "max": None if empty else self.max
+        }
+
+
+class QuantileSketch:
+    """
+    Mergeable approximate quantile sketch (KLL-style compactors).
+
+    Level ``h`` holds items of weight ``2**h``. When a level grows past
+    ``k`` items it is sorted and every other item, starting at a random
+    offset, is promoted to the next level. Memory is ``O(k log(n / k))``.
+    """
+
+    def __init__(self, k: int = 256, seed: Optional[int] = None) -> None:
+        self.k = k
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values: np.ndarray) -> None:
+        """Add a batch of non-null values."""
+        if len(values) == 0:
+            return
+        self.levels[0] = np.concatenate((self.levels[0], values.astype(float)))
+        self._compress()
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Combine another sketch into this one and return self."""
+        for height, items in enumerate(other.levels):
+            if height == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[height] = np.concatenate((self.levels[height], items))
+        self._compress()
+        return self
+
+    def _compress(self) -> None:
+        height = 0
+        while height < len(self.levels):
+            items = self.levels[height]
+            if len(items) > self.k:
+                items = np.sort(items)
+                # Keep one item back when the count is odd
+                leftover = items[len(items) - len(items) % 2:]
+                pairs = items[:len(items) - len(leftover)]
+                promoted = pairs[self._rng.integers(2)::2]
+                self.levels[height] = leftover
+                if height + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[height + 1] = np.concatenate(
+                    (self.levels[height + 1], promoted)
+                )
+            height += 1
+
+    def quantiles(self, qs: Sequence[float]) -> Dict[str, Optional[float]]:
+        """Return approximate values for each quantile in ``qs``."""
+        items = np.concatenate(self.levels)
+        if len(items) == 0:
+            return {str(q): None for q in qs}
+        weights = np.concatenate([
+            np.full(len(level), 2.0 ** height)
+            for height, level in enumerate(self.levels)
+        ])
+        order = np.argsort(items, kind="stable")
+        items = items[order]
+        cumulative = np.cumsum(weights[order])
+        ranks = np.searchsorted(cumulative, np.asarray(qs) * cumulative[-1])
+        ranks = np.minimum(ranks, len(items) - 1)
+        return {str(q): float(items[rank]) for q, rank in zip(qs, ranks)}
+
+
+class ColumnProfile:
+    """Profile of a single feature column."""
+
+    def __init__(self, sketch_size: int = 256) -> None:
+        self.null_count = 0
+        self.non_numeric_count = 0
+        self.moments = RunningMoments()
+        self.sketch = QuantileSketch(sketch_size)
+
+    def update(self, column: pd.Series) -> None:
+        nulls = column.isna()
+        numeric = pd.to_numeric(column, errors="coerce")
+        valid = numeric.notna()
+        self.null_count += int(nulls.sum())
+        self.non_numeric_count += int((~nulls & ~valid).sum())
+
+        values = numeric[valid].to_numpy(dtype=float)
+        self.moments.update(values)
+        self.sketch.update(values)
+
+    def merge(self, other: "ColumnProfile") -> "ColumnProfile":
+        self.null_count += other.null_count
+        self.non_numeric_count += other.non_numeric_count
+        self.moments.merge(other.moments)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def to_dict(self, quantiles: Sequence[float]) -> Dict[str, Any]:
+        result = self.moments.to_dict()
+        result["null_count"] = self.null_count
+        result["non_numeric_count"] = self.non_numeric_count
+        result["quantiles"] = self.sketch.quantiles(quantiles)
+        return result
+
+
+class DatasetProfile:
+    """
+    Profile of a whole dataset, built from one or more DataFrame chunks.
+
+    The target column defaults to the last column, matching ``/analyze-csv``.
+    Only the first ``max_classes`` distinct target labels are counted one by
+    one; rows with any other label are counted in ``other_class_count``.
+    """
+
+    def __init__(
+        self,
+        target: Optional[str] = None,
+        sketch_size: int = 256,
+        max_classes: int = DEFAULT_MAX_CLASSES
+    ) -> None:
+        self.target = target
+        self.sketch_size = sketch_size
+        self.max_classes = max_classes
+        self.rows = 0
+        self.columns: Dict[str, ColumnProfile] = {}
+        self.target_null_count = 0
+        self.class_counts: Dict[str, int] = {}
+        self.other_class_count = 0
+
+    def _count_class(self, key: str, count: int) -> None:
+        if key in self.class_counts or len(self.class_counts) < self.max_classes:
+            self.class_counts[key] = self.class_counts.get(key, 0) + count
+        else:
+            self.other_class_count += count
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """Add a DataFrame chunk to the profile."""
+        if self.target is None:
+            self.target = str(chunk.columns[-1])
+        if self.target not in chunk.columns:
+            raise ValueError(f"Target column '{self.target}' not found in CSV")
+
+        self.rows += len(chunk)
+        for name in chunk.columns:
+            if name == self.target:
+                continue
+            if name not in self.columns:
+                self.columns[name] = ColumnProfile(self.sketch_size)
+            self.columns[name].update(chunk[name])
+
+        target = chunk[self.target]
+        self.target_null_count += int(target.isna().sum())
+        for label, count in target.value_counts().items():
+            self._count_class(str(label), int(count))
+
+    def merge(self, other: "DatasetProfile") -> "DatasetProfile":
+        """Combine a profile of other chunks of the same dataset into this one."""
+        if self.target is None:
+            self.target = other.target
+        elif other.target is not None and other.target != self.target:
+            raise ValueError("Cannot merge profiles with different target columns")
+
+        self.rows += other.rows
+        for name, column in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(column)
+            else:
+                self.columns[name] = column
+        self.target_null_count += other.target_null_count
+        for key, count in other.class_counts.items():
+            self._count_class(key, count)
+        self.other_class_count += other.other_class_count
+        return self
+
+    def to_dict(self, quantiles: Sequence[float] = DEFAULT_QUANTILES) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "target": self.target,
+            "columns": {
+                name: column.to_dict(quantiles)
+                for name, column in self.columns.items()
+            },
+            "target_null_count": self.target_null_count,
+            "class_distribution": self.class_counts,
+            "other_class_count": self.other_class_count
+        }
+
+
+def profile_chunk(
+    chunk: pd.DataFrame,
+    target: Optional[str] = None,
+    sketch_size: int = 256,
+    max_classes: int = DEFAULT_MAX_CLASSES
+) -> DatasetProfile:
+    """Profile a single chunk, e.g. in a worker process, for a later ``merge``."""
+    profile = DatasetProfile(target, sketch_size, max_classes)
+    profile.update(chunk)
+    return profile
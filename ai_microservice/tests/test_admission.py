@@ -0,0 +1,136 @@
+# Use absolute imports to avoid module not found errors
+import sys
+import asyncio
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from admission import AdmissionController, AdmissionControlMiddleware
+
+GPU_API_COPY = Path(__file__).parent.parent.parent / "gpu_api" / "utils" / "admission.py"
+
+
+def admission_app(controller: AdmissionController, max_body_bytes: int = 1024):
+    """An app with one slow endpoint behind the admission middleware. Returns the app and its release event."""
+    app = FastAPI()
+    release = asyncio.Event()
+
+    @app.post("/work")
+    async def work(request: Request):
+        await request.body()
+        await release.wait()
+        return {"done": True}
+
+    @app.get("/health")
+    async def health():
+        return controller.stats()
+
+    app.add_middleware(AdmissionControlMiddleware, controller=controller, max_body_bytes=max_body_bytes)
+    return app, release
+
+
+def test_full_queue_sheds_with_retry_after():
+    """
+    Goal: Verify load shedding once the slots and the queue are full.
+    Setup: One slot, one queue place and a 2 second average service time.
+    Action: Send three slow requests, then /health, then release the work.
+    Assertion:
+        1. The third request is shed with a 503 and a Retry-After of the estimated wait.
+        2. The exempt /health path still answers and reports the load.
+        3. The admitted requests complete once released.
+    """
+    controller = AdmissionController(max_concurrency=1, max_queue=1, max_queue_wait=30, initial_service_time=2)
+
+    async def scenario():
+        app, release = admission_app(controller)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://ai") as client:
+            running = asyncio.create_task(client.post("/work", content=b"a"))
+            await asyncio.sleep(0.05)
+            queued = asyncio.create_task(client.post("/work", content=b"b"))
+            await asyncio.sleep(0.05)
+            shed = await client.post("/work", content=b"c")
+            health = await client.get("/health")
+            release.set()
+            return shed, health, await running, await queued
+
+    shed, health, running, queued = asyncio.run(scenario())
+    assert shed.status_code == 503
+    # Two requests ahead (one running, one queued) at 2 seconds each, one slot
+    assert shed.headers["retry-after"] == "4"
+    assert health.status_code == 200
+    assert health.json()["in_flight"] == 1 and health.json()["queued"] == 1
+    assert running.status_code == 200 and queued.status_code == 200
+    assert controller.stats()["shed_total"] == 1
+    assert controller.stats()["in_flight"] == 0
+
+
+def test_expected_wait_beyond_limit_is_shed():
+    """
+    Goal: Verify that requests are shed when the estimated wait is too long, even with queue room.
+    Setup: One slot, a 10 place queue, a 1 second wait limit and a 5 second average service time.
+    Assertion: The second request is rejected straight away instead of queueing.
+    """
+    controller = AdmissionController(max_concurrency=1, max_queue=10, max_queue_wait=1, initial_service_time=5)
+
+    async def scenario():
+        app, release = admission_app(controller)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://ai") as client:
+            running = asyncio.create_task(client.post("/work", content=b"a"))
+            await asyncio.sleep(0.05)
+            shed = await client.post("/work", content=b"b")
+            release.set()
+            await running
+            return shed
+
+    shed = asyncio.run(scenario())
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == "5"
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_oversized_bodies_are_rejected(chunked):
+    """
+    Goal: Verify the body size limit, with and without Content-Length.
+    Action: Send 2 KiB to an app limited to 1 KiB, as one body or as a chunked stream.
+    Assertion: 413, and the slot taken for the chunked request is released.
+    """
+    controller = AdmissionController(max_concurrency=1, max_queue=0, max_queue_wait=1)
+
+    async def chunks():
+        for _ in range(4):
+            yield b"x" * 512
+
+    async def scenario():
+        app, release = admission_app(controller)
+        release.set()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://ai") as client:
+            return await client.post("/work", content=chunks() if chunked else b"x" * 2048)
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 413
+    assert "1024 bytes" in response.json()["detail"]
+    assert controller.stats()["in_flight"] == 0
+
+
+def test_gpu_api_copy_matches():
+    """
+    Goal: Keep gpu_api's copy of the admission module in sync with this tested one.
+    Assertion: The two files are identical apart from their module docstrings.
+    """
+    if not GPU_API_COPY.exists():
+        pytest.skip("gpu_api is not part of this checkout")
+
+    def code(path: Path) -> str:
+        source = path.read_text(encoding="utf-8")
+        return source[source.index('"""', 3) + 3:]
+
+    assert code(GPU_API_COPY) == code(Path(__file__).parent.parent / "admission.py")
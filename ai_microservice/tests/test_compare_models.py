@@ -0,0 +1,138 @@
+# Use absolute imports to avoid module not found errors
+import os
+import sys
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import main
+from training import create_comparison_pool, prepare_comparison, submit_comparison
+
+
+def labelled_data(rows: int = 400, seed: int = 0):
+    """Numeric features with string labels split by a linear boundary."""
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 1, size=(rows, 3))
+    y = np.where(X[:, 0] + X[:, 1] > 1, "rice", "maize").astype(object)
+    return X, y
+
+
+def test_pool_is_reused_across_comparisons():
+    """
+    Goal: Verify that one pool serves several comparisons from shared memory.
+    Setup: A two-worker pool and labelled data.
+    Action: Run two comparisons on the same pool.
+    Assertion:
+        1. Each candidate reports an accuracy computed on the shared split.
+        2. The pool keeps the same worker processes between comparisons.
+    """
+    X, y = labelled_data()
+    split = prepare_comparison(X, y)
+    assert split["X_train"].dtype == np.float64
+    assert set(np.unique(split["y_train"])) == {0, 1}
+
+    pool = create_comparison_pool(2)
+    try:
+        workers = []
+        for _ in range(2):
+            block, futures = submit_comparison(pool, split, [(8,), (16, 8)])
+            try:
+                results = [future.result(timeout=60) for future in futures]
+            finally:
+                block.close()
+                block.unlink()
+            assert [r["hidden_layer_sizes"] for r in results] == [[8], [16, 8]]
+            assert all(0 <= r["accuracy"] <= 1 for r in results)
+            workers.append(set(pool._processes))
+        assert workers[0] == workers[1]
+    finally:
+        pool.shutdown()
+
+
+def test_compare_models_endpoint():
+    """
+    Goal: Verify /compare-models end to end with the pool from the app lifespan.
+    Action: Upload a CSV and compare two candidates; then upload one with a non-numeric feature.
+    Assertion:
+        1. Both candidates are scored and the winner is one of them.
+        2. Split sizes are reported.
+        3. Non-numeric features are rejected with a 400.
+    """
+    X, y = labelled_data(200)
+    rows = "".join(f"{a:.4f},{b:.4f},{c:.4f},{label}\n" for (a, b, c), label in zip(X, y))
+    csv = ("a,b,c,crop\n" + rows).encode()
+
+    with TestClient(main.app) as client:
+        response = client.post(
+            "/compare-models",
+            params={"candidates": ["8", "16,8"]},
+            files={"file": ("data.csv", csv, "text/csv")}
+        )
+        bad = client.post(
+            "/compare-models",
+            files={"file": ("data.csv", b"a,b,crop\nx,1,rice\ny,2,maize\n", "text/csv")}
+        )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["candidates"]) == 2
+    assert body["winner"] in body["candidates"]
+    assert body["metadata"]["train_size"] + body["metadata"]["validation_size"] == 200
+    assert bad.status_code == 400
+
+
+def test_oversized_comparisons_are_rejected():
+    """
+    Goal: Verify that one request cannot queue unbounded work in the shared pool.
+    Action: Ask for too many candidates, too many layers and too wide a layer.
+    Assertion: Each request is rejected with a 422 before any model is fitted.
+    """
+    settings = main.settings
+    csv = b"a,b,crop\n1,2,rice\n2,1,maize\n"
+    too_many = [str(n) for n in range(1, settings.COMPARE_MAX_CANDIDATES + 2)]
+    too_deep = ",".join(["4"] * (settings.COMPARE_MAX_LAYERS + 1))
+    too_wide = str(settings.COMPARE_MAX_LAYER_SIZE + 1)
+
+    with TestClient(main.app) as client:
+        for candidates in (too_many, [too_deep], [too_wide]):
+            response = client.post(
+                "/compare-models",
+                params={"candidates": candidates},
+                files={"file": ("data.csv", csv, "text/csv")}
+            )
+            assert response.status_code == 422, candidates
+
+
+def test_broken_pool_is_replaced_at_submit():
+    """
+    Goal: Verify that a pool broken before the request is replaced, not reused forever.
+    Setup: A worker of the app's pool exits, which breaks the pool.
+    Action: Compare models twice.
+    Assertion:
+        1. The first request fails with a 500 and the app gets a new pool.
+        2. The second request succeeds on the new pool.
+    """
+    X, y = labelled_data(100)
+    rows = "".join(f"{a:.4f},{b:.4f},{c:.4f},{label}\n" for (a, b, c), label in zip(X, y))
+    csv = ("a,b,c,crop\n" + rows).encode()
+
+    with TestClient(main.app) as client:
+        broken = main.app.state.comparison_pool
+        crash = broken.submit(os._exit, 1)
+        try:
+            crash.result(timeout=30)
+        except BrokenProcessPool:
+            pass
+
+        failed = client.post("/compare-models", params={"candidates": ["4"]}, files={"file": ("data.csv", csv, "text/csv")})
+        assert failed.status_code == 500
+        assert main.app.state.comparison_pool is not broken
+
+        recovered = client.post("/compare-models", params={"candidates": ["4"]}, files={"file": ("data.csv", csv, "text/csv")})
+        assert recovered.status_code == 200
@@ -0,0 +1,44 @@
+# Use absolute imports to avoid module not found errors
+import sys
+from pathlib import Path
+from tempfile import SpooledTemporaryFile
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from ingest import open_upload
+
+CSV = b"N,P,K,label\n90,42,43,1\n85,58,41,0\n"
+
+
+def spooled_upload(content: bytes, size=None) -> UploadFile:
+    """An UploadFile as Starlette builds it: spooled, read to the end, size known."""
+    spooled = SpooledTemporaryFile(max_size=16, mode="w+b")
+    spooled.write(content)
+    return UploadFile(spooled, size=size, filename="data.csv")
+
+
+def test_upload_is_read_in_place():
+    """
+    Goal: Verify that uploads are not copied into a second spool.
+    Assertion: The returned file is Starlette's own, rewound to the start.
+    """
+    upload = spooled_upload(CSV, size=len(CSV))
+    with open_upload(upload, max_bytes=1024) as stream:
+        assert stream is upload.file
+        assert stream.read() == CSV
+
+
+@pytest.mark.parametrize("size", [len(CSV), None])
+def test_oversized_file_is_rejected(size):
+    """
+    Goal: Verify the per-file size limit, with and without a known size.
+    Assertion: A file over max_bytes raises 413.
+    """
+    with pytest.raises(HTTPException) as error:
+        open_upload(spooled_upload(CSV, size=size), max_bytes=len(CSV) - 1)
+    assert error.value.status_code == 413
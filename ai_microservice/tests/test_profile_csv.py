@@ -0,0 +1,164 @@
+# Use absolute imports to avoid module not found errors
+import sys
+import asyncio
+import time
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import io
+
+import httpx
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+from profiling import DEFAULT_QUANTILES, DatasetProfile, profile_chunk
+
+CSV = b"N,P,K,label\n" + b"".join(b"%d,%d,%d,%d\n" % (i, i * 2, i % 7, i % 2) for i in range(1000))
+
+
+def test_profile_csv_summarizes_the_upload():
+    """
+    Goal: Verify the /profile-csv endpoint end to end.
+    Assertion: Row count, target and class distribution match the upload.
+    """
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://ai") as client:
+            return await client.post("/profile-csv", files={"file": ("data.csv", CSV, "text/csv")})
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    body = response.json()
+    assert body["rows"] == 1000
+    assert body["target"] == "label"
+    assert body["class_distribution"] == {"0": 500, "1": 500}
+    assert body["other_class_count"] == 0
+
+
+def random_frame(rows: int = 20000, seed: int = 7) -> pd.DataFrame:
+    """Skewed, normal and partly missing features with a three-class target."""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        "skewed": rng.exponential(3.0, rows),
+        "normal": rng.normal(50.0, 10.0, rows),
+        "sparse": rng.normal(0.0, 1.0, rows),
+        "label": rng.integers(0, 3, rows)
+    })
+    frame.loc[rng.random(rows) < 0.1, "sparse"] = np.nan
+    return frame
+
+
+def assert_quantiles_close(values: pd.Series, quantiles: dict, tolerance: float = 0.02) -> None:
+    """Each reported quantile must sit within ``tolerance`` of its rank in the data."""
+    ordered = np.sort(values.dropna().to_numpy())
+    for q in DEFAULT_QUANTILES:
+        rank = np.searchsorted(ordered, quantiles[str(q)], side="right") / len(ordered)
+        assert abs(rank - q) <= tolerance, f"quantile {q} has rank {rank}"
+
+
+def test_streamed_statistics_match_pandas(monkeypatch):
+    """
+    Goal: Verify the chunked, single-pass statistics against pandas.
+    Setup: A 20000-row CSV profiled in chunks of 1500 rows.
+    Assertion:
+        1. Count, mean, variance, min, max and nulls match pandas on the whole file.
+        2. Every quantile is within the sketch's rank error of the true quantile.
+    """
+    frame = random_frame()
+    monkeypatch.setattr(main.settings, "PROFILE_CHUNK_ROWS", 1500)
+    profile = main.profile_csv_file(io.BytesIO(frame.to_csv(index=False).encode())).to_dict()
+
+    assert profile["rows"] == len(frame)
+    for name in ("skewed", "normal", "sparse"):
+        column, expected = profile["columns"][name], frame[name]
+        assert column["count"] == expected.count()
+        assert column["null_count"] == expected.isna().sum()
+        assert column["mean"] == pytest.approx(expected.mean(), rel=1e-9)
+        assert column["variance"] == pytest.approx(expected.var(), rel=1e-9)
+        assert column["min"] == pytest.approx(expected.min())
+        assert column["max"] == pytest.approx(expected.max())
+        assert_quantiles_close(expected, column["quantiles"])
+    assert profile["class_distribution"] == {str(k): int(v) for k, v in frame["label"].value_counts().items()}
+
+
+def test_merged_profiles_equal_a_single_pass():
+    """
+    Goal: Verify that profiles of separate chunks merge into the profile of the whole.
+    Setup: One profile of the whole frame, and one merged from two chunked halves.
+    Assertion: Counts are identical, moments agree to rounding and quantiles to the sketch error.
+    """
+    frame = random_frame()
+    whole = profile_chunk(frame).to_dict()
+
+    first, second = frame.iloc[:7000], frame.iloc[7000:]
+    merged = DatasetProfile()
+    for part in (first, second):
+        partial = DatasetProfile()
+        for start in range(0, len(part), 2000):
+            partial.update(part.iloc[start:start + 2000])
+        merged.merge(partial)
+    merged = merged.to_dict()
+
+    for key in ("rows", "target", "target_null_count", "class_distribution", "other_class_count"):
+        assert merged[key] == whole[key]
+    for name, column in whole["columns"].items():
+        for key in ("count", "null_count", "non_numeric_count", "min", "max"):
+            assert merged["columns"][name][key] == column[key]
+        for key in ("mean", "variance"):
+            assert merged["columns"][name][key] == pytest.approx(column[key], rel=1e-9)
+        assert_quantiles_close(frame[name], merged["columns"][name]["quantiles"])
+
+
+def test_continuous_target_keeps_a_bounded_class_distribution():
+    """
+    Goal: Verify that a high-cardinality target cannot grow the profile per row.
+    Setup: A continuous target with 5000 distinct values, profiled with max_classes=10.
+    Assertion: Ten labels are counted one by one and every other row is in other_class_count.
+    """
+    frame = random_frame(rows=5000)
+    frame["label"] = np.arange(len(frame)) / 7.0
+    profile = DatasetProfile(max_classes=10)
+    for start in range(0, len(frame), 1000):
+        profile.update(frame.iloc[start:start + 1000])
+
+    result = profile.to_dict()
+    assert len(result["class_distribution"]) == 10
+    assert sum(result["class_distribution"].values()) + result["other_class_count"] == len(frame)
+
+
+def test_health_stays_responsive_while_profiling(monkeypatch):
+    """
+    Goal: Verify that profiling runs off the event loop.
+    Setup: Profiling that takes 0.5 seconds of blocking work.
+    Action: Call /health while a profile is running.
+    Assertion: /health answers well before the profile finishes.
+    """
+    real_profile = main.profile_csv_file
+
+    def slow_profile(file_content, target=None):
+        time.sleep(0.5)
+        return real_profile(file_content, target)
+
+    monkeypatch.setattr(main, "profile_csv_file", slow_profile)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://ai") as client:
+            profiling = asyncio.create_task(
+                client.post("/profile-csv", files={"file": ("data.csv", CSV, "text/csv")})
+            )
+            await asyncio.sleep(0.1)
+            started = time.monotonic()
+            health = await client.get("/health")
+            health_seconds = time.monotonic() - started
+            return health, health_seconds, await profiling
+
+    health, health_seconds, profiled = asyncio.run(scenario())
+    assert health.status_code == 200
+    assert health_seconds < 0.2
+    assert profiled.status_code == 200
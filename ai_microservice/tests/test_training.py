@@ -0,0 +1,102 @@
+# Use absolute imports to avoid module not found errors
+import sys
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from training import fit_model, planned_steps, split_validation, stratified_order, train_with_budget, train_with_sampling
+
+
+def separable_data(rows: int, seed: int = 0):
+    """Unscaled features in [0, 100) with a linear class boundary, like raw soil readings."""
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 100, size=(rows, 3))
+    y = (X[:, 0] + X[:, 1] > 100).astype(int)
+    return X, y
+
+
+def test_budgeted_accuracy_matches_unbudgeted():
+    """
+    Goal: Verify that a generous budget does not stop training before the model learns.
+    Setup: A small upload whose validation accuracy stays at chance for many epochs.
+    Action: Train with a 30 second budget and without a budget on the same split.
+    Assertion:
+        1. Budgeted training stops on convergence or max_iter, not the deadline.
+        2. Its validation accuracy is within 0.05 of the unbudgeted fit.
+    """
+    X, y = separable_data(300)
+    model, metadata = train_with_budget(X, y, time_budget=30)
+    X_train, X_val, y_train, y_val = split_validation(X, y)
+    unbudgeted = fit_model(X_train, y_train).score(X_val, y_val)
+
+    assert metadata["stop_reason"] in ("converged", "max_iter")
+    assert metadata["validation_score"] >= unbudgeted - 0.05
+    assert model.score(X_val, y_val) == metadata["validation_score"]
+
+
+def test_budget_stops_training_at_the_deadline():
+    """
+    Goal: Verify the wall-clock bound.
+    Action: Train on a larger upload with a 0.2 second budget.
+    Assertion: Training stops on time_budget shortly after the deadline and still returns a model.
+    """
+    X, y = separable_data(5000)
+    model, metadata = train_with_budget(X, y, time_budget=0.2)
+    assert metadata["stop_reason"] == "time_budget"
+    assert metadata["elapsed_seconds"] < 1.0
+    assert model.predict(X[:5]).shape == (5,)
+
+
+def test_stratified_order_prefixes_keep_class_proportions():
+    """
+    Goal: Verify the sampling order used by train_with_sampling.
+    Assertion: Every prefix holds the classes in about their overall proportion.
+    """
+    y = np.array([0] * 900 + [1] * 100)
+    order = stratified_order(y)
+    for size in (10, 100, 500):
+        assert abs(np.mean(y[order[:size]]) - 0.1) <= 1 / size + 1e-9
+    assert sorted(order) == list(range(len(y)))
+
+
+def test_sampling_splits_the_budget_across_planned_steps():
+    """
+    Goal: Verify that a budget is shared between sampling steps.
+    Setup: 1000 rows sampled from 100 rows doubling each step (five planned steps).
+    Action: Train with a 2 second budget.
+    Assertion:
+        1. The first step gets about a fifth of the budget, not all of it, and learns.
+        2. Running out of budget is reported as time_budget, not as a plateau.
+    """
+    X, y = separable_data(1000)
+    assert planned_steps(100, 900, 2.0) == 5
+
+    _, metadata = train_with_sampling(X, y, initial_size=100, time_budget=2)
+    history = metadata["history"]
+    assert history[0]["budget_seconds"] <= 2 / 5 + 0.01
+    assert all(step["budget_seconds"] > 0.2 for step in history)
+    assert history[0]["validation_score"] > 0.5
+    # A plateau may legitimately come first, but never once the budget is spent
+    assert (metadata["stop_reason"] == "time_budget") == (metadata["elapsed_seconds"] >= 2)
+    assert metadata["elapsed_seconds"] < 3
+
+
+def test_sampling_without_budget_stops_on_plateau_or_exhaustion():
+    """
+    Goal: Verify unbudgeted sampled training.
+    Action: Train on 2000 rows starting from a 200-row sample.
+    Assertion: Samples grow geometrically until accuracy levels off or every row is used.
+    """
+    X, y = separable_data(2000)
+    _, metadata = train_with_sampling(X, y, initial_size=200)
+    sizes = [step["sample_size"] for step in metadata["history"]]
+    assert sizes[:2] == [200, 400][:len(sizes[:2])]
+    assert metadata["stop_reason"] in ("plateau", "exhausted")
+    if metadata["stop_reason"] == "plateau":
+        scores = [step["validation_score"] for step in metadata["history"]]
+        assert abs(scores[-1] - scores[-2]) <= 0.005
+    assert metadata["validation_score"] > 0.8
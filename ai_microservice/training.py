@@ -0,0 +1,481 @@
+"""
+Training helpers for the CSV analysis service.
+
+The default path in ``main.train_dummy_model`` fits until ``max_iter`` with no
+wall-clock bound. The helpers here train incrementally so that work can be
+stopped early and the best model seen so far returned.
+"""
+import copy
+import logging
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+from sklearn.neural_network import MLPClassifier
+from threadpoolctl import threadpool_limits
+
+logger = logging.getLogger(__name__)
+
+# Same architecture as the default model in main.py
+HIDDEN_LAYER_SIZES = (10, 5)
+
+
+def split_validation(
+    X: np.ndarray,
+    y: np.ndarray,
+    validation_fraction: float = 0.1,
+    random_state: int = 42
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Split features and targets into train and validation sets.
+
+    The split is stratified when every class has enough members. Tiny inputs
+    that cannot be split are used as both the train and validation set.
+
+    Returns:
+        X_train, X_val, y_train, y_val
+    """
+    if len(y) < 4:
+        return X, X, y, y
+    try:
+        return train_test_split(
+            X, y,
+            test_size=validation_fraction,
+            stratify=y,
+            random_state=random_state
+        )
+    except ValueError:
+        # A class with a single member (or fewer validation rows than
+        # classes) rules out stratification; fall back to a plain split.
+        return train_test_split(
+            X, y,
+            test_size=validation_fraction,
+            random_state=random_state
+        )
+
+
+def train_with_budget(
+    X: np.ndarray,
+    y: np.ndarray,
+    time_budget: float,
+    max_iter: int = 1000,
+    validation_fraction: float = 0.1,
+    n_iter_no_change: int = 10,
+    tol: float = 1e-4,
+    batch_size: int = 200,
+    random_state: int = 42
+) -> Tuple[MLPClassifier, Dict[str, Any]]:
+    """
+    Train an MLPClassifier under a wall-clock budget.
+
+    The model is fitted one mini-batch at a time with ``partial_fit``. After
+    every epoch it is scored on a held-out validation split and the best
+    snapshot is kept. Training stops on the first of:
+
+    - ``time_budget``: the deadline passed (checked between mini-batches)
+    - ``converged``: the epoch's training loss did not improve by ``tol`` for
+      ``n_iter_no_change`` epochs, the criterion ``MLPClassifier.fit`` uses
+    - ``max_iter``: ``max_iter`` epochs completed
+
+    Validation accuracy only picks the snapshot; it does not stop training.
+    On small uploads it stays at chance level for dozens of epochs before
+    the model starts to separate the classes, so a patience counter on it
+    stopped training far too early.
+
+    Args:
+        X: Feature matrix
+        y: Target vector
+        time_budget: Maximum training time in seconds
+        max_iter: Maximum number of epochs
+        validation_fraction: Fraction of rows held out for validation
+        n_iter_no_change: Patience, in epochs, for convergence
+        tol: Minimum improvement of the loss (or validation score, for the
+            best snapshot) that counts as progress
+        batch_size: Rows per ``partial_fit`` call
+        random_state: Seed for the split, the model and the batch order
+
+    Returns:
+        The best model found and a metadata dict with ``train_size``,
+        ``iterations``, ``best_iteration``, ``stop_reason``,
+        ``elapsed_seconds``, ``time_budget_seconds`` and ``validation_score``.
+    """
+    started = time.monotonic()
+    deadline = started + time_budget
+
+    classes = np.unique(y)
+    X_train, X_val, y_train, y_val = split_validation(
+        X, y, validation_fraction, random_state
+    )
+
+    model = MLPClassifier(
+        hidden_layer_sizes=HIDDEN_LAYER_SIZES,
+        random_state=random_state
+    )
+    rng = np.random.default_rng(random_state)
+
+    best_model = None
+    best_score = -np.inf
+    best_iteration = 0
+    best_loss = np.inf
+    epochs_without_loss_improvement = 0
+    iterations = 0
+    batches_run = 0
+    stop_reason = "max_iter"
+
+    while iterations < max_iter:
+        order = rng.permutation(len(X_train))
+        out_of_time = False
+        epoch_loss = 0.0
+        for start in range(0, len(order), batch_size):
+            # Always run at least one batch so there is a model to return
+            if batches_run and time.monotonic() >= deadline:
+                out_of_time = True
+                break
+            batch = order[start:start + batch_size]
+            model.partial_fit(X_train[batch], y_train[batch], classes=classes)
+            epoch_loss += model.loss_ * len(batch)
+            batches_run += 1
+
+        if out_of_time:
+            stop_reason = "time_budget"
+            break
+
+        iterations += 1
+        score = model.score(X_val, y_val)
+        if score > best_score + tol:
+            best_score = score
+            best_model = copy.deepcopy(model)
+            best_iteration = iterations
+
+        # Mean over the epoch; the last batch's loss alone is too noisy
+        epoch_loss /= len(order)
+        if epoch_loss < best_loss - tol:
+            best_loss = epoch_loss
+            epochs_without_loss_improvement = 0
+        else:
+            epochs_without_loss_improvement += 1
+
+        if epochs_without_loss_improvement >= n_iter_no_change:
+            stop_reason = "converged"
+            break
+        if time.monotonic() >= deadline:
+            stop_reason = "time_budget"
+            break
+
+    if best_model is None:
+        # The deadline hit before the first epoch finished
+        best_model = model
+        best_score = model.score(X_val, y_val)
+
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Budgeted training stopped after {iterations} epochs "
+        f"({stop_reason}, {elapsed:.2f}s)"
+    )
+
+    return best_model, {
+        "train_size": len(X_train),
+        "iterations": iterations,
+        "best_iteration": best_iteration,
+        "stop_reason": stop_reason,
+        "elapsed_seconds": round(elapsed, 4),
+        "time_budget_seconds": time_budget,
+        "validation_score": float(best_score)
+    }
+
+
+def fit_model(
+    X: np.ndarray,
+    y: np.ndarray,
+    random_state: int = 42,
+    hidden_layer_sizes: Tuple[int, ...] = HIDDEN_LAYER_SIZES
+) -> MLPClassifier:
+    """Fit an MLPClassifier to completion, without a time limit."""
+    model = MLPClassifier(
+        hidden_layer_sizes=hidden_layer_sizes,
+        max_iter=1000,
+        random_state=random_state
+    )
+    model.fit(X, y)
+    return model
+
+
+def stratified_order(y: np.ndarray, random_state: int = 42) -> np.ndarray:
+    """
+    Return a row order whose every prefix is approximately stratified.
+
+    Rows are shuffled, then sorted by their relative position within their
+    class. Taking the first ``n`` indices therefore gives a class-proportional
+    sample, every class is present once ``n`` reaches the number of classes,
+    and a larger prefix always contains a smaller one.
+    """
+    rng = np.random.default_rng(random_state)
+    shuffled = rng.permutation(len(y))
+    _, inverse, counts = np.unique(y[shuffled], return_inverse=True, return_counts=True)
+
+    # Position of each row within its class, in shuffled order
+    by_class = np.argsort(inverse, kind="stable")
+    class_starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    within = np.empty(len(y), dtype=np.int64)
+    within[by_class] = np.arange(len(y)) - class_starts[inverse[by_class]]
+
+    fraction = within / counts[inverse]
+    return shuffled[np.argsort(fraction, kind="stable")]
+
+
+def next_sample_size(size: int, total: int, growth_factor: float) -> int:
+    """Pure function returning the sample size of the next sampling step."""
+    return min(max(int(size * growth_factor), size + 1), total)
+
+
+def planned_steps(size: int, total: int, growth_factor: float) -> int:
+    """Pure function counting the sampling steps from ``size`` until all ``total`` rows are used."""
+    steps = 1
+    while size < total:
+        size = next_sample_size(size, total, growth_factor)
+        steps += 1
+    return steps
+
+
+def train_with_sampling(
+    X: np.ndarray,
+    y: np.ndarray,
+    initial_size: int = 1000,
+    growth_factor: float = 2.0,
+    tolerance: float = 0.005,
+    time_budget: Optional[float] = None,
+    validation_fraction: float = 0.1,
+    random_state: int = 42
+) -> Tuple[MLPClassifier, Dict[str, Any]]:
+    """
+    Train on a growing stratified sample until validation accuracy plateaus.
+
+    A validation split is held out first. The model is then fitted on the
+    first ``initial_size`` rows of a stratified order of the remaining rows,
+    and the sample grows by ``growth_factor`` each step. Growth stops when
+    accuracy changes by at most ``tolerance`` between two steps (``plateau``),
+    when the sample covers all training rows (``exhausted``), or when the
+    optional ``time_budget`` runs out (``time_budget``). With a budget, each
+    step trains with ``train_with_budget`` on an equal share of what is left
+    across the steps still planned (``planned_steps``), so time a step does
+    not use rolls over to the later, larger ones. The deadline is checked
+    before the plateau test: two steps cut short by the budget say nothing
+    about whether accuracy has levelled off.
+
+    Returns:
+        The last fitted model and a metadata dict with ``sample_size``,
+        ``validation_score``, ``stop_reason``, ``elapsed_seconds`` and the
+        per-step ``history`` (with each step's ``budget_seconds`` when budgeted).
+    """
+    started = time.monotonic()
+    X_train, X_val, y_train, y_val = split_validation(
+        X, y, validation_fraction, random_state
+    )
+    order = stratified_order(y_train, random_state)
+
+    size = min(max(initial_size, len(np.unique(y_train))), len(order))
+    previous_score = None
+    history = []
+
+    while True:
+        sample = order[:size]
+        step = {"sample_size": size}
+        if time_budget:
+            remaining = max(time_budget - (time.monotonic() - started), 0.0)
+            step["budget_seconds"] = round(remaining / planned_steps(size, len(order), growth_factor), 4)
+            model, _ = train_with_budget(
+                X_train[sample], y_train[sample], step["budget_seconds"],
+                random_state=random_state
+            )
+        else:
+            model = fit_model(X_train[sample], y_train[sample], random_state)
+
+        score = model.score(X_val, y_val)
+        step["validation_score"] = float(score)
+        history.append(step)
+
+        if time_budget and time.monotonic() - started >= time_budget:
+            stop_reason = "time_budget"
+            break
+        if previous_score is not None and abs(score - previous_score) <= tolerance:
+            stop_reason = "plateau"
+            break
+        if size >= len(order):
+            stop_reason = "exhausted"
+            break
+
+        previous_score = score
+        size = next_sample_size(size, len(order), growth_factor)
+
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Sampled training used {size} of {len(X)} rows "
+        f"({stop_reason}, {elapsed:.2f}s)"
+    )
+
+    return model, {
+        "sample_size": size,
+        "validation_score": float(score),
+        "stop_reason": stop_reason,
+        "elapsed_seconds": round(elapsed, 4),
+        "history": history
+    }
+
+
+def predict_proba_in_batches(
+    model: MLPClassifier,
+    X: np.ndarray,
+    batch_size: int = 10000
+) -> np.ndarray:
+    """Run ``predict_proba`` over ``X`` in fixed-size batches to bound peak memory."""
+    if len(X) <= batch_size:
+        return model.predict_proba(X)
+    return np.concatenate([
+        model.predict_proba(X[start:start + batch_size])
+        for start in range(0, len(X), batch_size)
+    ])
+
+
+def _init_comparison_worker() -> None:
+    # One BLAS thread per worker; the pool already provides the parallelism
+    threadpool_limits(1)
+
+
+def create_comparison_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Create the long-lived process pool that fits comparison candidates."""
+    return ProcessPoolExecutor(
+        max_workers=max(1, max_workers),
+        initializer=_init_comparison_worker
+    )
+
+
+# Where each array lives in a shared memory block: offset, shape and dtype
+ArrayLayout = Dict[str, Tuple[int, Tuple[int, ...], str]]
+
+
+def share_arrays(arrays: Dict[str, np.ndarray]) -> Tuple[SharedMemory, ArrayLayout]:
+    """
+    Copy ``arrays`` into a single new shared memory block.
+
+    The caller owns the block and must ``close()`` and ``unlink()`` it once
+    every task using it has finished.
+    """
+    block = SharedMemory(create=True, size=max(1, sum(a.nbytes for a in arrays.values())))
+    layout: ArrayLayout = {}
+    offset = 0
+    for name, array in arrays.items():
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf, offset=offset)
+        view[...] = array
+        layout[name] = (offset, array.shape, array.dtype.str)
+        offset += array.nbytes
+    return block, layout
+
+
+def _attach_arrays(block: SharedMemory, layout: ArrayLayout) -> Dict[str, np.ndarray]:
+    return {
+        name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf, offset=offset)
+        for name, (offset, shape, dtype) in layout.items()
+    }
+
+
+def _score_candidate(
+    arrays: Dict[str, np.ndarray],
+    hidden_layer_sizes: Tuple[int, ...],
+    random_state: int
+) -> Dict[str, Any]:
+    X_train, y_train = arrays["X_train"], arrays["y_train"]
+    X_val, y_val = arrays["X_val"], arrays["y_val"]
+
+    started = time.perf_counter()
+    model = fit_model(X_train, y_train, random_state, hidden_layer_sizes)
+    fit_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    predicted = model.predict(X_val)
+    predict_seconds = time.perf_counter() - started
+
+    return {
+        "hidden_layer_sizes": list(hidden_layer_sizes),
+        "accuracy": float(np.mean(predicted == y_val)),
+        "fit_seconds": round(fit_seconds, 4),
+        "predict_seconds": round(predict_seconds, 6),
+        "predict_latency_ms_per_row": round(predict_seconds * 1000 / max(len(X_val), 1), 6),
+        "iterations": int(model.n_iter_)
+    }
+
+
+def _evaluate_candidate(
+    block_name: str,
+    layout: ArrayLayout,
+    hidden_layer_sizes: Tuple[int, ...],
+    random_state: int
+) -> Dict[str, Any]:
+    block = SharedMemory(name=block_name)
+    try:
+        # The array views must be gone before the block can be closed
+        return _score_candidate(_attach_arrays(block, layout), hidden_layer_sizes, random_state)
+    finally:
+        block.close()
+
+
+def prepare_comparison(
+    X: np.ndarray,
+    y: np.ndarray,
+    validation_fraction: float = 0.2,
+    random_state: int = 42
+) -> Dict[str, np.ndarray]:
+    """
+    Split the data once for all comparison candidates.
+
+    Features are converted to float64 (non-numeric features raise
+    ``ValueError``) and labels to integer codes, so that the split can be
+    placed in shared memory. Accuracy is unaffected by the encoding.
+
+    Returns:
+        ``X_train``, ``X_val``, ``y_train`` and ``y_val`` by name
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    _, codes = np.unique(np.asarray(y), return_inverse=True)
+    X_train, X_val, y_train, y_val = split_validation(
+        X, codes.astype(np.int64), validation_fraction, random_state
+    )
+    return {"X_train": X_train, "X_val": X_val, "y_train": y_train, "y_val": y_val}
+
+
+def submit_comparison(
+    executor: ProcessPoolExecutor,
+    split: Dict[str, np.ndarray],
+    candidates: Sequence[Tuple[int, ...]],
+    random_state: int = 42
+) -> Tuple[SharedMemory, List[Future]]:
+    """
+    Start fitting each candidate architecture in ``executor``.
+
+    The split (see ``prepare_comparison``) is copied into shared memory once
+    and every task only carries the block name and layout, so the matrices
+    are neither pickled per candidate nor re-parsed by the workers.
+
+    Returns:
+        The shared memory block, to be closed and unlinked by the caller
+        once all futures are done, and one future per candidate in the
+        same order.
+    """
+    block, layout = share_arrays(split)
+    try:
+        futures = [
+            executor.submit(_evaluate_candidate, block.name, layout, tuple(candidate), random_state)
+            for candidate in candidates
+        ]
+    except BaseException:
+        block.close()
+        block.unlink()
+        raise
+    return block, futures
+
+
+def pick_winner(results: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Highest validation accuracy wins; ties go to the faster fit."""
+    return max(results, key=lambda result: (result["accuracy"], -result["fit_seconds"]))
@@ -0,0 +1,44 @@
+"""
+Write-behind activity logging.
+
+``crud.create_activity_log`` used to insert, commit and refresh one
+``ActivityLog`` row inside the request. ``ActivityLogger`` instead appends
+the event to a bounded in-memory queue and returns immediately; see
+``write_behind`` for how and when the queue is written out.
+
+Activity logs are best-effort: events are dropped when the queue is full,
+and events still queued when a process is killed are lost.
+"""
+from datetime import datetime
+from typing import Optional
+
+import models
+from config import get_settings
+from write_behind import WriteBehindQueue
+
+
+class ActivityLogger(WriteBehindQueue):
+    """Bounded queue of activity events flushed to the database in batches."""
+
+    model = models.ActivityLog
+    name = "activity log"
+
+    def log(self, user_id: int, action: str) -> bool:
+        """Queue an event. Returns False if it was dropped because the queue is full."""
+        return self.enqueue({"user_id": user_id, "action": action, "timestamp": datetime.utcnow()})
+
+
+_activity_logger: Optional[ActivityLogger] = None
+
+
+def get_activity_logger() -> ActivityLogger:
+    """Return the process-wide activity logger, creating it on first use."""
+    global _activity_logger
+    if _activity_logger is None:
+        settings = get_settings()
+        _activity_logger = ActivityLogger(
+            max_queue=settings.ACTIVITY_LOG_MAX_QUEUE,
+            batch_size=settings.ACTIVITY_LOG_BATCH_SIZE,
+            flush_interval=settings.ACTIVITY_LOG_FLUSH_SECONDS
+        )
+    return _activity_logger
@@ -0,0 +1,339 @@
+"""
+Shared async HTTP client for backend-to-AI-microservice calls.
+
+A single ``httpx.AsyncClient`` is created at application startup and closed
+at shutdown (see the lifespan in ``main.py``). Requests reuse its keep-alive
+connection pool instead of opening a fresh TCP connection per call, and
+never block the event loop.
+
+Requests are spread over the replicas in ``AI_MICROSERVICE_URLS`` by an
+``upstreams.UpstreamPool`` (least outstanding requests, per-replica circuit
+breakers, active health checks). In ``content_hash`` routing mode, requests
+that carry an affinity key (the digest of the uploaded file) are routed by
+consistent hashing with bounded load instead, so repeat uploads reach the
+replica that already has them cached. Buffered requests can optionally be hedged:
+if the first replica has not answered within its recent latency percentile,
+the same request is sent to a second replica and the first answer wins.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from config import get_settings
+from upstreams import Replica, UpstreamPool
+
+logger = logging.getLogger(__name__)
+
+
+# Routing modes
+LEAST_OUTSTANDING = "least_outstanding"
+CONTENT_HASH = "content_hash"
+ROUTING_MODES = (LEAST_OUTSTANDING, CONTENT_HASH)
+
+
+class NoReplicaAvailable(httpx.ConnectError):
+    """Every replica is failing its health checks or has an open circuit."""
+
+
+def content_key(content: bytes) -> str:
+    """Pure function returning the affinity key of an uploaded file."""
+    return hashlib.sha256(content).hexdigest()
+
+
+class AIClient:
+    """
+    Lifespan-managed async client with pool limits and per-phase timeouts.
+
+    Attributes:
+        upstreams: Replicas of the AI microservice and their statistics
+        limits: Connection pool limits
+        timeout: Connect/read/write/pool timeouts
+        in_flight: Requests currently waiting on the AI microservice
+    """
+
+    def __init__(
+        self,
+        upstreams: UpstreamPool,
+        limits: httpx.Limits,
+        timeout: httpx.Timeout,
+        health_check_interval: float = 10.0,
+        health_check_timeout: float = 2.0,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_samples: int = 20,
+        routing_mode: str = LEAST_OUTSTANDING
+    ):
+        if routing_mode not in ROUTING_MODES:
+            raise ValueError(f"Unknown AI routing mode: {routing_mode}")
+        self.upstreams = upstreams
+        self.limits = limits
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.routing_mode = routing_mode
+        self._client: Optional[httpx.AsyncClient] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests_total = 0
+        self.errors_total = 0
+        self.hedged_total = 0
+
+    @property
+    def base_url(self) -> str:
+        return self.upstreams.replicas[0].base_url
+
+    async def start(self) -> None:
+        """Create the underlying client and start health checks. Called from the app lifespan."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+            logger.info(f"AI client started for {[r.base_url for r in self.upstreams.replicas]}")
+        if self._health_task is None and self.health_check_interval > 0:
+            self._health_task = asyncio.create_task(self._run_health_checks())
+
+    async def close(self) -> None:
+        """Stop health checks and close pooled connections. Called from the app lifespan."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("AI client closed")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            # Outside of the lifespan (e.g. scripts or tests without startup)
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        return self._client
+
+    async def check_health(self) -> None:
+        """Probe ``/health`` on every replica and record the result."""
+        async def probe(replica: Replica) -> None:
+            try:
+                response = await self.client.get(
+                    f"{replica.base_url}/health",
+                    timeout=self.health_check_timeout
+                )
+                healthy = response.status_code == 200
+            except httpx.HTTPError:
+                healthy = False
+            if healthy != replica.healthy:
+                logger.warning(f"AI replica {replica.base_url} is now {'healthy' if healthy else 'unhealthy'}")
+            replica.healthy = healthy
+            replica.last_health_check = time.time()
+
+        await asyncio.gather(*(probe(replica) for replica in self.upstreams.replicas))
+
+    async def _run_health_checks(self) -> None:
+        while True:
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.error(f"AI health check failed: {e}")
+            await asyncio.sleep(self.health_check_interval)
+
+    def _choose(self, exclude: List[Replica] = (), affinity_key: Optional[str] = None) -> Replica:
+        if affinity_key is not None and self.routing_mode == CONTENT_HASH:
+            replica = self.upstreams.choose_for_key(affinity_key, exclude)
+        else:
+            replica = self.upstreams.choose(exclude)
+        if replica is None:
+            raise NoReplicaAvailable("No healthy AI microservice replica available")
+        return replica
+
+    def _dispatch(self, replica: Replica, method: str, path: str, **kwargs: Any) -> asyncio.Task:
+        """
+        Start a request to ``replica`` in a task.
+
+        The replica is marked busy before this returns, so a caller that
+        chose it without awaiting in between holds its half-open probe slot
+        and outstanding count. The outcome is recorded when the task
+        finishes, including tasks cancelled before they ever ran.
+        """
+        started = replica.begin()
+        task = asyncio.create_task(
+            self.client.request(method, f"{replica.base_url}{path}", **kwargs)
+        )
+
+        def record(task: asyncio.Task) -> None:
+            if task.cancelled():
+                replica.abandon()
+            elif isinstance(task.exception(), httpx.HTTPError):
+                replica.end(started, success=False)
+            elif task.exception() is not None:
+                replica.abandon()
+            else:
+                replica.end(started, success=task.result().status_code < 500)
+
+        task.add_done_callback(record)
+        return task
+
+    def _hedge_delay(self, replica: Replica) -> Optional[float]:
+        if self.hedge_percentile is None or len(replica.latencies) < self.hedge_min_samples:
+            return None
+        return replica.latency_percentile(self.hedge_percentile)
+
+    async def _send_hedged(
+        self,
+        method: str,
+        path: str,
+        affinity_key: Optional[str] = None,
+        **kwargs: Any
+    ) -> httpx.Response:
+        primary = self._choose(affinity_key=affinity_key)
+        tasks = [self._dispatch(primary, method, path, **kwargs)]
+        try:
+            delay = self._hedge_delay(primary)
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                backup = None if done else self.upstreams.choose(exclude=[primary])
+                if backup is not None:
+                    self.hedged_total += 1
+                    tasks.append(self._dispatch(backup, method, path, **kwargs))
+
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        affinity_key: Optional[str] = None,
+        **kwargs: Any
+    ) -> httpx.Response:
+        """
+        Send a request to an AI replica, tracking pool utilization.
+
+        ``affinity_key`` (see ``content_key``) pins equal uploads to the same
+        replica when the client routes by content hash; it is ignored otherwise.
+        """
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.requests_total += 1
+        try:
+            return await self._send_hedged(method, path, affinity_key, **kwargs)
+        except httpx.HTTPError:
+            self.errors_total += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    async def open_stream(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        """
+        Send a request and return the response with its body still unread.
+
+        Streamed requests are never hedged, since their body can only be
+        read once. The caller must pass the response to ``close_stream``.
+        """
+        # Choose and claim the replica with no await in between
+        replica = self._choose()
+        upstream_request = self.client.build_request(method, f"{replica.base_url}{path}", **kwargs)
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.requests_total += 1
+        started = replica.begin()
+        try:
+            response = await self.client.send(upstream_request, stream=True)
+        except BaseException as e:
+            self.in_flight -= 1
+            if isinstance(e, httpx.HTTPError):
+                self.errors_total += 1
+                replica.end(started, success=False)
+            else:
+                replica.abandon()
+            raise
+        replica.end(started, success=response.status_code < 500)
+        return response
+
+    async def close_stream(self, response: httpx.Response) -> None:
+        """Release a response opened with ``open_stream``."""
+        try:
+            await response.aclose()
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool utilization, request counters and per-replica statistics."""
+        connections = []
+        if self._client is not None:
+            # httpx does not expose its pool; fall back gracefully if that changes
+            pool = getattr(self._client._transport, "_pool", None)
+            connections = list(getattr(pool, "connections", []))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "open_connections": len(connections),
+            "idle_connections": idle,
+            "active_connections": len(connections) - idle,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "hedged_total": self.hedged_total,
+            "routing_mode": self.routing_mode,
+            "replicas": self.upstreams.stats()
+        }
+
+
+def build_ai_client() -> AIClient:
+    """Pure function to build the AI client from settings."""
+    settings = get_settings()
+    urls = [url.strip() for url in settings.AI_MICROSERVICE_URLS.split(",") if url.strip()]
+    return AIClient(
+        upstreams=UpstreamPool(
+            urls or [settings.AI_MICROSERVICE_BASE_URL],
+            failure_threshold=settings.AI_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.AI_BREAKER_RESET_TIMEOUT,
+            vnodes=settings.AI_HASH_VNODES,
+            load_factor=settings.AI_HASH_LOAD_FACTOR
+        ),
+        limits=httpx.Limits(
+            max_connections=settings.AI_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.AI_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.AI_POOL_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(
+            connect=settings.AI_CONNECT_TIMEOUT,
+            read=settings.AI_READ_TIMEOUT,
+            write=settings.AI_WRITE_TIMEOUT,
+            pool=settings.AI_POOL_TIMEOUT
+        ),
+        health_check_interval=settings.AI_HEALTH_CHECK_INTERVAL,
+        health_check_timeout=settings.AI_HEALTH_CHECK_TIMEOUT,
+        hedge_percentile=settings.AI_HEDGE_PERCENTILE or None,
+        routing_mode=settings.AI_ROUTING_MODE
+    )
+
+
+_ai_client: Optional[AIClient] = None
+
+
+def get_ai_client() -> AIClient:
+    """Return the process-wide AI client, creating it on first use."""
+    global _ai_client
+    if _ai_client is None:
+        _ai_client = build_ai_client()
+    return _ai_client
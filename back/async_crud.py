@@ -0,0 +1,120 @@
+"""
+Async counterparts of the ``crud`` functions used on the request path.
+
+Each function mirrors the ``crud`` function of the same name but takes an
+``AsyncSession`` and is awaited, so async routes and dependencies don't
+block the event loop on database round trips. Cache invalidation and
+revocation side effects are the same as in ``crud``, except that cache
+invalidations are awaited until the shared cache has applied them.
+"""
+from datetime import datetime, timedelta
+
+from jose import jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from activity_logger import get_activity_logger
+from cache import ainvalidate_cached_session
+from config import get_settings
+from session_tokens import record_revocation
+
+
+async def get_user(db: AsyncSession, user_id: int):
+    return await db.get(models.User, user_id)
+
+
+async def get_user_by_workos_id(db: AsyncSession, workos_user_id: str):
+    return await db.scalar(select(models.User).where(models.User.workos_user_id == workos_user_id))
+
+
+async def get_session_by_id(db: AsyncSession, session_id: str):
+    """
+    Pure function: Fetch session by internal UUID session ID. Returns the session object or None.
+    """
+    return await db.scalar(select(models.AppSession).where(models.AppSession.id == session_id))
+
+
+async def get_app_session_by_workos_session_id(db: AsyncSession, workos_session_id: str):
+    return await db.scalar(
+        select(models.AppSession).where(models.AppSession.workos_session_id == workos_session_id)
+    )
+
+
+async def get_user_sessions(db: AsyncSession, user_id: int):
+    return (await db.scalars(select(models.AppSession).where(models.AppSession.user_id == user_id))).all()
+
+
+async def invalidate_session(db: AsyncSession, workos_session_id: str = None, session_id: str = None):
+    """
+    Pure function: Invalidate a session by WorkOS session ID or internal session ID. Returns True if deleted.
+    """
+    session = None
+    if session_id:
+        session = await get_session_by_id(db, session_id)
+    elif workos_session_id:
+        session = await get_app_session_by_workos_session_id(db, workos_session_id)
+    if session:
+        await db.delete(session)
+        record_revocation(db, session.id, session.user_id)
+        await db.commit()
+        await ainvalidate_cached_session(session.id)
+        return True
+    return False
+
+
+async def update_session_activity(db: AsyncSession, session_id: str):
+    """
+    Update the activity timestamp for a session.
+    """
+    session = await get_session_by_id(db, session_id)
+    if session:
+        session.updated_at = datetime.utcnow()
+        await db.commit()
+        return True
+    return False
+
+
+async def update_session_tokens(db: AsyncSession, session_id: str, new_tokens: dict):
+    """
+    Pure function: Update access_token, refresh_token, and expires_at for a session by internal session ID. Returns the updated session.
+    """
+    session = await get_session_by_id(db, session_id)
+    if session:
+        session.access_token = new_tokens["access_token"]
+        session.refresh_token = new_tokens["refresh_token"]
+        try:
+            token_payload = jwt.get_unverified_claims(new_tokens["access_token"])
+            session.expires_at = datetime.fromtimestamp(token_payload.get("exp", 0))
+        except Exception:
+            session.expires_at = datetime.utcnow() + timedelta(minutes=15)
+        await db.commit()
+        await db.refresh(session)
+        await ainvalidate_cached_session(session.id)
+        return session
+    return None
+
+
+async def get_session_ids_expiring_between(db: AsyncSession, start: datetime, end: datetime):
+    """
+    Pure function: IDs of active sessions with a refresh token whose access token expires in [start, end).
+    """
+    return (await db.scalars(select(models.AppSession.id).where(
+        models.AppSession.is_active == True,
+        models.AppSession.refresh_token.isnot(None),
+        models.AppSession.expires_at >= start,
+        models.AppSession.expires_at < end
+    ))).all()
+
+
+async def create_activity_log(db: AsyncSession, user_id: int, action: str):
+    """
+    Record a user action; see ``crud.create_activity_log``.
+    """
+    if get_settings().ACTIVITY_LOG_WRITE_BEHIND:
+        return get_activity_logger().log(user_id, action)
+    activity_log = models.ActivityLog(user_id=user_id, action=action)
+    db.add(activity_log)
+    await db.commit()
+    await db.refresh(activity_log)
+    return activity_log
@@ -1,17 +1,19 @@
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Optional
 from fastapi import Depends, HTTPException, Request, Response
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import models
-import crud
+import async_crud
 from config import get_settings
-from database import get_db
-import requests
+from database import get_async_db
+from cache import CachedIdentity, SingleFlight, get_session_cache, get_token_cache
+from jwks import get_jwks_store
+from refresh import get_refresh_coordinator
+from session_tokens import SESSION_TOKEN_COOKIE, get_revocation_list, issue_session_token, verify_session_token
 from jose import jwt
-import json
-from functools import lru_cache
-import workos
 from datetime import timedelta, datetime
+import hashlib
 import os
+import time
 
 settings = get_settings()
 
@@ -26,45 +28,96 @@ if DEBUG_BYPASS_AUTH:
 # Hardcoded user for debug mode
 DEBUG_USER_ID = 1  # Adjust this to match an existing user ID in your database
 
-# WorkOS JWKS URL for token validation
-WORKOS_JWKS_URL = "https://api.workos.com/.well-known/jwks.json"
-
-@lru_cache(maxsize=1)
-def get_workos_jwks() -> Dict[str, Any]:
-    """Fetch and cache WorkOS JWKS (JSON Web Key Set)"""
-    response = requests.get(WORKOS_JWKS_URL)
-    response.raise_for_status()
-    return response.json()
-
-def get_jwk_by_kid(token: str) -> Dict[str, Any]:
-    """Extract the key ID from token header and find the matching JWK"""
-    unverified_header = jwt.get_unverified_header(token)
-    kid = unverified_header.get("kid")
-    if not kid:
-        raise ValueError("No 'kid' in token header")
-        
-    jwks = get_workos_jwks()
-    for jwk in jwks.get("keys", []):
-        if jwk.get("kid") == kid:
-            return jwk
-            
-    raise ValueError(f"No JWK found for kid: {kid}")
+# Sessions this close to expiry bypass the cache so their tokens get refreshed
+SESSION_REFRESH_MARGIN = timedelta(minutes=1)
+
+# Concurrent validations of the same token share one signature check
+_token_validations = SingleFlight()
 
-def validate_workos_token(token: str) -> Dict[str, Any]:
-    """Validate a WorkOS JWT token using JWKS"""
+def _token_digest(token: str) -> str:
+    """Pure function returning the cache key of a token (the token itself is never stored)."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+async def _verify_workos_token(token: str, digest: str) -> Dict[str, Any]:
     try:
-        jwk = get_jwk_by_kid(token)
-        public_key = jwt.algorithms.RSAAlgorithm.from_jwk(json.dumps(jwk))
+        kid = jwt.get_unverified_header(token).get("kid")
+        if not kid:
+            raise ValueError("No 'kid' in token header")
+        public_key = await get_jwks_store().get_key(kid)
         payload = jwt.decode(
             token,
             public_key,
             algorithms=["RS256"],
             audience=settings.WORKOS_CLIENT_ID
         )
-        return payload
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Invalid WorkOS token: {str(e)}")
 
+    # Verified claims stay valid until the token expires
+    exp = payload.get("exp")
+    if exp is not None:
+        get_token_cache().set(digest, payload, ttl=exp - time.time())
+    return payload
+
+async def validate_workos_token(token: str) -> Dict[str, Any]:
+    """
+    Validate a WorkOS JWT token against the shared JWKS key store.
+
+    Verified claims are cached by token digest until the token's exp, so
+    repeat validations skip the signature check.
+    """
+    digest = _token_digest(token)
+    payload = get_token_cache().get(digest)
+    if payload is None:
+        payload = await _token_validations.do(digest, lambda: _verify_workos_token(token, digest))
+    return dict(payload)
+
+# Session cache helpers
+
+def _user_snapshot(user: models.User) -> Dict[str, Any]:
+    """Pure function returning the column values of a user."""
+    return {column.key: getattr(user, column.key) for column in models.User.__table__.columns}
+
+def _session_is_fresh(expires_at: datetime) -> bool:
+    return expires_at is None or expires_at >= datetime.utcnow() + SESSION_REFRESH_MARGIN
+
+async def _get_debug_user(db: AsyncSession) -> models.User:
+    """Return the debug user, from the session cache when possible."""
+    cache = get_session_cache()
+    cache_key = f"debug:{DEBUG_USER_ID}"
+    identity = await cache.aget(cache_key)
+    if identity is not None:
+        return models.User(**identity.user)
+    debug_user = await async_crud.get_user(db, DEBUG_USER_ID)
+    if debug_user:
+        await cache.aset(cache_key, CachedIdentity(debug_user.id, _user_snapshot(debug_user), None))
+    return debug_user
+
+# Stateless session token helpers
+
+def _user_from_session_token(request: Request) -> Optional[models.User]:
+    """
+    Return the user carried by a valid, unrevoked signed session cookie.
+
+    Only the id and role are known; other user fields are left unset.
+    """
+    claims = verify_session_token(request.cookies.get(SESSION_TOKEN_COOKIE), settings.SECRET_KEY)
+    if claims is None or get_revocation_list().is_revoked(claims["sid"]):
+        return None
+    return models.User(id=claims["uid"], is_admin=claims["role"] == models.RoleEnum.admin.value, is_active=True)
+
+def _set_session_token_cookie(response: Response, user: models.User, session_id: str) -> None:
+    role = models.RoleEnum.admin.value if user.is_admin else models.RoleEnum.user.value
+    response.set_cookie(
+        key=SESSION_TOKEN_COOKIE,
+        value=issue_session_token(user.id, session_id, role, settings.SECRET_KEY, settings.SESSION_TOKEN_TTL_SECONDS),
+        max_age=settings.SESSION_TOKEN_TTL_SECONDS,
+        httponly=True,
+        secure=settings.ENVIRONMENT == "production",
+        samesite="lax",
+        path="/"
+    )
+
 # Dependency to get the internal session ID from the cookie
 
 def get_session_id_from_cookie(request: Request) -> str:
@@ -78,55 +131,40 @@ def get_session_id_from_cookie(request: Request) -> str:
         raise HTTPException(status_code=401, detail="Not authenticated: No session cookie.")
     return session_id
 
-async def refresh_token_if_needed(db: Session, session_id: str, payload: Dict[str, Any]) -> Tuple[str, str]:
-    """Check if token needs refresh and refresh if needed"""
-    # Get expiration time
+async def refresh_token_if_needed(db: AsyncSession, workos_session_id: str, payload: Dict[str, Any]) -> Optional[str]:
+    """
+    Return a newer access token if this one is about to expire, else None.
+
+    The refresh goes through the shared coordinator, so concurrent requests
+    for the same session cause at most one WorkOS call, and a session that
+    was already refreshed in the background needs none.
+    """
+    coordinator = get_refresh_coordinator()
     exp = payload.get("exp")
-    if not exp:
-        return None, None
-    
-    # Check if token is about to expire (less than 5 minutes)
-    from datetime import datetime
-    expiration = datetime.fromtimestamp(exp)
-    now = datetime.utcnow()
-    time_left = expiration - now
-    
-    # If more than 5 minutes left, no need to refresh
-    if time_left.total_seconds() > 300:
-        return None, None
-        
-    # Get refresh token from database
-    session = crud.get_app_session_by_workos_session_id(db, session_id)
+    if not exp or not coordinator.needs_refresh(datetime.utcfromtimestamp(exp)):
+        return None
+
+    session = await async_crud.get_app_session_by_workos_session_id(db, workos_session_id)
     if not session or not session.refresh_token:
-        return None, None
-        
+        return None
+
     try:
-        # Refresh token
-        token_response = workos.user_management.refresh_authentication(
-            refresh_token=session.refresh_token,
-            client_id=settings.WORKOS_CLIENT_ID
-        )
-        
-        # Update session with new refresh token
-        crud.update_session_refresh_token(
-            db, 
-            session.id, 
-            token_response["refresh_token"]
-        )
-        
-        return token_response["access_token"], token_response["refresh_token"]
+        tokens = await coordinator.refresh(session.id)
     except Exception:
-        return None, None
+        return None
+    return tokens["access_token"] if tokens else None
 
 # REPLACEMENT for get_current_user
 async def get_current_active_user(
     session_id: str = Depends(get_session_id_from_cookie),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    request: Request = None,
+    response: Response = None
 ) -> models.User:
     # If debug bypass is enabled, return a hardcoded user without validation
     if DEBUG_BYPASS_AUTH:
-        # Get the debug user from the database
-        debug_user = db.query(models.User).filter(models.User.id == DEBUG_USER_ID).first()
+        # Get the debug user from the cache or the database
+        debug_user = await _get_debug_user(db)
         if debug_user:
             return debug_user
         else:
@@ -134,42 +172,49 @@ async def get_current_active_user(
             print(f"⚠️ WARNING: Debug user with ID {DEBUG_USER_ID} not found in database!")
             print("⚠️ Falling back to normal authentication. Please check your DEBUG_USER_ID setting.")
     
+    # Stateless mode: a valid signed session cookie needs no lookup at all
+    if settings.STATELESS_SESSIONS and request is not None:
+        token_user = _user_from_session_token(request)
+        if token_user is not None:
+            return token_user
+
+    # Serve the resolved user from the cache unless the session needs a refresh.
+    # Logout, token refresh and user updates invalidate entries in crud.
+    cache = get_session_cache()
+    identity = await cache.aget(session_id)
+    if identity is not None and _session_is_fresh(identity.session_expires_at):
+        return models.User(**identity.user)
+
     # Normal authentication flow
-    session = crud.get_session_by_id(db, session_id)
+    session = await async_crud.get_session_by_id(db, session_id)
     if not session or not session.is_active:
         raise HTTPException(status_code=401, detail="Invalid or inactive session.")
 
     # Check if the access token is expired or close to expiring
-    if session.expires_at < datetime.utcnow() + timedelta(minutes=1):
+    expires_at = session.expires_at
+    if not _session_is_fresh(expires_at):
         try:
-            # Token needs refresh.
-            new_tokens = await refresh_workos_token(session.refresh_token)
-            # Update the session in the database with the new tokens
-            crud.update_session_tokens(db, session.id, new_tokens)
+            # Token needs refresh; concurrent requests share one WorkOS call
+            new_tokens = await get_refresh_coordinator().refresh(session.id)
+            if new_tokens is None:
+                raise ValueError("Session no longer exists")
+            expires_at = new_tokens["expires_at"]
         except Exception as e:
             # Refresh failed, invalidate the session and force re-login
-            crud.invalidate_session(db, session_id=session.id)
+            await async_crud.invalidate_session(db, session_id=session.id)
             raise HTTPException(status_code=401, detail=f"Session expired, refresh failed: {str(e)}")
 
     # At this point, the session is valid and the access token is fresh.
-    user = db.query(models.User).filter(models.User.id == session.user_id).first()
+    user = await async_crud.get_user(db, session.user_id)
     if not user or not user.is_active:
         raise HTTPException(status_code=401, detail="User not found or inactive.")
+    await cache.aset(session_id, CachedIdentity(user.id, _user_snapshot(user), expires_at))
+    if settings.STATELESS_SESSIONS and response is not None:
+        _set_session_token_cookie(response, user, session.id)
     return user
 
-# Helper: refresh WorkOS token using refresh_token
-async def refresh_workos_token(refresh_token: str) -> dict:
-    try:
-        token_response = workos.user_management.refresh_authentication(
-            refresh_token=refresh_token,
-            client_id=settings.WORKOS_CLIENT_ID
-        )
-        return token_response
-    except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Token refresh failed: {str(e)}")
-
 # --- Backward compatibility export ---
-async def get_current_user(request: Request, response: Response, db: Session = Depends(get_db)) -> models.User:
+async def get_current_user(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)) -> models.User:
     """
     Dependency function to get the current user.
     It validates the session token from the cookie against WorkOS.
@@ -177,8 +222,8 @@ async def get_current_user(request: Request, response: Response, db: Session = D
     """
     # If debug bypass is enabled, return a hardcoded user without validation
     if DEBUG_BYPASS_AUTH:
-        # Get the debug user from the database
-        debug_user = db.query(models.User).filter(models.User.id == DEBUG_USER_ID).first()
+        # Get the debug user from the cache or the database
+        debug_user = await _get_debug_user(db)
         if debug_user:
             return debug_user
         else:
@@ -201,7 +246,7 @@ async def get_current_user(request: Request, response: Response, db: Session = D
 
     try:
         # 2. Validate the token using WorkOS JWKS
-        payload = validate_workos_token(token)
+        payload = await validate_workos_token(token)
         
         # Extract the WorkOS user ID from the token
         workos_user_id = payload.get("sub")  # 'sub' claim holds the user ID
@@ -209,15 +254,12 @@ async def get_current_user(request: Request, response: Response, db: Session = D
             raise credentials_exception
         
         # 3. Get user from your local database
-        user = crud.get_user_by_workos_id(db, workos_user_id=workos_user_id)
+        user = await async_crud.get_user_by_workos_id(db, workos_user_id=workos_user_id)
         if user is None:
             raise credentials_exception
         
-        # 4. Check if token needs refresh
-        new_access_token, new_refresh_token = await refresh_token_if_needed(db, payload.get("sid"), payload)
-        
-        # Check if token needs refresh and set cookie if new token is obtained
-        new_access_token, _ = await refresh_token_if_needed(db, payload.get("sid"), payload)
+        # 4. Check if token needs refresh and set cookie if new token is obtained
+        new_access_token = await refresh_token_if_needed(db, payload.get("sid"), payload)
         
         if new_access_token:
             response.set_cookie(
@@ -234,3 +276,9 @@ async def get_current_user(request: Request, response: Response, db: Session = D
     except Exception as e:
         # This would catch invalid tokens, signatures, expiry etc.
         raise HTTPException(status_code=401, detail=f"Authentication error: {str(e)}")
+
+async def require_admin(current_user: models.User = Depends(get_current_user)) -> models.User:
+    """Dependency rejecting users without admin privileges (admin dashboard and operational stats)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return current_user
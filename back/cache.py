@@ -0,0 +1,248 @@
+"""
+In-process caches for hot lookups.
+
+``TTLCache`` is a size-bounded LRU whose entries also expire after a
+time-to-live (fixed, or per entry). It counts hits, misses, evictions and
+expirations so the hit rate can be monitored. ``SingleFlight`` collapses
+concurrent computations of the same key into one.
+
+``get_session_cache`` returns the process-wide cache of resolved
+``session id -> user`` used by the auth dependency. Entries are invalidated
+explicitly when a session is deleted, its tokens are refreshed or its user
+is updated (see ``crud``); the TTL bounds how long another worker process
+can serve a stale entry.
+
+``get_token_cache`` returns the process-wide cache of verified WorkOS access
+token claims, keyed by a digest of the token and kept until the token's
+``exp``.
+
+``get_prediction_cache`` returns the process-wide cache of AI service
+responses, keyed by ``prediction_cache_key`` (file digest and model
+version). Cached responses are shared between requests and must be
+treated as read-only.
+
+The session and prediction caches are ``shared_cache.TieredCache``s: with
+CACHE_REDIS_URL set they are backed by a cache shared between workers, and
+invalidations reach every worker. Otherwise they are local to the process.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, NamedTuple, Optional
+
+from config import get_settings
+from shared_cache import TieredCache, dumps, get_shared_backend, loads
+
+
+class TTLCache:
+    """Thread-safe LRU cache with a per-entry time-to-live."""
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value for ``ttl`` seconds, capped at the cache's own TTL."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if self.maxsize <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, self._clock() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Drop one entry. Returns True if it was cached."""
+        with self._lock:
+            if self._entries.pop(key, None) is None:
+                return False
+            self.invalidations += 1
+            return True
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]) -> int:
+        """Drop every entry whose value matches ``predicate``. Returns the count."""
+        with self._lock:
+            keys = [key for key, (value, _) in self._entries.items() if predicate(value)]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        """Drop every entry and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+            self.evictions = self.expirations = self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
+
+
+class SingleFlight:
+    """
+    Run at most one computation per key at a time.
+
+    Callers that arrive while a computation for their key is running await
+    its result (or exception) instead of starting another one. The work is
+    shielded, so a cancelled caller does not cancel it for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+class CachedIdentity(NamedTuple):
+    """A resolved session: the user's column values and when the session expires."""
+    user_id: int
+    user: Dict[str, Any]
+    session_expires_at: Optional[datetime]
+
+
+def encode_identity(identity: CachedIdentity) -> bytes:
+    """Pure function encoding a resolved session for the shared cache."""
+    return dumps(identity._asdict())
+
+
+def decode_identity(raw: bytes) -> CachedIdentity:
+    """Pure function decoding a resolved session encoded by ``encode_identity``."""
+    return CachedIdentity(**loads(raw))
+
+
+def identity_tags(identity: CachedIdentity) -> List[str]:
+    """Pure function returning the invalidation tags of a resolved session."""
+    return [f"user:{identity.user_id}"]
+
+
+_session_cache: Optional[TieredCache] = None
+
+
+def get_session_cache() -> TieredCache:
+    """Return the process-wide session cache, creating it on first use."""
+    global _session_cache
+    if _session_cache is None:
+        settings = get_settings()
+        _session_cache = TieredCache(
+            "sessions",
+            TTLCache(maxsize=settings.AUTH_CACHE_MAX_ENTRIES, ttl=settings.AUTH_CACHE_TTL_SECONDS),
+            backend=get_shared_backend(),
+            encode=encode_identity,
+            decode=decode_identity,
+            tags_of=identity_tags
+        )
+    return _session_cache
+
+
+_token_cache: Optional[TTLCache] = None
+
+
+def get_token_cache() -> TTLCache:
+    """Return the process-wide verified-token cache, creating it on first use."""
+    global _token_cache
+    if _token_cache is None:
+        settings = get_settings()
+        _token_cache = TTLCache(
+            maxsize=settings.TOKEN_CACHE_MAX_ENTRIES,
+            ttl=settings.TOKEN_CACHE_MAX_TTL_SECONDS
+        )
+    return _token_cache
+
+
+_prediction_cache: Optional[TieredCache] = None
+
+
+def get_prediction_cache() -> TieredCache:
+    """Return the process-wide prediction cache, creating it on first use."""
+    global _prediction_cache
+    if _prediction_cache is None:
+        settings = get_settings()
+        _prediction_cache = TieredCache(
+            "predictions",
+            TTLCache(maxsize=settings.PREDICTION_CACHE_MAX_ENTRIES, ttl=settings.PREDICTION_CACHE_TTL_SECONDS),
+            backend=get_shared_backend()
+        )
+    return _prediction_cache
+
+
+def prediction_cache_key(file_digest: str, model_version: str) -> str:
+    """Pure function returning the cache key of a file's predictions under one model."""
+    return f"{model_version}:{file_digest}"
+
+
+def invalidate_cached_session(session_id: Any) -> None:
+    """Forget a resolved session, e.g. after logout or a token refresh."""
+    get_session_cache().invalidate(str(session_id))
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    """Forget every resolved session of a user, e.g. after the user is updated."""
+    get_session_cache().invalidate_tag(f"user:{user_id}")
+
+
+async def ainvalidate_cached_session(session_id: Any) -> None:
+    """Forget a resolved session, returning once the shared cache no longer holds it."""
+    await get_session_cache().ainvalidate(str(session_id))
+
+
+async def ainvalidate_cached_user(user_id: int) -> None:
+    """Forget every resolved session of a user, returning once the shared cache no longer holds them."""
+    await get_session_cache().ainvalidate_tag(f"user:{user_id}")
@@ -10,6 +10,22 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY", "")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+    ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
+
+    # Database pool (per engine, per worker) - Persistent connections plus temporary
+    # OVERFLOW ones, seconds to wait for a free connection, seconds before a connection
+    # is replaced, and a liveness check on checkout. Ignored for SQLite.
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+    # Query instrumentation - Statements slower than SLOW_QUERY_MS are logged with their
+    # parameters redacted (0 disables). With BUDGET_ENFORCE (meant for tests), requests
+    # over their endpoint's declared query budget fail instead of logging a warning.
+    DB_SLOW_QUERY_MS: float = float(os.getenv("DB_SLOW_QUERY_MS", 200))
+    DB_QUERY_BUDGET_ENFORCE: bool = os.getenv("DB_QUERY_BUDGET_ENFORCE", "false").lower() == "true"
     
     # WorkOS Configuration
     WORKOS_API_KEY: str = os.getenv("WORKOS_API_KEY", "")
@@ -18,6 +34,90 @@ class Settings(BaseSettings):
     WORKOS_REDIRECT_URI: str = os.getenv("WORKOS_REDIRECT_URI", "")
     WORKOS_AUTH_DOMAIN: str = os.getenv("WORKOS_AUTH_DOMAIN", "workos.authkit.app")
 
+    # WorkOS JWKS key store - Background refresh interval, minimum seconds between
+    # refetches triggered by an unknown key ID, and fetch timeout
+    WORKOS_JWKS_URL: str = os.getenv("WORKOS_JWKS_URL", "https://api.workos.com/.well-known/jwks.json")
+    JWKS_REFRESH_INTERVAL_SECONDS: float = float(os.getenv("JWKS_REFRESH_INTERVAL_SECONDS", 3600))
+    JWKS_MIN_REFETCH_SECONDS: float = float(os.getenv("JWKS_MIN_REFETCH_SECONDS", 60))
+    JWKS_FETCH_TIMEOUT: float = float(os.getenv("JWKS_FETCH_TIMEOUT", 5))
+
+    # Shared cache - Redis-protocol server (redis://[:password@]host:port/db) shared by
+    # all workers behind the session, prediction and JWKS caches; empty keeps them in
+    # process. Commands slower than TIMEOUT count as misses and the server is skipped
+    # for RETRY seconds after a failure. Each worker runs commands on up to POOL_SIZE
+    # connections.
+    CACHE_REDIS_URL: str = os.getenv("CACHE_REDIS_URL", "")
+    CACHE_REDIS_TIMEOUT: float = float(os.getenv("CACHE_REDIS_TIMEOUT", 0.5))
+    CACHE_REDIS_RETRY_SECONDS: float = float(os.getenv("CACHE_REDIS_RETRY_SECONDS", 5))
+    CACHE_REDIS_POOL_SIZE: int = int(os.getenv("CACHE_REDIS_POOL_SIZE", 8))
+
+    # Auth cache - Resolved session -> user entries kept in process (0 disables)
+    AUTH_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_CACHE_TTL_SECONDS", 60))
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 10000))
+
+    # Token refresh - Sessions expiring within LEAD seconds are refreshed in the
+    # background every SCAN_INTERVAL seconds (0 disables the background task)
+    TOKEN_REFRESH_LEAD_SECONDS: float = float(os.getenv("TOKEN_REFRESH_LEAD_SECONDS", 300))
+    TOKEN_REFRESH_SCAN_INTERVAL: float = float(os.getenv("TOKEN_REFRESH_SCAN_INTERVAL", 30))
+    TOKEN_REFRESH_CONCURRENCY: int = int(os.getenv("TOKEN_REFRESH_CONCURRENCY", 4))
+
+    # Stateless sessions - Short-lived HMAC-signed session cookie (signed with SECRET_KEY)
+    # checked without a database round trip; revocations are synced every SYNC seconds
+    STATELESS_SESSIONS: bool = os.getenv("STATELESS_SESSIONS", "false").lower() == "true"
+    SESSION_TOKEN_TTL_SECONDS: int = int(os.getenv("SESSION_TOKEN_TTL_SECONDS", 300))
+    SESSION_REVOCATION_SYNC_SECONDS: float = float(os.getenv("SESSION_REVOCATION_SYNC_SECONDS", 10))
+
+    # Verified-token cache - Claims kept until the token's exp, capped at MAX_TTL (0 disables)
+    TOKEN_CACHE_MAX_ENTRIES: int = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", 10000))
+    TOKEN_CACHE_MAX_TTL_SECONDS: float = float(os.getenv("TOKEN_CACHE_MAX_TTL_SECONDS", 3600))
+
+    # Activity log - Events are queued and bulk-inserted every FLUSH seconds or BATCH
+    # events; when the queue is full new events are dropped
+    ACTIVITY_LOG_WRITE_BEHIND: bool = os.getenv("ACTIVITY_LOG_WRITE_BEHIND", "true").lower() == "true"
+    ACTIVITY_LOG_MAX_QUEUE: int = int(os.getenv("ACTIVITY_LOG_MAX_QUEUE", 10000))
+    ACTIVITY_LOG_BATCH_SIZE: int = int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", 500))
+    ACTIVITY_LOG_FLUSH_SECONDS: float = float(os.getenv("ACTIVITY_LOG_FLUSH_SECONDS", 1.0))
+
+    # Prediction history - Results are queued and bulk-inserted every FLUSH seconds or
+    # BATCH predictions; when the queue is full new results are not recorded
+    PREDICTION_STORE_MAX_QUEUE: int = int(os.getenv("PREDICTION_STORE_MAX_QUEUE", 1000))
+    PREDICTION_STORE_BATCH_SIZE: int = int(os.getenv("PREDICTION_STORE_BATCH_SIZE", 100))
+    PREDICTION_STORE_FLUSH_SECONDS: float = float(os.getenv("PREDICTION_STORE_FLUSH_SECONDS", 1.0))
+
+    # Logs API: above this many matching rows, /logs/count returns the planner estimate
+    LOGS_COUNT_EXACT_THRESHOLD: int = int(os.getenv("LOGS_COUNT_EXACT_THRESHOLD", 10000))
+
+    # AI microservice client (connection pool limits and per-phase timeouts in seconds)
+    AI_MICROSERVICE_BASE_URL: str = os.getenv("AI_MICROSERVICE_BASE_URL", "http://172.28.69.157:1337")
+    AI_POOL_MAX_CONNECTIONS: int = int(os.getenv("AI_POOL_MAX_CONNECTIONS", 100))
+    AI_POOL_MAX_KEEPALIVE: int = int(os.getenv("AI_POOL_MAX_KEEPALIVE", 20))
+    AI_POOL_KEEPALIVE_EXPIRY: float = float(os.getenv("AI_POOL_KEEPALIVE_EXPIRY", 30))
+    AI_CONNECT_TIMEOUT: float = float(os.getenv("AI_CONNECT_TIMEOUT", 5))
+    AI_READ_TIMEOUT: float = float(os.getenv("AI_READ_TIMEOUT", 30))
+    AI_WRITE_TIMEOUT: float = float(os.getenv("AI_WRITE_TIMEOUT", 30))
+    AI_POOL_TIMEOUT: float = float(os.getenv("AI_POOL_TIMEOUT", 5))
+
+    # AI replicas - Comma-separated base URLs (defaults to AI_MICROSERVICE_BASE_URL),
+    # circuit breaker, active health checks and request hedging (0 disables hedging)
+    AI_MICROSERVICE_URLS: str = os.getenv("AI_MICROSERVICE_URLS", "")
+    AI_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("AI_BREAKER_FAILURE_THRESHOLD", 5))
+    AI_BREAKER_RESET_TIMEOUT: float = float(os.getenv("AI_BREAKER_RESET_TIMEOUT", 30))
+    AI_HEALTH_CHECK_INTERVAL: float = float(os.getenv("AI_HEALTH_CHECK_INTERVAL", 10))
+    AI_HEALTH_CHECK_TIMEOUT: float = float(os.getenv("AI_HEALTH_CHECK_TIMEOUT", 2))
+    AI_HEDGE_PERCENTILE: float = float(os.getenv("AI_HEDGE_PERCENTILE", 0))
+
+    # AI routing - "least_outstanding", or "content_hash" to pin each uploaded
+    # file to one replica (consistent hashing, bounded to LOAD_FACTOR x average load)
+    AI_ROUTING_MODE: str = os.getenv("AI_ROUTING_MODE", "least_outstanding")
+    AI_HASH_VNODES: int = int(os.getenv("AI_HASH_VNODES", 100))
+    AI_HASH_LOAD_FACTOR: float = float(os.getenv("AI_HASH_LOAD_FACTOR", 1.25))
+
+    # Prediction cache - AI responses by file digest and AI_MODEL_VERSION (bump it when
+    # the model changes), LRU-bounded to MAX_ENTRIES files (0 disables)
+    AI_MODEL_VERSION: str = os.getenv("AI_MODEL_VERSION", "1")
+    PREDICTION_CACHE_MAX_ENTRIES: int = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", 256))
+    PREDICTION_CACHE_TTL_SECONDS: int = int(os.getenv("PREDICTION_CACHE_TTL_SECONDS", 86400))
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
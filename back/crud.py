@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from datetime import datetime
 import models
+from cache import invalidate_cached_session, invalidate_cached_user
 
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
@@ -40,6 +41,7 @@ def create_or_update_user(db: Session, workos_profile: dict):
 
     db.commit()
     db.refresh(db_user)
+    invalidate_cached_user(db_user.id)
     return db_user
 
 import uuid
@@ -47,6 +49,9 @@ from datetime import datetime, timedelta
 from jose import jwt
 from sqlalchemy.orm import Session
 import models
+from session_tokens import record_revocation
+from activity_logger import get_activity_logger
+from config import get_settings
 
 def create_or_update_session(db: Session, user_id: int, auth_response: dict):
     """
@@ -74,8 +79,14 @@ def create_or_update_session(db: Session, user_id: int, auth_response: dict):
 
 def create_activity_log(db: Session, user_id: int, action: str):
     """
-    Create a new activity log entry for a user action.
+    Record a user action.
+
+    With ACTIVITY_LOG_WRITE_BEHIND (the default) the event is queued and
+    written in a later bulk insert, and the return value is whether it was
+    queued. Otherwise the row is inserted now and returned.
     """
+    if get_settings().ACTIVITY_LOG_WRITE_BEHIND:
+        return get_activity_logger().log(user_id, action)
     activity_log = models.ActivityLog(
         user_id=user_id,
         action=action
@@ -107,7 +118,9 @@ def invalidate_session(db: Session, workos_session_id: str = None, session_id: s
         session = get_app_session_by_workos_session_id(db, workos_session_id)
     if session:
         db.delete(session)
+        record_revocation(db, session.id, session.user_id)
         db.commit()
+        invalidate_cached_session(session.id)
         return True
     return False
 
@@ -137,6 +150,7 @@ def update_session_tokens(db: Session, session_id: str, new_tokens: dict):
             session.expires_at = datetime.utcnow() + timedelta(minutes=15)
         db.commit()
         db.refresh(session)
+        invalidate_cached_session(session.id)
         return session
     return None
 
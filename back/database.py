@@ -1,11 +1,17 @@
 import logging
-from typing import Generator, Optional
-from sqlalchemy import create_engine, text, Engine
+import time
+import weakref
+from contextvars import ContextVar
+from typing import Any, AsyncGenerator, Callable, Dict, Generator, Optional, Union
+from sqlalchemy import create_engine, event, make_url, text, Engine, URL
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.exc import SQLAlchemyError
-from config import get_settings
+from config import Settings, get_settings
 from functools import lru_cache
+from pool_monitor import MonitoredAsyncAdaptedQueuePool, MonitoredQueuePool, PoolMonitor
+from starlette.datastructures import MutableHeaders
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,6 +23,195 @@ Base = declarative_base()
 _engine: Optional[Engine] = None
 _SessionLocal = None
 
+# Async counterparts, used by the request path so queries don't block the event loop
+_async_engine: Optional[AsyncEngine] = None
+_AsyncSessionLocal: Optional[async_sessionmaker] = None
+
+# Pool monitors of the sync and async engines, by engine name
+_pool_monitors: Dict[str, PoolMonitor] = {}
+
+# The monitor attached to each instrumented engine, so it is attached only once
+_engine_monitors: "weakref.WeakKeyDictionary[Engine, PoolMonitor]" = weakref.WeakKeyDictionary()
+
+# Async driver for each database backend
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url: Union[str, URL]) -> URL:
+    """
+    Pure function mapping a database URL to the same database through its async driver.
+    
+    Raises:
+        ValueError: If the backend has no supported async driver
+    """
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+def engine_options(url: Union[str, URL], settings: Settings, is_async: bool = False) -> Dict[str, Any]:
+    """
+    Pure function returning the connection pool arguments for an engine.
+    
+    SQLite keeps SQLAlchemy's defaults; its pools don't take these options.
+    """
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": MonitoredAsyncAdaptedQueuePool if is_async else MonitoredQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+def describe_url(url: Union[str, URL]) -> str:
+    """Pure function describing a database URL for logs, without credentials or query options."""
+    url = make_url(url)
+    return f"{url.get_backend_name()} database '{url.database}' on {url.host or 'localhost'}"
+
+def _instrument_engine(name: str, engine: Engine) -> None:
+    """
+    Attach the pool monitor and the per-request query hooks to a (sync) engine.
+    
+    Idempotent: instrumenting an engine again reuses its monitor and hooks,
+    so nothing is counted twice.
+    """
+    if engine not in _engine_monitors:
+        _engine_monitors[engine] = PoolMonitor(name).attach(engine)
+    _pool_monitors[name] = _engine_monitors[engine]
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Pool gauges, counters and checkout wait histograms of each engine."""
+    return {name: monitor.stats() for name, monitor in _pool_monitors.items()}
+
+# Per-request query instrumentation
+#
+# QueryTimingMiddleware puts a QueryStats in the request's context; the
+# cursor event hooks add every statement executed on either engine to it,
+# including statements run from sync dependencies in the threadpool.
+
+# Statistics of the request being handled, if any
+_query_stats: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+class QueryBudgetExceeded(RuntimeError):
+    """An endpoint executed more statements than its declared query budget."""
+
+class QueryStats:
+    """Statements executed and time spent in the database while handling one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.seconds * 1000:.1f};desc="{self.count} queries"'
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _query_stats.get()
+
+def redact_parameters(parameters: Any) -> Any:
+    """Pure function replacing bound parameter values with their type names, for logs."""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: one parameter set per row
+            return f"{len(parameters)} x {redact_parameters(parameters[0])}"
+        return [type(value).__name__ for value in parameters]
+    return None if parameters is None else type(parameters).__name__
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+    slow_ms = get_settings().DB_SLOW_QUERY_MS
+    if slow_ms and elapsed * 1000 >= slow_ms:
+        logger.warning(
+            f"Slow query ({elapsed * 1000:.1f} ms): {statement[:1000]} "
+            f"parameters={redact_parameters(parameters)}"
+        )
+
+def _handle_error(exception_context) -> None:
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+def query_budget(max_queries: int) -> Callable:
+    """
+    Decorator declaring the most statements an endpoint may execute per request.
+    
+    Checked by QueryTimingMiddleware: over budget, a request logs a warning,
+    or fails with QueryBudgetExceeded when DB_QUERY_BUDGET_ENFORCE is on.
+    """
+    def declare(endpoint: Callable) -> Callable:
+        endpoint.query_budget = max_queries
+        return endpoint
+    return declare
+
+def check_query_budget(endpoint: Optional[Callable], stats: QueryStats, path: str = "") -> None:
+    """
+    Compare a request's statement count with its endpoint's declared budget.
+    
+    Raises:
+        QueryBudgetExceeded: If over budget and DB_QUERY_BUDGET_ENFORCE is on
+    """
+    budget = getattr(endpoint, "query_budget", None)
+    if budget is None or stats.count <= budget:
+        return
+    message = f"{path or getattr(endpoint, '__name__', 'endpoint')} executed {stats.count} queries, budget is {budget}"
+    if get_settings().DB_QUERY_BUDGET_ENFORCE:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+class QueryTimingMiddleware:
+    """
+    ASGI middleware counting each request's statements and database time.
+    
+    Adds ``Server-Timing: db;dur=<ms>;desc="<n> queries"`` to every HTTP
+    response and checks the endpoint's query budget before the response starts.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                # Routing has stored the matched endpoint in the scope by now
+                check_query_budget(scope.get("endpoint"), stats, scope.get("path", ""))
+                MutableHeaders(scope=message).append("Server-Timing", stats.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _query_stats.reset(token)
+
 @lru_cache
 def get_engine() -> Engine:
     """
@@ -31,9 +226,10 @@ def get_engine() -> Engine:
     if _engine is None:
         settings = get_settings()
         db_url = settings.DATABASE_URL
-        logger.info(f"Database URL: {db_url}")
+        logger.info(f"Database: {describe_url(db_url)}")
         
-        _engine = create_engine(db_url)
+        _engine = create_engine(db_url, **engine_options(db_url, settings))
+        _instrument_engine("sync", _engine)
         
         # Test connection only when explicitly requested
         try:
@@ -87,24 +283,92 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+def get_async_engine() -> AsyncEngine:
+    """
+    Get or create the async SQLAlchemy engine for DATABASE_URL.
+    
+    The URL's driver is swapped for the async one (asyncpg, aiosqlite), so
+    both engines always point at the same database.
+    
+    Returns:
+        AsyncEngine: SQLAlchemy async engine instance
+    """
+    global _async_engine
+    
+    if _async_engine is None:
+        settings = get_settings()
+        _async_engine = create_async_engine(
+            to_async_url(settings.DATABASE_URL),
+            **engine_options(settings.DATABASE_URL, settings, is_async=True)
+        )
+        _instrument_engine("async", _async_engine.sync_engine)
+    
+    return _async_engine
+
+def get_async_session_factory() -> async_sessionmaker:
+    """
+    Get the async session factory.
+    
+    Objects stay loaded after commit (expire_on_commit=False): with an async
+    session, touching an expired attribute would need an implicit query.
+    
+    Returns:
+        async_sessionmaker: SQLAlchemy async session factory
+    """
+    global _AsyncSessionLocal
+    
+    if _AsyncSessionLocal is None:
+        _AsyncSessionLocal = async_sessionmaker(
+            get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    
+    return _AsyncSessionLocal
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency function to get an async database session.
+    
+    Async counterpart of get_db for async def routes: queries are awaited
+    instead of blocking the event loop.
+    
+    Yields:
+        AsyncSession: SQLAlchemy async session
+    """
+    async with get_async_session_factory()() as db:
+        try:
+            yield db
+        except SQLAlchemyError as e:
+            logger.error(f"Database error: {str(e)}")
+            raise
+
 # Functions for testing - allows engine override
-def set_test_engine(test_engine: Engine) -> None:
+def set_test_engine(test_engine: Engine, async_engine: Optional[AsyncEngine] = None) -> None:
     """
     Set a test engine for database operations.
-    This allows tests to use a different database (e.g., SQLite in-memory).
+    This allows tests to use a different database (e.g., SQLite).
     
     Args:
         test_engine: SQLAlchemy engine for testing
+        async_engine: Async engine for the same database. Derived from the
+            test engine's URL if omitted; pass one explicitly for in-memory
+            SQLite, where a second engine would open a separate database.
     """
-    global _engine, _SessionLocal
+    global _engine, _SessionLocal, _async_engine, _AsyncSessionLocal
     _engine = test_engine
     _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+    _async_engine = async_engine or create_async_engine(to_async_url(test_engine.url))
+    _AsyncSessionLocal = None
+    _instrument_engine("sync", _engine)
+    _instrument_engine("async", _async_engine.sync_engine)
 
 def reset_engine() -> None:
     """
-    Reset the engine to None, forcing re-initialization.
+    Reset the engines to None, forcing re-initialization.
     Useful for cleaning up after tests.
     """
-    global _engine, _SessionLocal
+    global _engine, _SessionLocal, _async_engine, _AsyncSessionLocal
     _engine = None
     _SessionLocal = None
+    _async_engine = None
+    _AsyncSessionLocal = None
+    _pool_monitors.clear()
@@ -0,0 +1,219 @@
+"""
+Shared WorkOS JWKS key store.
+
+Keys are fetched from the JWKS endpoint and parsed once into public key
+objects per ``kid``, so validating a token only costs the signature check.
+A background task started from the app lifespan refreshes the set every
+``ttl`` seconds. A token signed with an unknown ``kid`` (i.e. after a key
+rotation) triggers an immediate refetch, rate limited to one per
+``min_refetch_interval`` so forged ``kid`` values cannot hammer WorkOS.
+
+With a shared cache backend (CACHE_REDIS_URL) the fetched key set is also
+stored there for ``ttl`` seconds, and refreshes read it before going to
+WorkOS, so a fleet of workers fetches it about once per ``ttl`` instead of
+once per worker.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from jose import jwk
+from jose.backends.base import Key
+
+from config import get_settings
+from shared_cache import RedisBackend, dumps, get_shared_backend, loads
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSKeyStore:
+    """Parsed public keys by ``kid``, kept fresh in the background."""
+
+    def __init__(
+        self,
+        url: str,
+        ttl: float = 3600.0,
+        min_refetch_interval: float = 60.0,
+        fetch_timeout: float = 5.0,
+        algorithm: str = "RS256",
+        http_client: Optional[httpx.AsyncClient] = None,
+        shared: Optional[RedisBackend] = None
+    ):
+        self.url = url
+        self.ttl = ttl
+        self.min_refetch_interval = min_refetch_interval
+        self.fetch_timeout = fetch_timeout
+        self.algorithm = algorithm
+        self._http_client = http_client
+        self._shared = shared
+        self._keys: Dict[str, Key] = {}
+        self._fetched_at: Optional[float] = None
+        self._last_attempt = float("-inf")
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.fetches_total = 0
+        self.fetch_errors_total = 0
+        self.shared_hits_total = 0
+        self.unknown_kid_total = 0
+
+    async def start(self) -> None:
+        """Start the background refresh. Called from the app lifespan."""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._run_refresh())
+
+    async def close(self) -> None:
+        """Stop the background refresh. Called from the app lifespan."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def _run_refresh(self) -> None:
+        while True:
+            refreshed = await self.refresh()
+            # Retry sooner while the endpoint is failing
+            await asyncio.sleep(self.ttl if refreshed else self.min_refetch_interval)
+
+    async def _fetch(self) -> Dict[str, Any]:
+        if self._http_client is not None:
+            response = await self._http_client.get(self.url, timeout=self.fetch_timeout)
+        else:
+            async with httpx.AsyncClient(timeout=self.fetch_timeout) as client:
+                response = await client.get(self.url)
+        response.raise_for_status()
+        return response.json()
+
+    def _parse(self, jwks: Dict[str, Any]) -> Dict[str, Key]:
+        keys = {}
+        for key_data in jwks.get("keys", []):
+            kid = key_data.get("kid")
+            if not kid or key_data.get("use", "sig") != "sig":
+                continue
+            try:
+                keys[kid] = jwk.construct(key_data, key_data.get("alg", self.algorithm))
+            except Exception as e:
+                logger.warning(f"Skipping unusable JWK {kid}: {e}")
+        return keys
+
+    @property
+    def _shared_key(self) -> str:
+        return f"jwks:{self.url}"
+
+    async def _read_shared(self, kid: Optional[str]) -> Optional[Dict[str, Any]]:
+        """The key set another worker stored, if it has ``kid`` (when given)."""
+        if self._shared is None or not self._shared.available:
+            return None
+        try:
+            raw = await self._shared.get(self._shared_key)
+        except Exception as e:
+            logger.debug(f"Shared JWKS read failed: {e!r}")
+            return None
+        if raw is None:
+            return None
+        jwks = loads(raw)
+        if kid is not None and kid not in {key_data.get("kid") for key_data in jwks.get("keys", [])}:
+            return None
+        return jwks
+
+    async def _write_shared(self, jwks: Dict[str, Any]) -> None:
+        if self._shared is None or not self._shared.available:
+            return
+        try:
+            await self._shared.set(self._shared_key, dumps(jwks), self.ttl)
+        except Exception as e:
+            logger.debug(f"Shared JWKS write failed: {e!r}")
+
+    async def refresh(self, kid: Optional[str] = None) -> bool:
+        """
+        Fetch and parse the key set. Concurrent callers share one fetch.
+
+        The set in the shared cache is used instead of fetching when there is
+        one (and it contains ``kid``, when refreshing for an unknown key).
+        Returns True if the keys were refreshed. On failure the previous
+        keys are kept.
+        """
+        attempt = time.monotonic()
+        async with self._lock:
+            if self._last_attempt >= attempt:
+                # Another caller fetched while this one waited for the lock
+                return self._fetched_at is not None and self._fetched_at >= attempt
+            self._last_attempt = time.monotonic()
+            jwks = await self._read_shared(kid)
+            if jwks is not None:
+                self.shared_hits_total += 1
+            else:
+                self.fetches_total += 1
+                try:
+                    jwks = await self._fetch()
+                except Exception as e:
+                    self.fetch_errors_total += 1
+                    logger.error(f"JWKS refresh from {self.url} failed: {e}")
+                    return False
+                await self._write_shared(jwks)
+
+            keys = self._parse(jwks)
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+            logger.info(f"Loaded {len(keys)} JWKS keys")
+            return True
+
+    def _may_refetch(self) -> bool:
+        return time.monotonic() - self._last_attempt >= self.min_refetch_interval
+
+    async def get_key(self, kid: str) -> Key:
+        """
+        Return the parsed public key for ``kid``.
+
+        Refetches the set when it is stale (no background task running) or
+        does not contain ``kid``, subject to the refetch rate limit.
+
+        Raises:
+            ValueError: If no key with this ``kid`` is known
+        """
+        stale = self._fetched_at is None or time.monotonic() - self._fetched_at > self.ttl
+        if stale and self._may_refetch():
+            await self.refresh()
+
+        key = self._keys.get(kid)
+        if key is None:
+            self.unknown_kid_total += 1
+            if self._may_refetch():
+                await self.refresh(kid)
+                key = self._keys.get(kid)
+        if key is None:
+            raise ValueError(f"No JWK found for kid: {kid}")
+        return key
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "kids": sorted(self._keys),
+            "age_seconds": None if self._fetched_at is None else round(time.monotonic() - self._fetched_at, 1),
+            "fetches_total": self.fetches_total,
+            "fetch_errors_total": self.fetch_errors_total,
+            "shared_hits_total": self.shared_hits_total,
+            "unknown_kid_total": self.unknown_kid_total
+        }
+
+
+_jwks_store: Optional[JWKSKeyStore] = None
+
+
+def get_jwks_store() -> JWKSKeyStore:
+    """Return the process-wide JWKS key store, creating it on first use."""
+    global _jwks_store
+    if _jwks_store is None:
+        settings = get_settings()
+        _jwks_store = JWKSKeyStore(
+            url=settings.WORKOS_JWKS_URL,
+            ttl=settings.JWKS_REFRESH_INTERVAL_SECONDS,
+            min_refetch_interval=settings.JWKS_MIN_REFETCH_SECONDS,
+            fetch_timeout=settings.JWKS_FETCH_TIMEOUT,
+            shared=get_shared_backend()
+        )
+    return _jwks_store
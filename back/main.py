@@ -1,16 +1,51 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import models
-from database import get_engine
+from database import QueryTimingMiddleware, get_async_engine, get_engine, get_pool_stats
 from config import get_settings
-from routes import users, logs, history, auth, ai_service
+from ai_client import get_ai_client
+from jwks import get_jwks_store
+from refresh import get_refresh_coordinator
+from session_tokens import get_revocation_list
+from activity_logger import get_activity_logger
+from prediction_store import get_prediction_store
+from shared_cache import get_shared_backend
+from pagination import NEXT_CURSOR_HEADER
+from auth import require_admin
+from routes import users, logs, history, auth, ai_service, admin
 
 # Get database engine and create tables
 engine = get_engine()
 models.Base.metadata.create_all(bind=engine)
 
 settings = get_settings()
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared clients on startup and close them on shutdown"""
+    shared_cache = get_shared_backend()
+    if shared_cache is not None:
+        await shared_cache.start()
+    await get_ai_client().start()
+    await get_activity_logger().start()
+    await get_prediction_store().start()
+    await get_jwks_store().start()
+    await get_refresh_coordinator().start()
+    if settings.STATELESS_SESSIONS:
+        await get_revocation_list().start()
+    yield
+    await get_revocation_list().close()
+    await get_refresh_coordinator().close()
+    await get_jwks_store().close()
+    await get_prediction_store().close()
+    await get_activity_logger().close()
+    await get_ai_client().close()
+    await get_async_engine().dispose()
+    if shared_cache is not None:
+        await shared_cache.close()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,16 +56,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    # Listed by name: with credentials, browsers treat "*" as a header literally called "*"
+    expose_headers=[NEXT_CURSOR_HEADER, "Server-Timing"],
 )
 
+# Server-Timing with each request's query count and database time
+app.add_middleware(QueryTimingMiddleware)
+
 app.include_router(users.router)
 app.include_router(logs.router)
 app.include_router(history.router)
 app.include_router(auth.router)
 app.include_router(ai_service.router)
+app.include_router(admin.router)
 
 # Root endpoint
 @app.get("/")
 async def root():
-    return {"message": "Welcome to FastAPI with PostgreSQL"}
\ No newline at end of file
+    return {"message": "Welcome to FastAPI with PostgreSQL"}
+
+@app.get("/db/pool-stats")
+async def db_pool_stats(admin: models.User = Depends(require_admin)):
+    """Checked-out and overflow connections and checkout wait histograms of the database pools"""
+    return get_pool_stats()
+
+@app.get("/cache/shared-stats")
+async def shared_cache_stats(admin: models.User = Depends(require_admin)):
+    """Availability, command and error counts of the shared cache server, if one is configured"""
+    shared_cache = get_shared_backend()
+    return shared_cache.stats() if shared_cache is not None else {"backend": "local"}
\ No newline at end of file
@@ -0,0 +1,37 @@
+-- App sessions keyed by an internal UUID, holding the WorkOS tokens.
+--
+-- Sessions are now identified by a random UUID string (the value of the
+-- session cookie) instead of a serial integer, and store the WorkOS access
+-- token, refresh token and expiry directly. The WorkOS user ID, encrypted
+-- refresh token and refresh token expiry become optional.
+--
+-- Integer session IDs cannot be carried over to UUIDs, so existing sessions
+-- are deleted: signed-in users have to log in again once.
+--
+-- Run with: psql "$DATABASE_URL" -f migrations/001_app_sessions_uuid.sql
+
+BEGIN;
+
+-- Only on the first run, so re-running does not log everyone out again
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'app_sessions' AND column_name = 'id') = 'integer' THEN
+        DELETE FROM app_sessions;
+        ALTER TABLE app_sessions ALTER COLUMN id DROP DEFAULT;
+        ALTER TABLE app_sessions ALTER COLUMN id TYPE VARCHAR USING id::text;
+        DROP SEQUENCE IF EXISTS app_sessions_id_seq;
+    END IF;
+END
+$$;
+
+ALTER TABLE app_sessions ADD COLUMN IF NOT EXISTS access_token TEXT;
+ALTER TABLE app_sessions ADD COLUMN IF NOT EXISTS refresh_token TEXT;
+ALTER TABLE app_sessions ADD COLUMN IF NOT EXISTS expires_at TIMESTAMP WITHOUT TIME ZONE;
+ALTER TABLE app_sessions ADD COLUMN IF NOT EXISTS is_active BOOLEAN;
+
+ALTER TABLE app_sessions ALTER COLUMN workos_user_id DROP NOT NULL;
+ALTER TABLE app_sessions ALTER COLUMN encrypted_refresh_token DROP NOT NULL;
+ALTER TABLE app_sessions ALTER COLUMN refresh_token_expires_at DROP NOT NULL;
+
+COMMIT;
@@ -0,0 +1,10 @@
+-- Covering index for the keyset-paginated prediction history (/history).
+--
+-- Built CONCURRENTLY so that writes to prediction_logs are not blocked while
+-- it is created. CREATE INDEX CONCURRENTLY cannot run inside a transaction,
+-- so do not apply this script with psql --single-transaction.
+--
+-- Run with: psql "$DATABASE_URL" -f migrations/002_prediction_logs_history_index.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_prediction_logs_user_created_id
+    ON prediction_logs (user_id, created_at DESC, id DESC);
@@ -0,0 +1,14 @@
+-- Indexes for the filtered, keyset-paginated logs API (/logs).
+--
+-- One (..., created_at, id) index per filter prefix: by user, by type, and
+-- unfiltered. Built CONCURRENTLY, so do not apply this script inside a
+-- transaction.
+--
+-- Run with: psql "$DATABASE_URL" -f migrations/003_logs_filter_indexes.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_logs_user_created_id
+    ON logs (user_id, created_at, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_logs_type_created_id
+    ON logs (type, created_at, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_logs_created_id
+    ON logs (created_at, id);
@@ -0,0 +1,20 @@
+-- Per-file prediction summaries on prediction_logs.
+--
+-- Rows written by the prediction store carry the recommended crop, file
+-- digest, model, row count, mean score, positive row count and the packed
+-- per-row scores. All columns are nullable: rows recorded before this
+-- change keep NULL summaries, which the history API returns as null.
+--
+-- Run with: psql "$DATABASE_URL" -f migrations/004_prediction_logs_summary_columns.sql
+
+BEGIN;
+
+ALTER TABLE prediction_logs ADD COLUMN IF NOT EXISTS crop VARCHAR;
+ALTER TABLE prediction_logs ADD COLUMN IF NOT EXISTS file_digest VARCHAR(64);
+ALTER TABLE prediction_logs ADD COLUMN IF NOT EXISTS model_type VARCHAR;
+ALTER TABLE prediction_logs ADD COLUMN IF NOT EXISTS row_count INTEGER;
+ALTER TABLE prediction_logs ADD COLUMN IF NOT EXISTS mean_score DOUBLE PRECISION;
+ALTER TABLE prediction_logs ADD COLUMN IF NOT EXISTS positive_count INTEGER;
+ALTER TABLE prediction_logs ADD COLUMN IF NOT EXISTS scores BYTEA;
+
+COMMIT;
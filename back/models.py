@@ -1,5 +1,5 @@
-from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, Enum, JSON, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Boolean, Column, Integer, Float, String, Text, Date, DateTime, Enum, JSON, ForeignKey, Index, LargeBinary
+from sqlalchemy.orm import deferred, relationship
 from datetime import datetime
 import enum
 
@@ -66,6 +66,13 @@ class Log(Base):
 
     user = relationship("User", back_populates="logs")
 
+    # Keyset pagination walks (created_at, id) backwards within each prefix
+    __table_args__ = (
+        Index("ix_logs_user_created_id", "user_id", "created_at", "id"),
+        Index("ix_logs_type_created_id", "type", "created_at", "id"),
+        Index("ix_logs_created_id", "created_at", "id"),
+    )
+
 class Prediction(Base):
     """Model for storing prediction results from the AI service.
     
@@ -110,10 +117,14 @@ class AppSession(Base):
     """Model for tracking user application sessions.
     
     Attributes:
-        id: Primary key
+        id: Primary key (internal UUID, stored in the session cookie)
         user_id: Reference to the user
         workos_user_id: External user ID from WorkOS
         workos_session_id: Unique session ID from WorkOS
+        access_token: Current WorkOS access token
+        refresh_token: Current WorkOS refresh token
+        expires_at: When the access token expires
+        is_active: Whether the session can still be used
         encrypted_refresh_token: Encrypted refresh token
         ip_address: IP address of the session
         user_agent: User agent string of the client
@@ -124,20 +135,42 @@ class AppSession(Base):
     """
     __tablename__ = "app_sessions"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(String, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    workos_user_id = Column(String, nullable=False)
+    workos_user_id = Column(String, nullable=True)
     workos_session_id = Column(String, unique=True, nullable=False)
-    encrypted_refresh_token = Column(Text, nullable=False)
+    access_token = Column(Text, nullable=True)
+    refresh_token = Column(Text, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+    is_active = Column(Boolean, default=True)
+    encrypted_refresh_token = Column(Text, nullable=True)
     ip_address = Column(String)
     user_agent = Column(Text)
     issued_at = Column(DateTime, default=datetime.utcnow)
-    refresh_token_expires_at = Column(DateTime, nullable=False)
+    refresh_token_expires_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     user = relationship("User", back_populates="app_sessions")
 
+class SessionRevocation(Base):
+    """Model for app sessions whose signed session tokens must be rejected.
+    
+    Attributes:
+        id: Primary key
+        session_id: Internal ID of the revoked app session
+        user_id: Reference to the session's user
+        revoked_at: When the session was revoked
+        expires_at: When the last token issued before revocation expires
+    """
+    __tablename__ = "session_revocations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String, nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    revoked_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False)
+
 class PredictionLog(Base):
     """Model for storing prediction history and results.
     
@@ -146,6 +179,14 @@ class PredictionLog(Base):
         user_id: Reference to the user who made the prediction
         result: String containing the prediction result
         file_name: Name of the file used for prediction (if any)
+        crop: Recommended crop, if the AI service returned one
+        file_digest: SHA-256 of the uploaded file
+        model_type: Model reported by the AI service
+        row_count: Number of rows predicted
+        mean_score: Mean of the per-row scores
+        positive_count: Rows scored at or above 0.5
+        scores: Per-row scores, zlib-compressed little-endian float32
+            (see prediction_store.encode_scores); loaded only on access
         created_at: Timestamp of when the prediction was made
     """
     __tablename__ = "prediction_logs"
@@ -154,6 +195,81 @@ class PredictionLog(Base):
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     result = Column(String, nullable=False)
     file_name = Column(String)
+    crop = Column(String, nullable=True)
+    file_digest = Column(String(64), nullable=True)
+    model_type = Column(String, nullable=True)
+    row_count = Column(Integer, nullable=True)
+    mean_score = Column(Float, nullable=True)
+    positive_count = Column(Integer, nullable=True)
+    scores = deferred(Column(LargeBinary, nullable=True))
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    user = relationship("User", back_populates="prediction_logs")
\ No newline at end of file
+    user = relationship("User", back_populates="prediction_logs")
+
+    # Serves the newest-first, keyset-paginated history of one user
+    __table_args__ = (
+        Index(
+            "ix_prediction_logs_user_created_id",
+            "user_id", created_at.desc(), id.desc()
+        ),
+    )
+
+class DailyRollup(Base):
+    """Per-day prediction totals for the admin dashboard (see rollups).
+    
+    Attributes:
+        day: UTC day the predictions were made
+        predictions: Number of predictions
+        rows_predicted: Total CSV rows predicted
+        active_users: Distinct users who made a prediction
+        files_processed: Distinct files (by digest) predicted
+    """
+    __tablename__ = "daily_rollups"
+
+    day = Column(Date, primary_key=True)
+    predictions = Column(Integer, nullable=False, default=0)
+    rows_predicted = Column(Integer, nullable=False, default=0)
+    active_users = Column(Integer, nullable=False, default=0)
+    files_processed = Column(Integer, nullable=False, default=0)
+
+class DailyCropRollup(Base):
+    """Per-day, per-crop prediction totals for the admin dashboard (see rollups).
+    
+    Attributes:
+        day: UTC day the predictions were made
+        crop: Recommended crop, or "unknown" when the AI service returned none
+        predictions: Number of predictions
+        rows_predicted: Total CSV rows predicted
+        positive_rows: Rows scored at or above 0.5
+    """
+    __tablename__ = "daily_crop_rollups"
+
+    day = Column(Date, primary_key=True)
+    crop = Column(String, primary_key=True)
+    predictions = Column(Integer, nullable=False, default=0)
+    rows_predicted = Column(Integer, nullable=False, default=0)
+    positive_rows = Column(Integer, nullable=False, default=0)
+
+class DailyActiveUser(Base):
+    """Users seen per day; only written, so distinct counts can be kept incrementally.
+    
+    Attributes:
+        day: UTC day
+        user_id: A user who made a prediction that day
+    """
+    __tablename__ = "daily_active_users"
+
+    day = Column(Date, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+
+class DailyFile(Base):
+    """Files seen per day; only written, so distinct counts can be kept incrementally.
+    
+    Attributes:
+        day: UTC day
+        file_digest: SHA-256 of a file predicted that day
+    """
+    __tablename__ = "daily_files"
+
+    day = Column(Date, primary_key=True)
+    file_digest = Column(String(64), primary_key=True)
@@ -0,0 +1,141 @@
+"""
+Database connection pool instrumentation.
+
+``PoolMonitor`` listens to SQLAlchemy pool events (``connect``, ``checkout``,
+``checkin``, ``invalidate``) on an engine and keeps counters plus the
+number of connections currently checked out.
+
+How long a request waited for a connection is not visible through pool
+events, so engines built by ``database`` use the ``Monitored*`` pool
+classes, which time ``Pool.connect()``. That time is mostly queueing once
+the pool and its overflow are exhausted, plus connect and pre-ping time
+when a new or stale connection is involved. Waits are kept as a cumulative
+histogram in the style of Prometheus buckets.
+"""
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import Engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+WAIT_BUCKETS: Tuple[float, ...] = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+class PoolMonitor:
+    """Counters and checkout wait histogram for one engine's pool."""
+
+    def __init__(self, name: str, buckets: Tuple[float, ...] = WAIT_BUCKETS):
+        self.name = name
+        self.buckets = buckets
+        self._wait_counts = [0] * (len(buckets) + 1)
+        self._lock = threading.Lock()
+        self._pool = None
+        self.checked_out = 0
+        self.connects_total = 0
+        self.checkouts_total = 0
+        self.invalidations_total = 0
+        self.timeouts_total = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+
+    def attach(self, engine: Engine) -> "PoolMonitor":
+        """Listen to the pool events of a (sync) engine and time its checkouts."""
+        self._pool = engine.pool
+        if isinstance(engine.pool, MonitoredPoolMixin):
+            engine.pool.monitor = self
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+        return self
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.connects_total += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        with self._lock:
+            self.checkouts_total += 1
+            self.checked_out += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        # Also fired for connections that were invalidated while checked out
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception) -> None:
+        with self._lock:
+            self.invalidations_total += 1
+
+    def observe_wait(self, seconds: float, timed_out: bool = False) -> None:
+        index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        with self._lock:
+            self._wait_counts[index] += 1
+            self.wait_seconds_total += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            if timed_out:
+                self.timeouts_total += 1
+
+    def wait_histogram(self) -> Dict[str, int]:
+        """Cumulative counts of checkouts that waited at most each bucket bound."""
+        histogram, running = {}, 0
+        for bound, count in zip(self.buckets, self._wait_counts):
+            running += count
+            histogram[f"le_{bound}"] = running
+        histogram["le_inf"] = running + self._wait_counts[-1]
+        return histogram
+
+    def stats(self) -> Dict[str, Any]:
+        pool = self._pool
+        stats = {
+            "name": self.name,
+            "pool_class": type(pool).__name__ if pool is not None else None,
+            "checked_out": self.checked_out,
+            "connects_total": self.connects_total,
+            "checkouts_total": self.checkouts_total,
+            "invalidations_total": self.invalidations_total,
+            "timeouts_total": self.timeouts_total,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "max_wait_seconds": round(self.max_wait_seconds, 6),
+            "wait_histogram": self.wait_histogram()
+        }
+        if isinstance(pool, QueuePool):
+            stats.update(size=pool.size(), checked_in=pool.checkedin(), overflow=max(0, pool.overflow()))
+        return stats
+
+
+class MonitoredPoolMixin:
+    """Time every ``connect()`` (checkout) and report it to the attached monitor."""
+
+    monitor: Optional[PoolMonitor] = None
+
+    def connect(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            if self.monitor is not None:
+                self.monitor.observe_wait(time.perf_counter() - started, timed_out)
+
+    def recreate(self):
+        # engine.dispose() swaps in a recreated pool; keep reporting from it
+        pool = super().recreate()
+        pool.monitor = self.monitor
+        if self.monitor is not None:
+            self.monitor._pool = pool
+        return pool
+
+
+class MonitoredQueuePool(MonitoredPoolMixin, QueuePool):
+    pass
+
+
+class MonitoredAsyncAdaptedQueuePool(MonitoredPoolMixin, AsyncAdaptedQueuePool):
+    pass
@@ -0,0 +1,114 @@
+"""
+Prediction history, written off the response path.
+
+``/api/ai/predict`` hands each AI service response to ``PredictionStore``
+and returns it to the client straight away. The store queues it and a
+background task bulk-inserts one ``PredictionLog`` row per file (see
+``write_behind``), so the client never waits on the database and a burst
+of predictions becomes a few multi-row inserts.
+
+Each row carries a compact summary (row count, mean score, rows scored
+positive, model) that the history endpoint reads, plus every per-row
+score packed into one compressed column: little-endian float32, zlib
+compressed. For a 10,000-row file that is roughly 40 KB instead of
+10,000 rows or a JSON array several times larger. Summaries and
+compression are computed on the flush thread. Each batch also updates the
+admin dashboard rollups (see ``rollups``) in the same transaction.
+"""
+import sys
+import zlib
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+import models
+from config import get_settings
+from rollups import apply_rollups
+from write_behind import WriteBehindQueue
+
+# Scores at or above this count as a positive prediction in the summary
+POSITIVE_THRESHOLD = 0.5
+
+
+def encode_scores(scores: Iterable[float]) -> bytes:
+    """Pure function packing scores as zlib-compressed little-endian float32."""
+    packed = array("f", scores)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return zlib.compress(packed.tobytes())
+
+
+def decode_scores(blob: bytes) -> List[float]:
+    """Pure function unpacking scores stored by ``encode_scores``."""
+    packed = array("f")
+    packed.frombytes(zlib.decompress(blob))
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tolist()
+
+
+def summarize_prediction(response: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pure function returning the ``PredictionLog`` columns for an AI service response.
+
+    The response has one score per CSV row in ``predictions``, the model in
+    ``metadata.model_type`` and, when the service provides one, the
+    ``recommended_crop``. The crop is the row's result; otherwise the result
+    summarizes the scores.
+    """
+    scores = [float(score) for score in response.get("predictions") or []]
+    row_count = len(scores)
+    positive_count = sum(1 for score in scores if score >= POSITIVE_THRESHOLD)
+    crop = response.get("recommended_crop")
+    return {
+        "result": crop or f"{positive_count}/{row_count} rows positive",
+        "crop": crop,
+        "model_type": (response.get("metadata") or {}).get("model_type"),
+        "row_count": row_count,
+        "mean_score": sum(scores) / row_count if row_count else None,
+        "positive_count": positive_count,
+        "scores": encode_scores(scores)
+    }
+
+
+class PredictionStore(WriteBehindQueue):
+    """Bounded queue of prediction results flushed to ``prediction_logs`` in batches."""
+
+    model = models.PredictionLog
+    name = "prediction history"
+
+    def record(self, user_id: int, file_name: str, file_digest: str, response: Dict[str, Any]) -> bool:
+        """Queue a prediction. Returns False if it was dropped because the queue is full."""
+        return self.enqueue({
+            "user_id": user_id,
+            "file_name": file_name,
+            "file_digest": file_digest,
+            "created_at": datetime.utcnow(),
+            "response": response
+        })
+
+    def prepare_row(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        row = {key: value for key, value in item.items() if key != "response"}
+        row.update(summarize_prediction(item["response"]))
+        return row
+
+    def after_insert(self, db: Session, rows: List[Dict[str, Any]]) -> None:
+        apply_rollups(db, rows)
+
+
+_prediction_store: Optional[PredictionStore] = None
+
+
+def get_prediction_store() -> PredictionStore:
+    """Return the process-wide prediction store, creating it on first use."""
+    global _prediction_store
+    if _prediction_store is None:
+        settings = get_settings()
+        _prediction_store = PredictionStore(
+            max_queue=settings.PREDICTION_STORE_MAX_QUEUE,
+            batch_size=settings.PREDICTION_STORE_BATCH_SIZE,
+            flush_interval=settings.PREDICTION_STORE_FLUSH_SECONDS
+        )
+    return _prediction_store
@@ -0,0 +1,174 @@
+"""
+Coordinated WorkOS token refresh.
+
+WorkOS refresh tokens are single use, so two requests refreshing the same
+session at once would race and one of them would log the user out.
+``RefreshCoordinator`` runs at most one refresh per session: concurrent
+callers share the result of a single upstream call.
+
+A background task started from the app lifespan also refreshes sessions
+whose access token expires within ``lead_time`` seconds, so user requests
+normally find fresh tokens in the database instead of waiting on WorkOS.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import workos
+from starlette.concurrency import run_in_threadpool
+
+import async_crud
+from cache import SingleFlight
+from config import get_settings
+from database import get_async_session_factory
+
+logger = logging.getLogger(__name__)
+
+RefreshFn = Callable[[str], Awaitable[Dict[str, Any]]]
+
+
+async def workos_refresh(refresh_token: str) -> Dict[str, str]:
+    """Exchange a refresh token with WorkOS, off the event loop."""
+    settings = get_settings()
+    token_response = await run_in_threadpool(
+        workos.user_management.refresh_authentication,
+        refresh_token=refresh_token,
+        client_id=settings.WORKOS_CLIENT_ID
+    )
+    return {
+        "access_token": token_response["access_token"],
+        "refresh_token": token_response["refresh_token"]
+    }
+
+
+class RefreshCoordinator:
+    """Single-flight, proactive refresh of app session tokens."""
+
+    def __init__(
+        self,
+        refresh_fn: RefreshFn = workos_refresh,
+        lead_time: float = 300.0,
+        scan_interval: float = 30.0,
+        max_concurrency: int = 4
+    ):
+        self.refresh_fn = refresh_fn
+        self.lead_time = lead_time
+        self.scan_interval = scan_interval
+        self.max_concurrency = max_concurrency
+        self._flights = SingleFlight()
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes_total = 0
+        self.failures_total = 0
+        self.background_total = 0
+
+    async def start(self) -> None:
+        """Start the background refresh. Called from the app lifespan."""
+        if self._task is None and self.scan_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the background refresh. Called from the app lifespan."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def needs_refresh(self, expires_at: Optional[datetime]) -> bool:
+        return expires_at is None or expires_at < datetime.utcnow() + timedelta(seconds=self.lead_time)
+
+    async def refresh(self, session_id: str, force: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Return fresh tokens for an app session, refreshing them if needed.
+
+        Concurrent calls for the same session share one refresh. If the
+        stored tokens are already fresh (e.g. refreshed in the background)
+        they are returned without calling WorkOS, unless ``force`` is set.
+
+        Returns:
+            ``access_token``, ``refresh_token`` and ``expires_at``, or None
+            if the session does not exist
+
+        Raises:
+            Exception: Whatever the refresh function raised
+        """
+        return await self._flights.do(session_id, lambda: self._refresh(session_id, force))
+
+    async def _refresh(self, session_id: str, force: bool) -> Optional[Dict[str, Any]]:
+        async with get_async_session_factory()() as db:
+            session = await async_crud.get_session_by_id(db, session_id)
+            if session is None or not session.is_active:
+                return None
+            if force or self.needs_refresh(session.expires_at):
+                try:
+                    new_tokens = await self.refresh_fn(session.refresh_token)
+                except Exception:
+                    self.failures_total += 1
+                    raise
+                session = await async_crud.update_session_tokens(db, session.id, new_tokens)
+                self.refreshes_total += 1
+            return {
+                "access_token": session.access_token,
+                "refresh_token": session.refresh_token,
+                "expires_at": session.expires_at
+            }
+
+    async def refresh_expiring(self) -> int:
+        """Refresh every session expiring within the lead time. Returns the count."""
+        now = datetime.utcnow()
+        async with get_async_session_factory()() as db:
+            session_ids = await async_crud.get_session_ids_expiring_between(
+                db, now, now + timedelta(seconds=self.lead_time)
+            )
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def refresh_one(session_id: str) -> bool:
+            async with semaphore:
+                try:
+                    await self.refresh(session_id)
+                    return True
+                except Exception as e:
+                    # Left for the request path, which logs the user out if it fails again
+                    logger.warning(f"Background refresh of session {session_id} failed: {e}")
+                    return False
+
+        results = await asyncio.gather(*(refresh_one(session_id) for session_id in session_ids))
+        self.background_total += sum(results)
+        return sum(results)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh_expiring()
+            except Exception as e:
+                logger.error(f"Background token refresh failed: {e}")
+            await asyncio.sleep(self.scan_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "refreshes_total": self.refreshes_total,
+            "failures_total": self.failures_total,
+            "background_total": self.background_total,
+            "coalesced_total": self._flights.coalesced,
+            "in_flight": len(self._flights)
+        }
+
+
+_coordinator: Optional[RefreshCoordinator] = None
+
+
+def get_refresh_coordinator() -> RefreshCoordinator:
+    """Return the process-wide refresh coordinator, creating it on first use."""
+    global _coordinator
+    if _coordinator is None:
+        settings = get_settings()
+        _coordinator = RefreshCoordinator(
+            lead_time=settings.TOKEN_REFRESH_LEAD_SECONDS,
+            scan_interval=settings.TOKEN_REFRESH_SCAN_INTERVAL,
+            max_concurrency=settings.TOKEN_REFRESH_CONCURRENCY
+        )
+    return _coordinator
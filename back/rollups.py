@@ -0,0 +1,189 @@
+"""
+Daily rollups of prediction history for the admin dashboard.
+
+Scanning ``prediction_logs`` for dashboard aggregates costs O(rows). These
+tables hold the aggregates instead, so the admin endpoints read
+O(days x crops) rows:
+
+- ``daily_crop_rollups``: predictions, rows and positive rows per day and crop
+  (a missing crop counts as ``UNKNOWN_CROP``);
+- ``daily_rollups``: predictions, rows, active users and files processed per day.
+
+``PredictionStore`` calls ``apply_rollups`` in the same transaction as each
+bulk insert, so the rollups stay in step with the history. Counters are
+bumped with ``INSERT ... ON CONFLICT DO UPDATE``, which is safe with
+several workers flushing at once. Distinct users and files are kept
+incrementally through ``daily_active_users`` and ``daily_files``: a day's
+count only goes up when a membership row is actually new.
+
+Days are UTC days of ``created_at``.
+
+``backfill_rollups`` rebuilds the rollups from ``prediction_logs``. It is
+meant for the first deployment, or after a repair. Concurrent writes to
+the days being rebuilt may be lost, so run it while no predictions are
+being recorded, or only for past days:
+
+    python rollups.py [--since YYYY-MM-DD]
+"""
+import argparse
+import logging
+from collections import Counter, defaultdict
+from datetime import date, datetime, time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, distinct, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+
+logger = logging.getLogger(__name__)
+
+# Rollup value of predictions without a recommended crop
+UNKNOWN_CROP = "unknown"
+
+# Dialects with INSERT ... ON CONFLICT
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def rollup_deltas(rows: Iterable[Dict[str, Any]]) -> Tuple[
+    Dict[date, Dict[str, int]],
+    Dict[Tuple[date, str], Dict[str, int]],
+    Set[Tuple[date, int]],
+    Set[Tuple[date, str]]
+]:
+    """
+    Pure function aggregating ``PredictionLog`` rows for the rollups.
+
+    Returns per-day counters, per-(day, crop) counters, and the (day, user)
+    and (day, file digest) pairs seen.
+    """
+    daily: Dict[date, Dict[str, int]] = defaultdict(lambda: {"predictions": 0, "rows_predicted": 0})
+    crops: Dict[Tuple[date, str], Dict[str, int]] = defaultdict(
+        lambda: {"predictions": 0, "rows_predicted": 0, "positive_rows": 0}
+    )
+    users: Set[Tuple[date, int]] = set()
+    files: Set[Tuple[date, str]] = set()
+    for row in rows:
+        day = row["created_at"].date()
+        row_count = row.get("row_count") or 0
+        daily[day]["predictions"] += 1
+        daily[day]["rows_predicted"] += row_count
+        crop = crops[(day, row.get("crop") or UNKNOWN_CROP)]
+        crop["predictions"] += 1
+        crop["rows_predicted"] += row_count
+        crop["positive_rows"] += row.get("positive_count") or 0
+        if row.get("user_id") is not None:
+            users.add((day, row["user_id"]))
+        if row.get("file_digest"):
+            files.add((day, row["file_digest"]))
+    return dict(daily), dict(crops), users, files
+
+
+def _insert(db: Session, model):
+    dialect = db.get_bind().dialect.name
+    if dialect not in UPSERT_INSERTS:
+        raise NotImplementedError(f"Rollups need INSERT ... ON CONFLICT, not available on {dialect}")
+    return UPSERT_INSERTS[dialect](model)
+
+
+def _add_members(db: Session, model, column: str, pairs: Set[Tuple[date, Any]]) -> Counter:
+    """Insert the (day, member) pairs not stored yet. Returns the new members per day."""
+    if not pairs:
+        return Counter()
+    # Sorted, so concurrent flushes lock rows in the same order
+    values = [{"day": day, column: member} for day, member in sorted(pairs)]
+    statement = _insert(db, model).values(values).on_conflict_do_nothing().returning(model.day)
+    return Counter(db.execute(statement).scalars())
+
+
+def _increment(db: Session, model, keys: List[str], values: List[Dict[str, Any]]) -> None:
+    """Add ``values`` to the counters of existing rows, inserting missing ones."""
+    if not values:
+        return
+    statement = _insert(db, model).values(values)
+    counters = [column for column in values[0] if column not in keys]
+    statement = statement.on_conflict_do_update(
+        index_elements=keys,
+        set_={column: getattr(model, column) + getattr(statement.excluded, column) for column in counters}
+    )
+    db.execute(statement)
+
+
+def apply_rollups(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """Add newly inserted ``PredictionLog`` rows to the rollups. The caller commits."""
+    daily, crops, users, files = rollup_deltas(rows)
+    new_users = _add_members(db, models.DailyActiveUser, "user_id", users)
+    new_files = _add_members(db, models.DailyFile, "file_digest", files)
+    _increment(db, models.DailyRollup, ["day"], [
+        {"day": day, **counters, "active_users": new_users[day], "files_processed": new_files[day]}
+        for day, counters in sorted(daily.items())
+    ])
+    _increment(db, models.DailyCropRollup, ["day", "crop"], [
+        {"day": day, "crop": crop, **counters}
+        for (day, crop), counters in sorted(crops.items())
+    ])
+
+
+def backfill_rollups(db: Session, since: Optional[date] = None) -> int:
+    """
+    Rebuild the rollups of every day from ``since`` (all days if None) from ``prediction_logs``.
+
+    Runs as set-based INSERT ... SELECTs in one transaction. Returns the
+    number of days rebuilt.
+    """
+    log = models.PredictionLog
+    day = func.date(log.created_at)
+    in_range = [log.created_at >= datetime.combine(since, time.min)] if since is not None else []
+
+    def rebuilt_days(model) -> List[Any]:
+        return [model.day >= since] if since is not None else []
+
+    for model in (models.DailyRollup, models.DailyCropRollup, models.DailyActiveUser, models.DailyFile):
+        db.execute(delete(model).where(*rebuilt_days(model)))
+
+    db.execute(models.DailyActiveUser.__table__.insert().from_select(
+        ["day", "user_id"],
+        select(day, log.user_id).where(*in_range, log.user_id.isnot(None)).distinct()
+    ))
+    db.execute(models.DailyFile.__table__.insert().from_select(
+        ["day", "file_digest"],
+        select(day, log.file_digest).where(*in_range, log.file_digest.isnot(None)).distinct()
+    ))
+    crop = func.coalesce(log.crop, UNKNOWN_CROP)
+    db.execute(models.DailyCropRollup.__table__.insert().from_select(
+        ["day", "crop", "predictions", "rows_predicted", "positive_rows"],
+        select(
+            day, crop, func.count(),
+            func.coalesce(func.sum(log.row_count), 0),
+            func.coalesce(func.sum(log.positive_count), 0)
+        ).where(*in_range).group_by(day, crop)
+    ))
+    db.execute(models.DailyRollup.__table__.insert().from_select(
+        ["day", "predictions", "rows_predicted", "active_users", "files_processed"],
+        select(
+            day, func.count(),
+            func.coalesce(func.sum(log.row_count), 0),
+            func.count(distinct(log.user_id)),
+            func.count(distinct(log.file_digest))
+        ).where(*in_range).group_by(day)
+    ))
+    days = db.scalar(select(func.count()).select_from(models.DailyRollup).where(*rebuilt_days(models.DailyRollup)))
+    db.commit()
+    return days
+
+
+if __name__ == "__main__":
+    from database import get_session_factory
+
+    parser = argparse.ArgumentParser(description="Rebuild the admin dashboard rollups from prediction history")
+    parser.add_argument("--since", type=date.fromisoformat, help="First UTC day to rebuild (default: all)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    session = get_session_factory()()
+    try:
+        rebuilt = backfill_rollups(session, args.since)
+    finally:
+        session.close()
+    logger.info(f"Rebuilt rollups for {rebuilt} days")
@@ -0,0 +1,89 @@
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+import schemas
+import auth
+from database import get_async_db, query_budget
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"]
+)
+
+# Longest date range one dashboard request may cover
+MAX_RANGE_DAYS = 366
+
+def date_range(since: Optional[date], until: Optional[date]) -> Tuple[date, date]:
+    """Pure function resolving the inclusive UTC day range of a dashboard request
+
+    Defaults to the 30 days ending today.
+
+    Raises:
+        HTTPException: If the range is reversed or longer than MAX_RANGE_DAYS
+    """
+    until = until or datetime.utcnow().date()
+    since = since or until - timedelta(days=29)
+    if since > until:
+        raise HTTPException(status_code=400, detail="since must not be after until")
+    if (until - since).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {MAX_RANGE_DAYS} days")
+    return since, until
+
+@router.get("/stats/daily", response_model=list[schemas.DailyStats])
+@query_budget(3)  # user, session (only when refreshing), rollups
+async def daily_stats(
+    since: Optional[date] = Query(None, description="First UTC day (default: 29 days before until)"),
+    until: Optional[date] = Query(None, description="Last UTC day (default: today)"),
+    db: AsyncSession = Depends(get_async_db),
+    admin: models.User = Depends(auth.require_admin)
+):
+    """Predictions, rows, active users and files processed per day, oldest first; days without predictions are omitted"""
+    since, until = date_range(since, until)
+    rollup = models.DailyRollup
+    return (await db.scalars(
+        select(rollup).where(rollup.day >= since, rollup.day <= until).order_by(rollup.day)
+    )).all()
+
+@router.get("/stats/crops", response_model=list[schemas.CropStats])
+@query_budget(3)  # user, session (only when refreshing), rollups
+async def crop_stats(
+    since: Optional[date] = Query(None, description="First UTC day (default: 29 days before until)"),
+    until: Optional[date] = Query(None, description="Last UTC day (default: today)"),
+    db: AsyncSession = Depends(get_async_db),
+    admin: models.User = Depends(auth.require_admin)
+):
+    """Predictions per crop per day, oldest first"""
+    since, until = date_range(since, until)
+    rollup = models.DailyCropRollup
+    return (await db.scalars(
+        select(rollup).where(rollup.day >= since, rollup.day <= until).order_by(rollup.day, rollup.crop)
+    )).all()
+
+@router.get("/stats/crops/totals", response_model=list[schemas.CropStats])
+@query_budget(3)  # user, session (only when refreshing), rollups
+async def crop_totals(
+    since: Optional[date] = Query(None, description="First UTC day (default: 29 days before until)"),
+    until: Optional[date] = Query(None, description="Last UTC day (default: today)"),
+    db: AsyncSession = Depends(get_async_db),
+    admin: models.User = Depends(auth.require_admin)
+):
+    """Predictions per crop over the whole range, most predicted first"""
+    since, until = date_range(since, until)
+    rollup = models.DailyCropRollup
+    predictions = func.sum(rollup.predictions).label("predictions")
+    rows = await db.execute(
+        select(
+            rollup.crop,
+            predictions,
+            func.sum(rollup.rows_predicted).label("rows_predicted"),
+            func.sum(rollup.positive_rows).label("positive_rows")
+        )
+        .where(rollup.day >= since, rollup.day <= until)
+        .group_by(rollup.crop)
+        .order_by(predictions.desc(), rollup.crop)
+    )
+    return rows.all()
@@ -1,15 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File, status
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-import requests  # For making HTTP requests to the AI microservice
-import json
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+import anyio
+import httpx  # Async HTTP client for the AI microservice
 import logging
 from typing import Dict, Any
 
-from auth import get_current_active_user  # Authentication dependency
-from database import get_db  # Database session dependency
+from ai_client import AIClient, NoReplicaAvailable, content_key, get_ai_client  # Shared, pooled AI microservice client
+from cache import SingleFlight, get_prediction_cache, prediction_cache_key  # Prediction cache
+from auth import get_current_active_user, require_admin  # Authentication dependencies
+from database import get_async_db  # Database session dependency
 from models import User  # User model for type hinting
 from config import get_settings  # For potential future configuration
+from prediction_store import get_prediction_store  # Write-behind prediction history
 
 settings = get_settings()
 router = APIRouter(
@@ -19,82 +22,111 @@ router = APIRouter(
 logger = logging.getLogger(__name__)
 
 # Configuration - Pure values
-AI_MICROSERVICE_BASE_URL = "http://172.28.69.157:1337"  # Base URL for the AI microservice
-AI_PREDICT_ENDPOINT = f"{AI_MICROSERVICE_BASE_URL}/analyze-csv"  # Correct endpoint for CSV analysis
+AI_MICROSERVICE_BASE_URL = settings.AI_MICROSERVICE_BASE_URL  # Base URL for the AI microservice
+AI_PREDICT_PATH = "/analyze-csv"  # Correct endpoint for CSV analysis
+AI_PREDICT_ENDPOINT = f"{AI_MICROSERVICE_BASE_URL}{AI_PREDICT_PATH}"
+
+# Concurrent uploads of the same file under the same model share one upstream call
+_predictions = SingleFlight()
+
+# Connection-specific headers that must not be forwarded by a proxy (RFC 9110)
+HOP_BY_HOP_HEADERS = frozenset({
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailer', 'transfer-encoding', 'upgrade'
+})
 
 # Pure function to construct API URLs
 def get_ai_endpoint(path: str) -> str:
     """Pure function to construct AI microservice endpoint URLs"""
     return f"{AI_MICROSERVICE_BASE_URL}/{path}"
 
+def failed_url(error: httpx.HTTPError) -> str:
+    """Pure function returning the replica URL a failed request was sent to"""
+    try:
+        return str(error.request.url)
+    except RuntimeError:
+        # Raised before a request was built
+        return "unknown URL"
+
+
+class UpstreamStreamingResponse(StreamingResponse):
+    """
+    Relays a response opened with ``AIClient.open_stream`` chunk by chunk.
+
+    The upstream response is released once streaming ends, however it ends:
+    a background task would be skipped when the client disconnects, leaking
+    the connection and the client's in-flight count.
+    """
+
+    def __init__(self, client: AIClient, upstream: httpx.Response):
+        super().__init__(
+            upstream.aiter_raw(),
+            status_code=upstream.status_code,
+            headers={
+                key: value for key, value in upstream.headers.items()
+                if key.lower() not in HOP_BY_HOP_HEADERS
+            }
+        )
+        self.client = client
+        self.upstream = upstream
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self.client.close_stream(self.upstream)
+
+
 @router.post("/forward/{path:path}")
 @router.get("/forward/{path:path}") # Add GET support
 async def forward_to_ai_microservice(
     path: str, # Captures the rest of the path
     request: Request,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user) # Ensures user is authenticated
 ):
     """
     Authenticated endpoint to forward requests to the AI microservice.
     It captures the path and forwards the request body, method, and relevant headers.
+    
+    Both directions are streamed: the request body is sent upstream as it
+    arrives and the upstream response is relayed as-is, so memory per
+    proxied request stays at one chunk.
     """
-    target_url = f"{AI_MICROSERVICE_BASE_URL}/{path}"
-
-    # Prepare data and headers for the forwarded request
-    data = await request.body()
+    # Forward headers except hop-by-hop ones and the user's cookies
     headers = {
         key: value for key, value in request.headers.items()
-        if key.lower() not in ['host', 'connection', 'accept-encoding', 'content-length'] # Filter out problematic headers
+        if key.lower() not in HOP_BY_HOP_HEADERS | {'host', 'cookie'}
     }
+    has_body = request.headers.get('content-length', '0') != '0' or 'transfer-encoding' in request.headers
     # Ensure Content-Type is preserved or set
-    if 'content-type' not in headers and data:
+    if 'content-type' not in headers and has_body:
         headers['content-type'] = 'application/json' # Default if not present and body exists
 
+    client = get_ai_client()
     try:
-        method = request.method.upper()
-        
-        response = requests.request(
-            method=method,
-            url=target_url,
+        # Stream the request body upstream instead of buffering it
+        upstream = await client.open_stream(
+            request.method.upper(),
+            f"/{path}",
             headers=headers,
-            data=data,
-            params=request.query_params,
-            timeout=30 # Adding a timeout
-        )
-
-        response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
-
-        # Try to parse JSON, otherwise return raw content
-        try:
-            response_json = response.json()
-            return JSONResponse(content=response_json, status_code=response.status_code)
-        except json.JSONDecodeError:
-            # If not JSON, return raw text content with appropriate content type
-            # For simplicity, we'll return as JSON with a detail field for non-JSON responses
-            # A more robust solution might inspect response.headers['Content-Type']
-            return JSONResponse(content={"detail": response.text}, status_code=response.status_code)
-
-    except requests.exceptions.ConnectionError:
-        raise HTTPException(status_code=503, detail=f"AI microservice unavailable at {target_url}")
-    except requests.exceptions.Timeout:
-        raise HTTPException(status_code=504, detail=f"AI microservice request timed out for {target_url}")
-    except requests.exceptions.HTTPError as e:
-        error_detail = f"AI microservice error: {e.response.status_code}"
-        try:
-            error_content = e.response.json()
-        except json.JSONDecodeError:
-            error_content = e.response.text
-        
-        print(f"AI Microservice Error Content: {error_content}")
-        return JSONResponse(
-            content={"detail": error_detail, "microservice_response": error_content},
-            status_code=e.response.status_code
+            content=request.stream() if has_body else None,
+            params=request.query_params
         )
+    except NoReplicaAvailable as e:
+        raise HTTPException(status_code=503, detail=f"AI microservice unavailable: {str(e)}")
+    except httpx.ConnectError as e:
+        raise HTTPException(status_code=503, detail=f"AI microservice unavailable at {failed_url(e)}")
+    except httpx.TimeoutException as e:
+        raise HTTPException(status_code=504, detail=f"AI microservice request timed out for {failed_url(e)}")
     except Exception as e:
         logger.error(f"Unexpected error forwarding to AI microservice: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error while forwarding request: {str(e)}")
 
+    # Stream the upstream response back chunk by chunk, status, content type
+    # and encoding unchanged. The upstream connection is released once sent.
+    return UpstreamStreamingResponse(client, upstream)
+
 
 def validate_file_extension(filename: str) -> bool:
     """
@@ -110,12 +142,47 @@ def validate_file_extension(filename: str) -> bool:
 
 
 async def process_csv_with_ai(file_content: bytes, filename: str) -> Dict[str, Any]:
+    """
+    Get the AI microservice's predictions for a CSV file.
+    
+    Responses are cached by file digest and AI_MODEL_VERSION (in every worker
+    when CACHE_REDIS_URL is set), so re-submitting a file is answered without
+    an upstream call, and identical uploads that
+    arrive together share one call. Errors are not cached.
+    
+    Args:
+        file_content: Raw bytes of the CSV file
+        filename: Name of the file
+        
+    Returns:
+        Dict[str, Any]: JSON response from the AI microservice (shared; do not modify)
+        
+    Raises:
+        HTTPException: If there's an error communicating with the microservice
+    """
+    file_digest = content_key(file_content)
+    cache = get_prediction_cache()
+    cache_key = prediction_cache_key(file_digest, settings.AI_MODEL_VERSION)
+    cached = await cache.aget(cache_key)
+    if cached is not None:
+        return cached
+
+    async def predict() -> Dict[str, Any]:
+        result = await request_prediction(file_content, filename, file_digest)
+        await cache.aset(cache_key, result)
+        return result
+
+    return await _predictions.do(cache_key, predict)
+
+
+async def request_prediction(file_content: bytes, filename: str, file_digest: str) -> Dict[str, Any]:
     """
     Pure function to process a CSV file with the AI microservice.
     
     Args:
         file_content: Raw bytes of the CSV file
         filename: Name of the file
+        file_digest: content_key of the file, used to route it to a replica
         
     Returns:
         Dict[str, Any]: JSON response from the AI microservice
@@ -128,40 +195,41 @@ async def process_csv_with_ai(file_content: bytes, filename: str) -> Dict[str, A
         files = {'file': (filename, file_content, 'text/csv')}
         
         # Log the request attempt
-        logger.info(f"Sending request to AI microservice at {AI_PREDICT_ENDPOINT}")
+        logger.info(f"Sending {filename} to AI microservice {AI_PREDICT_PATH}")
         
-        # Make the request with proper error handling
-        response = requests.post(
-            AI_PREDICT_ENDPOINT,
-            files=files,
-            timeout=30  # 30 seconds timeout
+        # Make the request over the shared connection pool
+        response = await get_ai_client().request(
+            "POST",
+            AI_PREDICT_PATH,
+            affinity_key=file_digest,
+            files=files
         )
         
         # Log the response status
-        logger.info(f"AI microservice response status: {response.status_code}")
+        logger.info(f"AI microservice {response.request.url} response status: {response.status_code}")
         
         # Handle HTTP errors
         response.raise_for_status()
         
         # Return the parsed JSON response
         return response.json()
-    except requests.exceptions.ConnectionError as e:
+    except httpx.ConnectError as e:
         # Connection errors (e.g., service not running, network issues)
-        error_msg = f"Cannot connect to AI microservice at {AI_PREDICT_ENDPOINT}: {str(e)}"
+        error_msg = f"Cannot connect to AI microservice at {failed_url(e)}: {str(e)}"
         logger.error(error_msg)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"AI microservice unavailable: {str(e)}"
         )
-    except requests.exceptions.Timeout as e:
+    except httpx.TimeoutException as e:
         # Timeout errors
-        error_msg = f"Timeout connecting to AI microservice: {str(e)}"
+        error_msg = f"Timeout connecting to AI microservice at {failed_url(e)}: {str(e)}"
         logger.error(error_msg)
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail="AI microservice request timed out"
         )
-    except requests.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         # HTTP errors from the microservice
         error_msg = f"AI microservice returned error: {str(e)}"
         logger.error(error_msg)
@@ -169,7 +237,7 @@ async def process_csv_with_ai(file_content: bytes, filename: str) -> Dict[str, A
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail=f"AI microservice error: {str(e)}"
         )
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         # All other request errors
         error_msg = f"Error calling AI microservice: {str(e)}"
         logger.error(error_msg)
@@ -197,6 +265,25 @@ async def test_connection():
     """Test endpoint to verify API connectivity without authentication"""
     return {"status": "success", "message": "AI service API is accessible"}
 
+@router.get("/pool-stats")
+async def ai_pool_stats(admin: User = Depends(require_admin)):
+    """Connection pool utilization of the shared AI microservice client"""
+    return get_ai_client().stats()
+
+@router.get("/prediction-cache-stats")
+async def prediction_cache_stats(admin: User = Depends(require_admin)):
+    """Hit rate and size of the prediction cache, and upstream calls shared by identical uploads"""
+    return {
+        **get_prediction_cache().stats(),
+        "upstream_calls": _predictions.calls,
+        "coalesced": _predictions.coalesced
+    }
+
+@router.get("/prediction-store-stats")
+async def prediction_store_stats(admin: User = Depends(require_admin)):
+    """Queue depth, flush and drop counters of the write-behind prediction history"""
+    return get_prediction_store().stats()
+
 @router.get("/test-auth")
 async def test_auth_connection(current_user: User = Depends(get_current_active_user)):
     """Test endpoint to verify authentication is working"""
@@ -212,8 +299,7 @@ async def test_auth_connection(current_user: User = Depends(get_current_active_u
 
 @router.post("/predict-test", include_in_schema=True)
 async def predict_from_csv_test(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    file: UploadFile = File(...)
 ) -> JSONResponse:
     """
     Test endpoint to accept a CSV file and forward it to the AI microservice without authentication.
@@ -221,7 +307,6 @@ async def predict_from_csv_test(
     
     Args:
         file: CSV file to process
-        db: Database session
         
     Returns:
         JSONResponse: Response from the AI microservice
@@ -259,7 +344,7 @@ async def predict_from_csv_test(
 @router.post("/predict")
 async def predict_from_csv(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ) -> JSONResponse:
     """
@@ -291,6 +376,10 @@ async def predict_from_csv(
         # Log the prediction request
         logger.info(f"Prediction requested by user {current_user.id} for file {file.filename}")
         
+        # Record it in the user's history; written in the background, after the response
+        if not get_prediction_store().record(current_user.id, file.filename, content_key(file_content), result):
+            logger.warning(f"Prediction history queue full, not recording {file.filename}")
+        
         # Return the AI microservice response
         return JSONResponse(content=result)
         
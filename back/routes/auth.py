@@ -1,16 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, Response, Body
 from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from jose import jwt
-from typing import Dict, Any
 import workos
+import async_crud
 import crud
-import json
-import requests
 from datetime import datetime
-from database import get_db
+from database import get_async_db, get_db, query_budget
 from config import get_settings
-from functools import lru_cache
+from cache import get_session_cache, get_token_cache
+from jwks import get_jwks_store
+from refresh import get_refresh_coordinator
+from session_tokens import SESSION_TOKEN_COOKIE, get_revocation_list
+from auth import require_admin, validate_workos_token
+import models
 
 # Initialize WorkOS client
 settings = get_settings()
@@ -20,45 +24,6 @@ workos.redirect_uri = settings.WORKOS_REDIRECT_URI
 
 router = APIRouter()
 
-# WorkOS JWKS URL for token validation
-WORKOS_JWKS_URL = "https://api.workos.com/.well-known/jwks.json"
-
-@lru_cache(maxsize=1)
-def get_workos_jwks() -> Dict[str, Any]:
-    """Fetch and cache WorkOS JWKS (JSON Web Key Set)"""
-    response = requests.get(WORKOS_JWKS_URL)
-    response.raise_for_status()
-    return response.json()
-
-def get_jwk_by_kid(token: str) -> Dict[str, Any]:
-    """Extract the key ID from token header and find the matching JWK"""
-    unverified_header = jwt.get_unverified_header(token)
-    kid = unverified_header.get("kid")
-    if not kid:
-        raise ValueError("No 'kid' in token header")
-        
-    jwks = get_workos_jwks()
-    for jwk in jwks.get("keys", []):
-        if jwk.get("kid") == kid:
-            return jwk
-            
-    raise ValueError(f"No JWK found for kid: {kid}")
-
-def validate_workos_token(token: str) -> Dict[str, Any]:
-    """Validate a WorkOS JWT token using JWKS"""
-    try:
-        jwk = get_jwk_by_kid(token)
-        public_key = jwt.algorithms.RSAAlgorithm.from_jwk(json.dumps(jwk))
-        payload = jwt.decode(
-            token,
-            public_key,
-            algorithms=["RS256"],
-            audience=settings.WORKOS_CLIENT_ID
-        )
-        return payload
-    except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Invalid WorkOS token: {str(e)}")
-
 @router.get("/api/auth/login")
 async def login():
     """
@@ -152,7 +117,7 @@ async def callback(
 
 
 @router.post("/auth/logout")
-async def logout(request: Request, db: Session = Depends(get_db)):
+async def logout(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Handles backend part of user logout by:
     1. Identifying the local application session from the 'session_token' cookie.
@@ -169,12 +134,13 @@ async def logout(request: Request, db: Session = Depends(get_db)):
 
     if session_id_from_cookie:
         try:
-            payload = validate_workos_token(session_id_from_cookie)
+            payload = await validate_workos_token(session_id_from_cookie)
             workos_session_id = payload.get("sid")
             user_id_for_logging = payload.get("sub")
 
             if workos_session_id:
-                crud.invalidate_session(db, workos_session_id)
+                # Awaited so no worker serves the session from the shared cache once we answer
+                await async_crud.invalidate_session(db, workos_session_id=workos_session_id)
             # Attempt to get WorkOS session ID from the token to invalidate WorkOS session via frontend
             try:
                 # The session_id_from_cookie is the WorkOS access_token
@@ -186,7 +152,7 @@ async def logout(request: Request, db: Session = Depends(get_db)):
                     response_content["workos_session_id_for_logout"] = workos_sid
                 
                 if workos_user_id_for_db_ops:
-                    db_user = crud.get_user_by_workos_id(db, workos_user_id_for_db_ops)
+                    db_user = await async_crud.get_user_by_workos_id(db, workos_user_id_for_db_ops)
                     if db_user:
                         user_id_for_logging = db_user.id
                         # If you have a specific local session to invalidate in DB tied to workos_sid or user_id:
@@ -210,7 +176,7 @@ async def logout(request: Request, db: Session = Depends(get_db)):
 
         if user_id_for_logging:
             try:
-                crud.create_activity_log(db, user_id_for_logging, "logout_backend_part")
+                await async_crud.create_activity_log(db, user_id_for_logging, "logout_backend_part")
             except Exception as log_error:
                 print(f"Error logging backend logout activity: {log_error}")
     else:
@@ -221,19 +187,21 @@ async def logout(request: Request, db: Session = Depends(get_db)):
     return final_response
 
 def _clear_session_cookie(response: Response) -> None:
-    """Helper to clear the session cookie with proper attributes"""
-    response.delete_cookie(
-        key="workos_access_token",
-        path="/",
-        domain=None,  # Let browser use the current domain
-        secure=settings.ENVIRONMENT == "production", # True in production
-        httponly=True,
-        samesite="lax"
-    )
+    """Helper to clear the session cookies with proper attributes"""
+    for key in ("workos_access_token", SESSION_TOKEN_COOKIE):
+        response.delete_cookie(
+            key=key,
+            path="/",
+            domain=None,  # Let browser use the current domain
+            secure=settings.ENVIRONMENT == "production", # True in production
+            httponly=True,
+            samesite="lax"
+        )
 
 
 @router.get("/api/auth/me")
-async def get_me(request: Request, db: Session = Depends(get_db)):
+@query_budget(4)  # user, session, session activity (select + update)
+async def get_me(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Returns the current authenticated user's info if the WorkOS session is valid, else 401.
     """
@@ -243,7 +211,7 @@ async def get_me(request: Request, db: Session = Depends(get_db)):
         
     try:
         # Validate WorkOS token
-        payload = validate_workos_token(access_token)
+        payload = await validate_workos_token(access_token)
         workos_user_id = payload.get("sub")
         session_id = payload.get("sid")
         
@@ -251,17 +219,17 @@ async def get_me(request: Request, db: Session = Depends(get_db)):
             raise HTTPException(status_code=401, detail="Invalid token claims")
         
         # Get user from our database by WorkOS user ID
-        user = crud.get_user_by_workos_id(db, workos_user_id)
+        user = await async_crud.get_user_by_workos_id(db, workos_user_id)
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
             
         # Get current session info
-        session = crud.get_app_session_by_workos_session_id(db, session_id)
+        session = await async_crud.get_app_session_by_workos_session_id(db, session_id)
         if not session:
             raise HTTPException(status_code=401, detail="Invalid session")
         
         # Update last activity
-        crud.update_session_activity(db, session.id)
+        await async_crud.update_session_activity(db, session.id)
             
         return {
             "id": user.id,
@@ -279,37 +247,28 @@ async def get_me(request: Request, db: Session = Depends(get_db)):
         raise HTTPException(status_code=401, detail=f"Authentication error: {str(e)}")
 
 
-# Helper function to refresh an expired WorkOS token
-async def refresh_workos_token(refresh_token: str) -> Dict[str, str]:
-    """
-    Use a refresh token to get a new access token from WorkOS.
-    Returns a dict with new access_token and refresh_token.
-    """
-    try:
-        token_response = workos.user_management.refresh_authentication(
-            refresh_token=refresh_token,
-            client_id=settings.WORKOS_CLIENT_ID
-        )
-        return {
-            "access_token": token_response["access_token"],
-            "refresh_token": token_response["refresh_token"]
-        }
-    except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Failed to refresh token: {str(e)}")
+@router.get("/api/auth/cache-stats")
+async def auth_cache_stats(admin: models.User = Depends(require_admin)):
+    """Hit rate and size of the in-process session and verified-token caches"""
+    return {
+        "sessions": get_session_cache().stats(),
+        "tokens": get_token_cache().stats()
+    }
 
-# Helper function to check if a token needs refreshing
-def token_needs_refresh(payload: Dict[str, Any]) -> bool:
-    """
-    Check if a token is close to expiration and needs refreshing.
-    Returns True if token expires in less than 5 minutes.
-    """
-    exp = payload.get("exp")
-    if not exp:
-        return False
-        
-    expiration = datetime.fromtimestamp(exp)
-    now = datetime.utcnow()
-    time_left = expiration - now
-    
-    # Refresh if less than 5 minutes left
-    return time_left.total_seconds() < 300  # 5 minutes in seconds
+
+@router.get("/api/auth/jwks-stats")
+async def jwks_stats(admin: models.User = Depends(require_admin)):
+    """Known key IDs, age and fetch counters of the shared JWKS key store"""
+    return get_jwks_store().stats()
+
+
+@router.get("/api/auth/refresh-stats")
+async def refresh_stats(admin: models.User = Depends(require_admin)):
+    """Upstream refreshes, failures and coalesced callers of the token refresh coordinator"""
+    return get_refresh_coordinator().stats()
+
+
+@router.get("/api/auth/revocation-stats")
+async def revocation_stats(admin: models.User = Depends(require_admin)):
+    """Size and sync state of the signed session token revocation list"""
+    return get_revocation_list().stats()
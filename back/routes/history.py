@@ -1,46 +1,80 @@
-from fastapi import APIRouter, Depends, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import models
-import crud
+import async_crud
 from schemas import PredictionLog
-from database import get_db
+from database import get_async_db, query_budget
 from auth import get_current_user
-from typing import List
+from pagination import finish_page, keyset_page
+from typing import Any, List, Optional
 
 router = APIRouter(
     prefix="/history",
     tags=["Historial"]
 )
 
-def get_user_predictions(db: Session, user_id: int) -> List[models.PredictionLog]:
-    """Pure function to get user prediction logs
+# Columns served by the history endpoint; loaded as plain row tuples, not ORM objects
+HISTORY_COLUMNS = (
+    models.PredictionLog.id,
+    models.PredictionLog.user_id,
+    models.PredictionLog.created_at,
+    models.PredictionLog.result,
+    models.PredictionLog.file_name,
+    models.PredictionLog.row_count,
+    models.PredictionLog.mean_score
+)
+
+# Page size when a cursor is given without a limit
+DEFAULT_PAGE_SIZE = 50
+
+async def get_user_predictions(db: AsyncSession, user_id: int, limit: Optional[int], cursor: Optional[str] = None) -> List[Any]:
+    """Pure function to get one page of user prediction logs, newest first
     
     Following functional programming principles:
     - Pure function with no side effects
-    - Returns immutable result
+    - Returns immutable result (column tuples)
     - Referentially transparent
+    
+    Uses keyset pagination on (created_at, id), served by the
+    (user_id, created_at desc, id desc) index. Returns up to limit + 1 rows,
+    or every row when limit is None.
     """
-    return (
-        db.query(models.PredictionLog)
-        .filter(models.PredictionLog.user_id == user_id)
-        .order_by(models.PredictionLog.created_at.desc())
-        .all()
-    )
+    query = select(*HISTORY_COLUMNS).where(models.PredictionLog.user_id == user_id)
+    return (await db.execute(keyset_page(
+        query, models.PredictionLog.created_at, models.PredictionLog.id, cursor, limit
+    ))).all()
 
 @router.get(
     "/",
     response_model=list[PredictionLog],
     summary="Historial de predicciones del usuario",
-    description="Devuelve una lista de predicciones realizadas por el usuario actual, incluyendo fecha, resultado y archivo enviado."
+    description=(
+        "Devuelve las predicciones realizadas por el usuario actual, incluyendo fecha, resultado y "
+        "archivo enviado. Sin limit ni cursor devuelve todas; con limit, una página, y la cabecera "
+        "X-Next-Cursor contiene el cursor de la siguiente página."
+    )
 )
+@query_budget(3)  # user, session (only when refreshing), page
 async def get_prediction_history(
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: Optional[int] = Query(
+        None, ge=1, le=500,
+        description=f"Tamaño de página; {DEFAULT_PAGE_SIZE} si se da un cursor. Sin limit ni cursor se devuelven todas"
+    ),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Get prediction history for the current user"""
+    """Get prediction history for the current user, newest first, paginated when a limit or cursor is given"""
     # Log this activity
-    crud.create_activity_log(db, current_user.id, "Viewed prediction history")
+    await async_crud.create_activity_log(db, current_user.id, "Viewed prediction history")
+    
+    # Unpaginated clients (neither limit nor cursor) keep getting the full list
+    if limit is None and cursor is not None:
+        limit = DEFAULT_PAGE_SIZE
     
     # Return predictions using pure function
-    return get_user_predictions(db, current_user.id)
\ No newline at end of file
+    rows = await get_user_predictions(db, current_user.id, limit, cursor)
+    return finish_page(rows, limit, response)
\ No newline at end of file
@@ -1,32 +1,95 @@
-from fastapi import APIRouter, Depends, Request
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import models
 import schemas
-import crud
+import async_crud
 import auth
-from database import get_db
+from config import get_settings
+from database import get_async_db, query_budget
+from activity_logger import get_activity_logger
+from pagination import estimate_count, finish_page, keyset_page
 
 router = APIRouter()
 
+def filter_logs(
+    current_user: models.User,
+    user_id: Optional[int] = None,
+    log_type: Optional[models.LogTypeEnum] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """Pure function building the select of logs visible to a user
+    
+    Non-admins only ever see their own logs; admins see every log unless
+    they narrow it to one user. Each filter combination leads with a column
+    of one of the (..., created_at, id) indexes on logs.
+    """
+    query = select(models.Log)
+    if not current_user.is_admin:
+        query = query.filter(models.Log.user_id == current_user.id)
+    elif user_id is not None:
+        query = query.filter(models.Log.user_id == user_id)
+    if log_type is not None:
+        query = query.filter(models.Log.type == log_type)
+    if since is not None:
+        query = query.filter(models.Log.created_at >= since)
+    if until is not None:
+        query = query.filter(models.Log.created_at < until)
+    return query
+
 @router.get("/logs/", response_model=list[schemas.Log])
+@query_budget(3)  # user, session (only when refreshing), page
 async def read_logs(
     request: Request,
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    skip: Optional[int] = Query(
+        None, ge=0, deprecated=True,
+        description="Deprecated offset, kept for older clients; use cursor instead"
+    ),
+    type: Optional[models.LogTypeEnum] = None,
+    since: Optional[datetime] = Query(None, description="Only logs created at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only logs created before this time"),
+    user_id: Optional[int] = Query(None, description="Admins only: logs of this user"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
-    """Get logs with authentication"""
-    # Only return logs for the current user unless they're an admin
-    if current_user.is_admin:
-        return db.query(models.Log).offset(skip).limit(limit).all()
-    return db.query(models.Log).filter(models.Log.user_id == current_user.id).offset(skip).limit(limit).all()
+    """Get one page of logs, newest first"""
+    if skip is not None and cursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Use either skip or cursor, not both")
+    query = filter_logs(current_user, user_id, type, since, until)
+    page = keyset_page(query, models.Log.created_at, models.Log.id, cursor, limit)
+    if skip:
+        # Reads and discards every skipped row; the returned cursor continues without it
+        page = page.offset(skip)
+    rows = (await db.scalars(page)).all()
+    return finish_page(rows, limit, response)
+
+@router.get("/logs/count")
+@query_budget(4)  # user, session (only when refreshing), EXPLAIN, count
+async def count_logs(
+    type: Optional[models.LogTypeEnum] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Number of logs matching the same filters as GET /logs/, estimated for large results"""
+    query = filter_logs(current_user, user_id, type, since, until)
+    return await estimate_count(db, query, get_settings().LOGS_COUNT_EXACT_THRESHOLD)
 
 @router.post("/logs/", response_model=schemas.Log)
+@query_budget(4)  # user, session (only when refreshing), insert, reload
 async def create_log(
     log: schemas.LogCreate, 
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
     """Create a new log with the current user ID"""
@@ -36,10 +99,15 @@ async def create_log(
     
     db_log = models.Log(**log_data)
     db.add(db_log)
-    db.commit()
-    db.refresh(db_log)
+    await db.commit()
+    await db.refresh(db_log)
     
     # Log the activity
-    crud.create_activity_log(db, current_user.id, f"Created log of type {log.type}")
+    await async_crud.create_activity_log(db, current_user.id, f"Created log of type {log.type}")
     
-    return db_log
\ No newline at end of file
+    return db_log
+
+@router.get("/logs/activity-stats")
+async def activity_log_stats(admin: models.User = Depends(auth.require_admin)):
+    """Queue depth, flush and drop counters of the write-behind activity logger"""
+    return get_activity_logger().stats()
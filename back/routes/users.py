@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import schemas
+import async_crud
 import crud
 import models
 import auth
-from database import get_db
+from database import get_async_db, query_budget
 
 router = APIRouter()
 
@@ -26,29 +28,27 @@ def get_user_profile(user: models.User) -> dict:
     }
 
 @router.get("/users/me/", response_model=schemas.UserInDB)
+@query_budget(2)  # user, session (only when refreshing)
 async def read_users_me(
     request: Request,
     response: Response, # Added Response
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
     """Get current user profile"""
     # Log this activity
-    crud.create_activity_log(db, current_user.id, "Viewed profile")
+    await async_crud.create_activity_log(db, current_user.id, "Viewed profile")
     
     # Return user profile using pure function
     return current_user
 
 @router.get("/users/me/sessions/", response_model=list[schemas.SessionInfo])
+@query_budget(3)  # user, session (only when refreshing), sessions
 async def read_user_sessions(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
     """Get all active sessions for the current user"""
     # Return all sessions for this user
-    sessions = db.query(models.AppSession).filter(
-        models.AppSession.user_id == current_user.id
-    ).all()
-    
-    return sessions
\ No newline at end of file
+    return await async_crud.get_user_sessions(db, current_user.id)
\ No newline at end of file
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 
 # --- User Schemas ---
 class UserBase(BaseModel):
@@ -22,7 +22,7 @@ class UserInDB(UserBase):
 
 # --- Session Schemas ---
 class SessionInfo(BaseModel):
-    id: int
+    id: str
     user_id: int
     workos_session_id: str
     ip_address: Optional[str] = None
@@ -64,6 +64,31 @@ class PredictionLog(BaseModel):
     created_at: datetime  # When the prediction was made
     result: str  # Result of the prediction
     file_name: Optional[str] = None  # Name of the file that was submitted
+    row_count: Optional[int] = None  # Number of rows predicted
+    mean_score: Optional[float] = None  # Mean of the per-row scores
+
+    class Config:
+        from_attributes = True
+
+# --- Admin Dashboard Schemas ---
+class DailyStats(BaseModel):
+    """Per-day prediction totals for the admin dashboard."""
+    day: date
+    predictions: int
+    rows_predicted: int
+    active_users: int  # Distinct users who made a prediction that day
+    files_processed: int  # Distinct files (by digest) predicted that day
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class CropStats(BaseModel):
+    """Prediction totals of one crop, per day or over a date range."""
+    day: Optional[date] = None  # None for totals over the requested range
+    crop: str  # "unknown" when the AI service returned no crop
+    predictions: int
+    rows_predicted: int
+    positive_rows: int
+
+    class Config:
+        from_attributes = True
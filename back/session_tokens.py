@@ -0,0 +1,199 @@
+"""
+Stateless signed session tokens.
+
+With ``STATELESS_SESSIONS`` enabled, the backend issues its own short-lived
+session cookie once a session has been resolved against the database. The
+cookie carries the user id, role and app session id, signed with
+HMAC-SHA256 and ``SECRET_KEY``. Requests that present a valid, unexpired
+token are authenticated without touching the database.
+
+Logout cannot take back a token that has already been issued, so revoked
+session ids are recorded in ``session_revocations`` and held in an
+in-memory ``RevocationList``. The worker that handles the logout sees it
+immediately. Other workers pick it up on their next sync, every
+``SESSION_REVOCATION_SYNC_SECONDS``. A revocation only needs to be kept
+until the last token issued before it has expired.
+
+Token format: ``base64url(json claims) + "." + base64url(hmac)``.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+
+import models
+from config import get_settings
+from database import get_async_session_factory
+
+logger = logging.getLogger(__name__)
+
+# Cookie holding the signed session token
+SESSION_TOKEN_COOKIE = "app_session"
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: bytes, secret: str) -> bytes:
+    return base64.urlsafe_b64encode(hmac.new(secret.encode("utf-8"), payload, hashlib.sha256).digest()).rstrip(b"=")
+
+
+def issue_session_token(
+    user_id: int,
+    session_id: str,
+    role: str,
+    secret: str,
+    ttl: float,
+    now: Optional[float] = None
+) -> str:
+    """Pure function returning a signed token for a resolved session."""
+    issued_at = int(time.time() if now is None else now)
+    claims = {"uid": user_id, "sid": session_id, "role": role, "iat": issued_at, "exp": issued_at + int(ttl)}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_sign(payload.encode('ascii'), secret).decode('ascii')}"
+
+
+def verify_session_token(token: Optional[str], secret: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    Pure function returning the claims of a valid, unexpired token, or None.
+
+    The signature is compared in constant time before the payload is parsed.
+    Tokens come straight from a cookie, so malformed or non-ASCII ones are
+    rejected rather than raising.
+    """
+    if not token or not secret or token.count(".") != 1:
+        return None
+    payload, signature = token.split(".")
+    try:
+        payload_bytes, signature_bytes = payload.encode("ascii"), signature.encode("ascii")
+    except UnicodeError:
+        return None
+    if not hmac.compare_digest(signature_bytes, _sign(payload_bytes, secret)):
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, TypeError, UnicodeError):
+        return None
+    if not isinstance(claims, dict) or claims.get("exp", 0) <= (time.time() if now is None else now):
+        return None
+    return claims
+
+
+class RevocationList:
+    """Revoked app session ids, synced from ``session_revocations``."""
+
+    def __init__(self, retention: float, sync_interval: float = 10.0):
+        self.retention = retention
+        self.sync_interval = sync_interval
+        self._revoked: Dict[str, datetime] = {}
+        self._synced_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.syncs_total = 0
+        self.rejected_total = 0
+
+    async def start(self) -> None:
+        """Start the background sync. Called from the app lifespan."""
+        if self._task is None and self.sync_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the background sync. Called from the app lifespan."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Session revocation sync failed: {e}")
+            await asyncio.sleep(self.sync_interval)
+
+    def revoke(self, session_id: str, until: datetime) -> None:
+        with self._lock:
+            self._revoked[str(session_id)] = until
+
+    def is_revoked(self, session_id: str) -> bool:
+        revoked = session_id in self._revoked
+        if revoked:
+            self.rejected_total += 1
+        return revoked
+
+    async def sync(self) -> int:
+        """Load revocations recorded since the last sync and prune expired ones."""
+        now = datetime.utcnow()
+        # Overlap syncs a little so rows committed late by other workers are not missed
+        since = (self._synced_at - timedelta(seconds=self.sync_interval)) if self._synced_at \
+            else now - timedelta(seconds=self.retention)
+        async with get_async_session_factory()() as db:
+            rows = (await db.execute(
+                select(models.SessionRevocation.session_id, models.SessionRevocation.expires_at).where(
+                    models.SessionRevocation.revoked_at >= since,
+                    models.SessionRevocation.expires_at > now
+                )
+            )).all()
+
+        with self._lock:
+            for session_id, expires_at in rows:
+                self._revoked[session_id] = expires_at
+            self._revoked = {sid: until for sid, until in self._revoked.items() if until > now}
+        self._synced_at = now
+        self.syncs_total += 1
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "revoked": len(self._revoked),
+            "synced_at": self._synced_at,
+            "syncs_total": self.syncs_total,
+            "rejected_total": self.rejected_total
+        }
+
+
+_revocation_list: Optional[RevocationList] = None
+
+
+def get_revocation_list() -> RevocationList:
+    """Return the process-wide revocation list, creating it on first use."""
+    global _revocation_list
+    if _revocation_list is None:
+        settings = get_settings()
+        _revocation_list = RevocationList(
+            retention=settings.SESSION_TOKEN_TTL_SECONDS,
+            sync_interval=settings.SESSION_REVOCATION_SYNC_SECONDS
+        )
+    return _revocation_list
+
+
+def record_revocation(db, session_id: str, user_id: Optional[int] = None) -> None:
+    """
+    Revoke the signed tokens of an app session, locally and for other workers.
+
+    Does nothing unless stateless sessions are enabled. The caller commits.
+    """
+    settings = get_settings()
+    if not settings.STATELESS_SESSIONS:
+        return
+    now = datetime.utcnow()
+    until = now + timedelta(seconds=settings.SESSION_TOKEN_TTL_SECONDS)
+    db.add(models.SessionRevocation(session_id=str(session_id), user_id=user_id, revoked_at=now, expires_at=until))
+    get_revocation_list().revoke(session_id, until)
@@ -0,0 +1,555 @@
+"""
+Shared cache backend and two-level caches.
+
+In-process caches are per worker, so every uvicorn worker and pod warms its
+own copy and the hit rate falls as we scale out. With ``CACHE_REDIS_URL``
+set, ``TieredCache`` keeps the in-process ``TTLCache`` as a small, fast L1
+in front of a shared L2 reached over the Redis protocol (Redis, Valkey,
+KeyDB, ...):
+
+- reads try L1, then L2, and promote L2 hits into L1;
+- writes go to both levels;
+- invalidations drop the L1 entry, delete the L2 entry and publish a
+  message on ``INVALIDATION_CHANNEL`` so every other worker drops its L1
+  copy too. An invalidation that cannot reach the server stays pending and
+  is replayed before L2 is read again, so a stale entry that survived an
+  outage is never served.
+
+Values are stored as JSON (never pickle, so a shared server cannot make
+workers execute code). Datetimes are tagged to survive the round trip.
+
+The backend is strictly best-effort: a slow or unreachable server counts
+as an L2 miss, and it is not retried for ``retry_interval`` seconds.
+Without ``CACHE_REDIS_URL`` caches are local only and behave exactly like
+``TTLCache``. This is the in-memory fallback for development and tests.
+
+``RedisBackend`` is a minimal RESP2 client over asyncio streams. It
+implements only the commands used here, so it needs no extra dependency.
+Commands run on a small pool of connections, so concurrent requests on the
+auth path do not queue behind one round trip.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Pub/sub channel carrying invalidations between workers
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+
+class CacheUnavailable(Exception):
+    """The shared cache server could not be reached or answered with an error."""
+
+
+# JSON codec
+
+def _encode_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Cannot cache a value of type {type(value).__name__}")
+
+
+def _decode_hook(value: Dict[str, Any]) -> Any:
+    if len(value) == 1 and "__datetime__" in value:
+        return datetime.fromisoformat(value["__datetime__"])
+    return value
+
+
+def dumps(value: Any) -> bytes:
+    """Pure function encoding a cache value as JSON, datetimes included."""
+    return json.dumps(value, default=_encode_default, separators=(",", ":")).encode("utf-8")
+
+
+def loads(raw: bytes) -> Any:
+    """Pure function decoding a value encoded by ``dumps``."""
+    return json.loads(raw, object_hook=_decode_hook)
+
+
+# RESP2 wire format
+
+def encode_command(*args: Any) -> bytes:
+    """Pure function encoding a command as a RESP array of bulk strings."""
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+        parts.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    """Read one RESP reply. Error replies raise CacheUnavailable."""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by the cache server")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        raise CacheUnavailable(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        count = int(payload)
+        if count < 0:
+            return None
+        return [await read_reply(reader) for _ in range(count)]
+    raise ConnectionError(f"Unexpected reply from the cache server: {line!r}")
+
+
+def parse_redis_url(url: str) -> Tuple[str, int, Optional[str], int]:
+    """Pure function returning (host, port, password, db) of a redis:// URL."""
+    parsed = urlparse(url)
+    if parsed.scheme != "redis":
+        raise ValueError(f"Unsupported cache URL scheme: {parsed.scheme}")
+    password = unquote(parsed.password) if parsed.password else None
+    db = int(parsed.path.lstrip("/") or 0)
+    return parsed.hostname or "localhost", parsed.port or 6379, password, db
+
+
+class RedisBackend:
+    """Shared key/value store, sets and pub/sub over the Redis protocol."""
+
+    name = "redis"
+
+    def __init__(self, url: str, timeout: float = 0.5, retry_interval: float = 5.0, pool_size: int = 8):
+        self.url = url
+        self.host, self.port, self._password, self._db = parse_redis_url(url)
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.pool_size = pool_size
+        # Identifies this worker's own invalidation messages
+        self.origin = uuid.uuid4().hex
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # Idle command connections; at most pool_size are open at once
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots = asyncio.Semaphore(pool_size)
+        self._down_until = 0.0
+        self._subscribers: Dict[str, List[Callable[[Optional[bytes]], None]]] = {}
+        self._subscriber_task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.commands_total = 0
+        self.errors_total = 0
+        self.messages_total = 0
+
+    async def start(self) -> None:
+        """Remember the event loop and start listening for invalidations. Called from the app lifespan."""
+        self.loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.pool_size)
+        self._closing = False
+        self._ensure_listening()
+
+    async def close(self) -> None:
+        """Stop listening and close the command connections. Called from the app lifespan."""
+        # wait_for() may swallow a cancellation that races a failed connect
+        self._closing = True
+        if self._subscriber_task is not None:
+            self._subscriber_task.cancel()
+            try:
+                await self._subscriber_task
+            except asyncio.CancelledError:
+                pass
+            self._subscriber_task = None
+        self._disconnect()
+        self.loop = None
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    async def _open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        for command in ((("AUTH", self._password),) if self._password else ()) + \
+                ((("SELECT", self._db),) if self._db else ()):
+            writer.write(encode_command(*command))
+            await writer.drain()
+            await asyncio.wait_for(read_reply(reader), self.timeout)
+        return reader, writer
+
+    def _disconnect(self) -> None:
+        """Close every idle command connection."""
+        while self._idle:
+            self._idle.pop()[1].close()
+
+    async def execute(self, *args: Any) -> Any:
+        """
+        Run one command and return its reply.
+
+        Raises:
+            CacheUnavailable: If the server is (recently) unreachable, slow or returns an error
+        """
+        return (await self._run([args]))[0]
+
+    async def transaction(self, *commands: Tuple[Any, ...]) -> List[Any]:
+        """
+        Run commands atomically (MULTI/EXEC) and return their replies.
+
+        Raises:
+            CacheUnavailable: As ``execute``
+        """
+        replies = await self._run([("MULTI",), *commands, ("EXEC",)])
+        if replies[-1] is None:
+            raise CacheUnavailable("Cache transaction aborted")
+        return replies[-1]
+
+    async def _run(self, commands: List[Tuple[Any, ...]]) -> List[Any]:
+        """Send commands in one write on a pooled connection and read every reply."""
+        if not self.available:
+            raise CacheUnavailable(f"Cache server {self.host}:{self.port} marked down")
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            try:
+                if connection is None:
+                    connection = await self._open()
+                reader, writer = connection
+                writer.write(b"".join(encode_command(*args) for args in commands))
+                await writer.drain()
+                self.commands_total += len(commands)
+                replies = [await asyncio.wait_for(read_reply(reader), self.timeout) for _ in commands]
+            except CacheUnavailable:
+                self.errors_total += 1
+                if len(commands) > 1:
+                    # Later replies are still unread; never reuse the connection
+                    connection[1].close()
+                else:
+                    self._idle.append(connection)
+                raise
+            except (OSError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                # The connection may hold a late reply, and idle ones are likely dead too
+                if connection is not None:
+                    connection[1].close()
+                self._disconnect()
+                self.errors_total += 1
+                self._down_until = time.monotonic() + self.retry_interval
+                logger.warning(f"Cache server {self.host}:{self.port} unavailable: {e!r}")
+                raise CacheUnavailable(str(e)) from e
+            except BaseException:
+                # Cancelled mid-command: the reply may still arrive on this connection
+                if connection is not None:
+                    connection[1].close()
+                raise
+            self._idle.append(connection)
+            return replies
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.execute("GET", key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.execute("SET", key, value, "PX", max(1, int(ttl * 1000)))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.execute("DEL", *keys)
+
+    async def add_to_set(self, key: str, member: str, ttl: float) -> None:
+        await self.transaction(("SADD", key, member), ("PEXPIRE", key, max(1, int(ttl * 1000))))
+
+    async def pop_set(self, key: str) -> List[str]:
+        """Return the members of a set and delete it atomically, so no concurrent SADD is lost."""
+        members, _ = await self.transaction(("SMEMBERS", key), ("DEL", key))
+        return [member.decode("utf-8") for member in members or []]
+
+    async def publish(self, channel: str, message: bytes) -> None:
+        await self.execute("PUBLISH", channel, message)
+
+    def subscribe(self, channel: str, callback: Callable[[Optional[bytes]], None]) -> None:
+        """
+        Call ``callback(message)`` for every message on ``channel``.
+
+        ``callback(None)`` is called after the subscription is (re)established,
+        since messages sent while it was down were missed.
+        """
+        self._subscribers.setdefault(channel, []).append(callback)
+        if self.loop is not None:
+            # Caches may be created from a threadpool worker
+            self.loop.call_soon_threadsafe(self._ensure_listening)
+
+    def _ensure_listening(self) -> None:
+        if self._subscriber_task is None and self._subscribers and self.loop is not None:
+            self._subscriber_task = self.loop.create_task(self._listen())
+
+    def _dispatch(self, channel: str, message: Optional[bytes]) -> None:
+        for callback in self._subscribers.get(channel, []):
+            try:
+                callback(message)
+            except Exception as e:
+                logger.error(f"Cache invalidation handler failed: {e}")
+
+    async def _listen(self) -> None:
+        """Hold a dedicated subscriber connection, reconnecting after failures."""
+        while not self._closing:
+            writer = None
+            try:
+                reader, writer = await self._open()
+                writer.write(encode_command("SUBSCRIBE", *self._subscribers))
+                await writer.drain()
+                for _ in self._subscribers:
+                    await asyncio.wait_for(read_reply(reader), self.timeout)
+                for channel in self._subscribers:
+                    self._dispatch(channel, None)
+                while True:
+                    reply = await read_reply(reader)
+                    if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                        self.messages_total += 1
+                        self._dispatch(reply[1].decode("utf-8"), reply[2])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation subscription lost: {e!r}")
+            finally:
+                if writer is not None:
+                    writer.close()
+            if not self._closing:
+                await asyncio.sleep(self.retry_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "server": f"{self.host}:{self.port}",
+            "available": self.available,
+            "subscribed": self._subscriber_task is not None and not self._subscriber_task.done(),
+            "pool_size": self.pool_size,
+            "idle_connections": len(self._idle),
+            "commands_total": self.commands_total,
+            "errors_total": self.errors_total,
+            "messages_total": self.messages_total
+        }
+
+
+class TieredCache:
+    """
+    Local L1 ``TTLCache`` in front of an optional shared L2 backend.
+
+    ``tags_of(value)`` names groups of entries that are invalidated together
+    (e.g. every session of one user) with ``invalidate_tag``.
+
+    ``invalidate`` and ``invalidate_tag`` update L2 in the background;
+    ``ainvalidate`` and ``ainvalidate_tag`` return only once L2 has been
+    updated. Either way, invalidations that fail stay pending until they
+    can be applied, and L2 is not read or written while any are pending.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        l1,
+        backend: Optional[RedisBackend] = None,
+        encode: Callable[[Any], bytes] = dumps,
+        decode: Callable[[bytes], Any] = loads,
+        tags_of: Optional[Callable[[Any], Iterable[str]]] = None
+    ):
+        self.name = name
+        self.l1 = l1
+        self.backend = backend
+        self.encode = encode
+        self.decode = decode
+        self.tags_of = tags_of
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+        self.remote_invalidations = 0
+        # Invalidations not yet applied to L2; sync callers may run in a threadpool worker
+        self._pending_keys: set = set()
+        self._pending_tags: set = set()
+        self._pending_lock = threading.Lock()
+        if backend is not None:
+            backend.subscribe(INVALIDATION_CHANNEL, self._on_invalidation)
+
+    def _key(self, key: Any) -> str:
+        return f"{self.name}:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.name}:tag:{tag}"
+
+    def get(self, key: Any) -> Optional[Any]:
+        """Return the L1 value only, for callers that cannot await."""
+        return self.l1.get(key)
+
+    async def aget(self, key: Any) -> Optional[Any]:
+        """Return the value from L1, else from L2 (promoting it to L1), else None."""
+        value = self.l1.get(key)
+        if value is not None or self.backend is None or not self.backend.available:
+            return value
+        if not await self._apply_invalidations():
+            return None
+        try:
+            raw = await self.backend.get(self._key(key))
+            value = None if raw is None else self.decode(raw)
+        except Exception as e:
+            self.l2_errors += 1
+            logger.debug(f"{self.name} L2 read failed: {e!r}")
+            return None
+        if value is None:
+            self.l2_misses += 1
+            return None
+        self.l2_hits += 1
+        self.l1.set(key, value)
+        return value
+
+    async def aset(self, key: Any, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value in L1 and L2."""
+        self.l1.set(key, value, ttl)
+        if self.backend is None or not self.backend.available:
+            return
+        ttl = self.l1.ttl if ttl is None else min(ttl, self.l1.ttl)
+        if ttl <= 0 or not await self._apply_invalidations():
+            return
+        try:
+            await self.backend.set(self._key(key), self.encode(value), ttl)
+            for tag in self.tags_of(value) if self.tags_of else ():
+                await self.backend.add_to_set(self._tag_key(tag), self._key(key), self.l1.ttl)
+        except Exception as e:
+            self.l2_errors += 1
+            logger.debug(f"{self.name} L2 write failed: {e!r}")
+
+    def invalidate(self, key: Any) -> bool:
+        """Drop an entry here, in L2 and (via pub/sub) in every other worker's L1."""
+        dropped = self.l1.invalidate(key)
+        if self._queue_invalidations(keys=[str(key)]):
+            self._schedule(self._apply_invalidations())
+        return dropped
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Drop every entry tagged ``tag`` here, in L2 and in every other worker's L1."""
+        dropped = self._invalidate_tag_locally(tag)
+        if self._queue_invalidations(tags=[tag]):
+            self._schedule(self._apply_invalidations())
+        return dropped
+
+    async def ainvalidate(self, key: Any) -> bool:
+        """Like ``invalidate``, but return only once L2 has been updated (or the attempt failed)."""
+        dropped = self.l1.invalidate(key)
+        if self._queue_invalidations(keys=[str(key)]):
+            await self._apply_invalidations()
+        return dropped
+
+    async def ainvalidate_tag(self, tag: str) -> int:
+        """Like ``invalidate_tag``, but return only once L2 has been updated (or the attempt failed)."""
+        dropped = self._invalidate_tag_locally(tag)
+        if self._queue_invalidations(tags=[tag]):
+            await self._apply_invalidations()
+        return dropped
+
+    def _invalidate_tag_locally(self, tag: str) -> int:
+        if self.tags_of is None:
+            return 0
+        return self.l1.invalidate_where(lambda value: tag in self.tags_of(value))
+
+    def _schedule(self, coroutine) -> None:
+        """Run L2 work on the backend's loop, from the loop or from a threadpool worker."""
+        loop = self.backend.loop if self.backend is not None else None
+        if loop is None or loop.is_closed():
+            coroutine.close()
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            loop.create_task(coroutine)
+        else:
+            asyncio.run_coroutine_threadsafe(coroutine, loop)
+
+    def _queue_invalidations(self, keys: Iterable[str] = (), tags: Iterable[str] = ()) -> bool:
+        """Record invalidations for L2. Returns False if there is no L2."""
+        if self.backend is None:
+            return False
+        with self._pending_lock:
+            self._pending_keys.update(keys)
+            self._pending_tags.update(tags)
+        return True
+
+    async def _apply_invalidations(self) -> bool:
+        """
+        Delete the pending keys and tagged entries from L2 and announce them
+        to the other workers. Returns True once nothing is pending.
+        """
+        with self._pending_lock:
+            keys, tags = list(self._pending_keys), list(self._pending_tags)
+        if not keys and not tags:
+            return True
+        doomed, prefix = list(keys), self._key("")
+        try:
+            for tag in tags:
+                doomed += [member[len(prefix):] for member in await self.backend.pop_set(self._tag_key(tag))
+                           if member.startswith(prefix)]
+            await self.backend.delete(*[self._key(key) for key in doomed])
+            message = {"origin": self.backend.origin, "cache": self.name, "keys": keys, "tags": tags}
+            await self.backend.publish(INVALIDATION_CHANNEL, dumps(message))
+        except Exception as e:
+            # Entries of tag sets already popped must still be deleted on the next attempt
+            self._queue_invalidations(keys=doomed)
+            self.l2_errors += 1
+            logger.warning(f"{self.name} shared invalidation failed, will retry: {e!r}")
+            return False
+        with self._pending_lock:
+            self._pending_keys.difference_update(keys)
+            self._pending_tags.difference_update(tags)
+            return not self._pending_keys and not self._pending_tags
+
+    def _on_invalidation(self, raw: Optional[bytes]) -> None:
+        if raw is None:
+            # (Re)subscribed: invalidations may have been missed meanwhile,
+            # and ours may not have reached the server
+            self.l1.clear()
+            if self._pending_keys or self._pending_tags:
+                self._schedule(self._apply_invalidations())
+            return
+        message = loads(raw)
+        if message.get("origin") == self.backend.origin or message.get("cache") != self.name:
+            return
+        self.remote_invalidations += 1
+        for key in message.get("keys", []):
+            self.l1.invalidate(key)
+        for tag in message.get("tags", []):
+            self._invalidate_tag_locally(tag)
+
+    def clear(self) -> None:
+        """Drop every L1 entry and reset the statistics."""
+        self.l1.clear()
+        self.l2_hits = self.l2_misses = self.l2_errors = self.remote_invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self.l1)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.l1.stats(),
+            "backend": self.backend.name if self.backend is not None else "local",
+            "l2_hits": self.l2_hits,
+            "l2_misses": self.l2_misses,
+            "l2_errors": self.l2_errors,
+            "remote_invalidations": self.remote_invalidations,
+            "pending_invalidations": len(self._pending_keys) + len(self._pending_tags)
+        }
+
+
+_shared_backend: Optional[RedisBackend] = None
+
+
+def get_shared_backend() -> Optional[RedisBackend]:
+    """Return the process-wide shared cache backend, or None if CACHE_REDIS_URL is unset."""
+    global _shared_backend
+    settings = get_settings()
+    if _shared_backend is None and settings.CACHE_REDIS_URL:
+        _shared_backend = RedisBackend(
+            settings.CACHE_REDIS_URL,
+            timeout=settings.CACHE_REDIS_TIMEOUT,
+            retry_interval=settings.CACHE_REDIS_RETRY_SECONDS,
+            pool_size=settings.CACHE_REDIS_POOL_SIZE
+        )
+    return _shared_backend
@@ -1,3 +1,8 @@
+import os
+
+# Test mode: requests over their endpoint's declared query budget fail
+os.environ.setdefault("DB_QUERY_BUDGET_ENFORCE", "true")
+
 import pytest
 from pathlib import Path
 from fastapi.testclient import TestClient
@@ -9,7 +14,22 @@ from auth import get_current_user
 import models
 
 # Import database module for dependency override and DB engine
-from ..database import get_db, Base, engine, SessionLocal
+import tempfile
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from database import get_db, Base, set_test_engine, get_session_factory
+
+# Temporary SQLite file shared by the sync and async engines, so tests need
+# no PostgreSQL server. The async engine doesn't pool connections because
+# each TestClient and asyncio.run call brings its own event loop.
+TEST_DATABASE_PATH = Path(tempfile.mkdtemp()) / "test.db"
+engine = create_engine(
+    f"sqlite:///{TEST_DATABASE_PATH}",
+    connect_args={"check_same_thread": False}
+)
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{TEST_DATABASE_PATH}", poolclass=NullPool)
+set_test_engine(engine, async_engine)
 
 # Fixture to set up and tear down the database for the entire test session
 @pytest.fixture(scope="session", autouse=True)
@@ -17,7 +37,7 @@ def setup_database():
     """
     Creates all tables before tests run, and drops them after.
     This is a session-scoped fixture that runs automatically.
-    Uses the real PostgreSQL connection as configured in database.py.
+    Uses the SQLite engines installed with set_test_engine.
     """
     Base.metadata.create_all(bind=engine)
     yield
@@ -29,9 +49,9 @@ def db() -> Session:
     """
     Creates a fresh database session for each test function.
     Ensures isolation between tests.
-    Uses the real SessionLocal from database.py.
+    Uses the session factory from database.py, bound to the test engine.
     """
-    session = SessionLocal()
+    session = get_session_factory()()
     try:
         yield session
     finally:
@@ -0,0 +1,81 @@
+# Use absolute imports to avoid module not found errors
+import sys
+import asyncio
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import event
+
+import models
+from activity_logger import ActivityLogger
+
+
+def count_activity(db, action: str) -> int:
+    return db.query(models.ActivityLog).filter(models.ActivityLog.action == action).count()
+
+
+def test_events_are_written_in_bulk(db):
+    """
+    Goal: Verify that queued events are written with multi-row inserts.
+    Setup: 120 events with a batch size of 50.
+    Assertion:
+        1. Nothing is written until the flush.
+        2. The flush writes every event in three INSERT statements.
+    """
+    activity = ActivityLogger(max_queue=1000, batch_size=50)
+    for index in range(120):
+        assert activity.log(1, "bulk")
+    assert count_activity(db, "bulk") == 0
+
+    inserts = []
+    engine = db.get_bind()
+    listener = lambda *args: inserts.append(args[2]) if args[2].startswith("INSERT") else None
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert activity.flush() == 120
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert count_activity(db, "bulk") == 120
+    assert len(inserts) == 3
+    assert activity.stats()["flushes_total"] == 3
+
+
+def test_full_queue_drops_events():
+    """
+    Goal: Verify the queue bound.
+    Assertion: Events beyond max_queue are dropped and counted, not queued.
+    """
+    activity = ActivityLogger(max_queue=10, batch_size=100)
+    results = [activity.log(1, "overflow") for _ in range(15)]
+    assert results.count(False) == 5
+    stats = activity.stats()
+    assert stats["queued"] == 10
+    assert stats["dropped_total"] == 5
+
+
+def test_background_flush_on_batch_size_and_shutdown(db):
+    """
+    Goal: Verify the background flusher.
+    Setup: A flush interval far longer than the test.
+    Assertion:
+        1. Reaching the batch size flushes without waiting for the interval.
+        2. Events still queued at shutdown are written by close().
+    """
+    activity = ActivityLogger(max_queue=100, batch_size=5, flush_interval=60)
+
+    async def scenario():
+        await activity.start()
+        for _ in range(5):
+            activity.log(1, "threshold")
+        await asyncio.sleep(0.2)
+        assert count_activity(db, "threshold") == 5
+
+        activity.log(1, "shutdown")
+        await activity.close()
+
+    asyncio.run(scenario())
+    assert count_activity(db, "shutdown") == 1
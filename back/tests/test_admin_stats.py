@@ -0,0 +1,54 @@
+# Use absolute imports to avoid module not found errors
+import sys
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import auth
+import models
+from main import app
+
+STATS_PATHS = [
+    "/api/ai/pool-stats",
+    "/api/ai/prediction-cache-stats",
+    "/api/ai/prediction-store-stats",
+    "/api/auth/cache-stats",
+    "/api/auth/jwks-stats",
+    "/api/auth/refresh-stats",
+    "/api/auth/revocation-stats",
+    "/logs/activity-stats",
+    "/db/pool-stats",
+    "/cache/shared-stats",
+]
+
+
+@pytest.fixture(scope="function")
+def client_as():
+    """Yields a function returning a TestClient for the full app as a given user."""
+    def client_for(user):
+        app.dependency_overrides[auth.get_current_user] = lambda: user
+        return TestClient(app)
+
+    yield client_for
+    app.dependency_overrides.pop(auth.get_current_user, None)
+
+
+@pytest.mark.parametrize("path", STATS_PATHS)
+def test_operational_stats_require_admin(client_as, path):
+    """
+    Goal: Verify that operational stats, which expose replica URLs and internals, are admin-only.
+    Action: Request each stats endpoint as a regular user and as an admin.
+    Assertion: Regular users get 403, admins get the stats.
+    """
+    farmer = models.User(id=1001, email="farmer@example.com", is_admin=False, is_active=True)
+    administrator = models.User(id=1002, email="admin@example.com", is_admin=True, is_active=True)
+
+    assert client_as(farmer).get(path).status_code == 403
+    response = client_as(administrator).get(path)
+    assert response.status_code == 200
+    assert isinstance(response.json(), (dict, list))
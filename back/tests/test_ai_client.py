@@ -0,0 +1,272 @@
+# Use absolute imports to avoid module not found errors
+import sys
+import asyncio
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import httpx
+import pytest
+from starlette.requests import ClientDisconnect
+
+from ai_client import AIClient, NoReplicaAvailable
+from routes.ai_service import UpstreamStreamingResponse
+from upstreams import UpstreamPool
+
+
+class StandInReplica:
+    """
+    Minimal HTTP/1.1 server standing in for an AI microservice replica.
+
+    Every response waits ``delay`` seconds. ``/stream`` answers with an
+    endless chunked body, one chunk every 50 ms.
+    """
+
+    def __init__(self, delay: float = 0.0, status: int = 200):
+        self.delay = delay
+        self.status = status
+        self.requests = 0
+        self._server = None
+        self._handlers = set()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def start(self) -> "StandInReplica":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def stop(self) -> None:
+        self._server.close()
+        for handler in list(self._handlers):
+            handler.cancel()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+
+    async def _handle(self, reader, writer) -> None:
+        self._handlers.add(asyncio.current_task())
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":")[1])
+                await reader.readexactly(length)
+                self.requests += 1
+                await asyncio.sleep(self.delay)
+                if head.startswith(b"GET /stream"):
+                    writer.write(b"HTTP/1.1 200 OK\r\ntransfer-encoding: chunked\r\n\r\n")
+                    while True:
+                        writer.write(b"5\r\nchunk\r\n")
+                        await writer.drain()
+                        await asyncio.sleep(0.05)
+                body = b'{"ok": true}'
+                writer.write(
+                    b"HTTP/1.1 %d X\r\ncontent-type: application/json\r\ncontent-length: %d\r\n\r\n%s"
+                    % (self.status, len(body), body)
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+
+def ai_client(urls, max_connections: int = 10, read: float = 5.0, pool: float = 5.0, **kwargs) -> AIClient:
+    """An AI client over ``urls`` without background health checks."""
+    return AIClient(
+        upstreams=UpstreamPool(urls, failure_threshold=kwargs.pop("failure_threshold", 5)),
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=httpx.Timeout(connect=1.0, read=read, write=1.0, pool=pool),
+        health_check_interval=0,
+        **kwargs
+    )
+
+
+def test_pool_limit_queues_then_times_out():
+    """
+    Goal: Verify the connection pool limit and the pool timeout.
+    Setup: One connection, a 0.1 second pool timeout and a replica answering after 0.3 seconds.
+    Action: Send two requests at once.
+    Assertion:
+        1. The second request fails with PoolTimeout instead of opening a second connection.
+        2. Errors are counted and nothing is left in flight.
+    """
+    async def scenario():
+        replica = await StandInReplica(delay=0.3).start()
+        client = ai_client([replica.url], max_connections=1, pool=0.1)
+        try:
+            return await asyncio.gather(
+                client.request("GET", "/analyze"),
+                client.request("GET", "/analyze"),
+                return_exceptions=True
+            ), client.stats(), replica.requests
+        finally:
+            await client.close()
+            await replica.stop()
+
+    (first, second), stats, served = asyncio.run(scenario())
+    assert first.status_code == 200
+    assert isinstance(second, httpx.PoolTimeout)
+    assert served == 1
+    assert stats["errors_total"] == 1
+    assert stats["in_flight"] == 0
+    assert stats["replicas"][0]["outstanding"] == 0
+
+
+def test_read_timeout_counts_against_the_replica():
+    """
+    Goal: Verify read timeouts and their effect on the replica's circuit breaker.
+    Setup: A replica slower than the 0.1 second read timeout, failure threshold 2.
+    Action: Send two requests.
+    Assertion: Both time out, the replica records the errors and its circuit opens.
+    """
+    async def scenario():
+        replica = await StandInReplica(delay=0.5).start()
+        client = ai_client([replica.url], read=0.1, failure_threshold=2)
+        try:
+            errors = []
+            for _ in range(2):
+                with pytest.raises(httpx.ReadTimeout) as error:
+                    await client.request("GET", "/analyze")
+                errors.append(error.value)
+            return errors, client.stats()
+        finally:
+            await client.close()
+            await replica.stop()
+
+    errors, stats = asyncio.run(scenario())
+    assert len(errors) == 2
+    assert stats["replicas"][0]["errors_total"] == 2
+    assert stats["replicas"][0]["circuit"] == "open"
+
+
+@pytest.mark.parametrize("spec_version", ["2.3", "2.4"])
+def test_streamed_response_is_released_when_the_client_disconnects(spec_version):
+    """
+    Goal: Verify that a proxied stream is released even if the client goes away mid-body.
+    Setup: A replica streaming an endless body.
+    Action: Relay it with UpstreamStreamingResponse to a client that disconnects
+            after two chunks, reported as http.disconnect (ASGI < 2.4) or as
+            a failing send (ASGI 2.4).
+    Assertion: The relay stops and the client has nothing left in flight.
+    """
+    async def scenario():
+        replica = await StandInReplica().start()
+        client = ai_client([replica.url])
+        try:
+            upstream = await client.open_stream("GET", "/stream")
+            in_flight_while_open = client.in_flight
+            received = []
+            gone = asyncio.Event()
+
+            async def receive():
+                await gone.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if gone.is_set() and spec_version == "2.4":
+                    raise OSError("Connection reset by peer")
+                received.append(message)
+                if len(received) == 3:
+                    gone.set()
+
+            response = UpstreamStreamingResponse(client, upstream)
+            scope = {"type": "http", "asgi": {"spec_version": spec_version}}
+            try:
+                await asyncio.wait_for(response(scope, receive, send), timeout=2)
+            except ClientDisconnect:
+                pass
+            return in_flight_while_open, client.in_flight, upstream.is_closed, received
+        finally:
+            await client.close()
+            await replica.stop()
+
+    in_flight_while_open, in_flight_after, closed, received = asyncio.run(scenario())
+    assert in_flight_while_open == 1
+    assert in_flight_after == 0
+    assert closed
+    assert any(message.get("body") == b"chunk" for message in received)
+
+
+def test_only_one_concurrent_request_probes_a_recovering_replica():
+    """
+    Goal: Verify that concurrent requests cannot both take the half-open probe.
+    Setup: One replica whose breaker is open and past its reset timeout.
+    Action: Send two requests at once.
+    Assertion:
+        1. One request is sent as the probe and succeeds, closing the breaker.
+        2. The other is refused without reaching the replica.
+    """
+    async def scenario():
+        replica = await StandInReplica(delay=0.1).start()
+        client = ai_client([replica.url], failure_threshold=1)
+        breaker = client.upstreams.replicas[0].breaker
+        breaker.on_failure()
+        breaker.opened_at -= breaker.reset_timeout
+        try:
+            results = await asyncio.gather(
+                client.request("GET", "/analyze"),
+                client.request("GET", "/analyze"),
+                return_exceptions=True
+            )
+            return results, replica.requests, breaker.state
+        finally:
+            await client.close()
+            await replica.stop()
+
+    results, served, state = asyncio.run(scenario())
+    assert served == 1
+    assert sum(isinstance(r, httpx.Response) for r in results) == 1
+    assert sum(isinstance(r, NoReplicaAvailable) for r in results) == 1
+    assert state == "closed"
+
+
+def test_slow_request_is_hedged_to_another_replica():
+    """
+    Goal: Verify request hedging.
+    Setup: A slow primary replica (0.5 s) whose recent latencies are about 50 ms, and a fast replica.
+    Action: Send one request, then one more once the slow replica is fast again.
+    Assertion:
+        1. A backup request goes to the fast replica after the hedge delay and its answer wins.
+        2. The losing request is abandoned without counting as a failure.
+        3. A request answered within the hedge delay is not hedged.
+    """
+    async def scenario():
+        slow = await StandInReplica(delay=0.5).start()
+        fast = await StandInReplica().start()
+        client = ai_client([slow.url, fast.url], hedge_percentile=50, hedge_min_samples=1)
+        primary, backup = client.upstreams.replicas
+        primary.latencies.extend([0.05] * 10)
+        # Make the slow replica the least loaded choice
+        backup.outstanding += 1
+        try:
+            started = asyncio.get_running_loop().time()
+            response = await client.request("GET", "/analyze")
+            elapsed = asyncio.get_running_loop().time() - started
+            # Let the cancelled request unwind
+            await asyncio.sleep(0.05)
+            hedged = (response.request.url.port, elapsed, client.hedged_total,
+                      primary.outstanding, primary.breaker.consecutive_failures)
+
+            slow.delay = 0
+            await client.request("GET", "/analyze")
+            return hedged, client.hedged_total, fast.url
+        finally:
+            backup.outstanding -= 1
+            await client.close()
+            await slow.stop()
+            await fast.stop()
+
+    (port, elapsed, hedged_total, primary_outstanding, primary_failures), total_after, fast_url = asyncio.run(scenario())
+    assert fast_url.endswith(f":{port}")
+    assert elapsed < 0.4
+    assert hedged_total == 1
+    assert primary_outstanding == 0
+    assert primary_failures == 0
+    assert total_after == 1
@@ -0,0 +1,89 @@
+# Use absolute imports to avoid module not found errors
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from jose import jwt
+
+import crud
+import models
+from config import get_settings
+from database import QueryTimingMiddleware
+from routes import auth as auth_routes
+
+
+def make_session(db):
+    user = models.User(
+        email=f"{uuid.uuid4()}@example.com", full_name="Route User", workos_user_id=f"user_{uuid.uuid4()}"
+    )
+    db.add(user)
+    db.commit()
+    session = models.AppSession(
+        id=str(uuid.uuid4()),
+        user_id=user.id,
+        workos_session_id=f"session_{uuid.uuid4()}",
+        refresh_token="refresh",
+        expires_at=datetime.utcnow() + timedelta(hours=1),
+        is_active=True
+    )
+    db.add(session)
+    db.commit()
+    return user, session
+
+
+@pytest.fixture(scope="function")
+def auth_client(monkeypatch):
+    """The auth router behind query timing, with WorkOS token validation stubbed out."""
+    async def validate(token: str) -> dict:
+        return jwt.get_unverified_claims(token)
+
+    monkeypatch.setattr(auth_routes, "validate_workos_token", validate)
+    app = FastAPI()
+    app.add_middleware(QueryTimingMiddleware)
+    app.include_router(auth_routes.router)
+    with TestClient(app) as c:
+        yield c
+
+
+def access_token(user: models.User, session: models.AppSession) -> str:
+    return jwt.encode({"sub": user.workos_user_id, "sid": session.workos_session_id}, "test-key")
+
+
+def test_me_runs_on_the_async_session_within_budget(auth_client, db):
+    """
+    Goal: Verify /api/auth/me after the move to the async session.
+    Assertion: It returns the user and session within its query budget of 4.
+    """
+    user, session = make_session(db)
+    auth_client.cookies.set("workos_access_token", access_token(user, session))
+    response = auth_client.get("/api/auth/me")
+    assert response.status_code == 200
+    assert response.json()["id"] == user.id
+    assert response.headers["Server-Timing"].endswith('desc="4 queries"')
+
+
+def test_logout_invalidates_the_session(auth_client, db, monkeypatch):
+    """
+    Goal: Verify that logout deletes the app session using only the async session.
+    Setup: Activity logs are written inline instead of write-behind.
+    Assertion: The session is gone and the logout is recorded for the user.
+    """
+    monkeypatch.setattr(get_settings(), "ACTIVITY_LOG_WRITE_BEHIND", False)
+    user, session = make_session(db)
+    user_id, session_id, workos_session_id = user.id, session.id, session.workos_session_id
+    auth_client.cookies.set("workos_access_token", access_token(user, session))
+    response = auth_client.post("/auth/logout")
+    assert response.status_code == 200
+    assert response.json()["workos_session_id_for_logout"] == workos_session_id
+
+    db.expire_all()
+    assert crud.get_session_by_id(db, session_id) is None
+    assert db.query(models.ActivityLog).filter_by(user_id=user_id, action="logout_backend_part").count() == 1
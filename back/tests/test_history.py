@@ -0,0 +1,117 @@
+# Use absolute imports to avoid module not found errors
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import models
+from database import QueryTimingMiddleware
+from auth import get_current_user
+from routes import history
+
+
+@pytest.fixture(scope="function")
+def history_client(db):
+    """
+    TestClient for the history router, authenticated as a user with 25
+    predictions. Timestamps repeat in pairs so pages must break ties on id.
+    """
+    user = models.User(email="history.user@example.com", full_name="History User")
+    db.add(user)
+    db.commit()
+    start = datetime(2024, 1, 1)
+    db.add_all([
+        models.PredictionLog(
+            user_id=user.id,
+            result=f"crop-{index}",
+            file_name=f"file-{index}.csv",
+            created_at=start + timedelta(hours=index // 2)
+        )
+        for index in range(25)
+    ])
+    db.commit()
+
+    app = FastAPI()
+    app.include_router(history.router)
+    app.add_middleware(QueryTimingMiddleware)
+    app.dependency_overrides[get_current_user] = lambda: user
+    with TestClient(app) as c:
+        yield c
+
+    db.query(models.PredictionLog).filter(models.PredictionLog.user_id == user.id).delete()
+    db.delete(user)
+    db.commit()
+
+
+def test_history_pages_cover_every_prediction_once(history_client):
+    """
+    Goal: Verify keyset pagination of the prediction history.
+    Action: Follow X-Next-Cursor with pages of 10.
+    Assertion:
+        1. Three pages of 10, 10 and 5 rows, the last without a cursor.
+        2. Every prediction appears exactly once, newest first.
+    """
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 10, **({"cursor": cursor} if cursor else {})}
+        response = history_client.get("/history/", params=params)
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert [len(page) for page in pages] == [10, 10, 5]
+    rows = [row for page in pages for row in page]
+    assert len({row["id"] for row in rows}) == 25
+    keys = [(row["created_at"], row["id"]) for row in rows]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_invalid_cursor_is_rejected(history_client):
+    """
+    Goal: Verify cursor validation.
+    Assertion: A malformed cursor returns 400 instead of a server error.
+    """
+    response = history_client.get("/history/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_history_without_limit_or_cursor_is_complete(history_client):
+    """
+    Goal: Verify that clients not using pagination still get the whole history.
+    Action: Request the history without parameters, then with only a cursor.
+    Assertion:
+        1. All 25 predictions are returned newest first, with no X-Next-Cursor.
+        2. A cursor without a limit returns a default-sized page.
+    """
+    response = history_client.get("/history/")
+    assert response.status_code == 200
+    assert len(response.json()) == 25
+    assert "X-Next-Cursor" not in response.headers
+
+    cursor = history_client.get("/history/", params={"limit": 1}).headers["X-Next-Cursor"]
+    response = history_client.get("/history/", params={"cursor": cursor})
+    assert len(response.json()) == 24
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_cors_exposes_the_cursor_header():
+    """
+    Goal: Verify that browsers may read X-Next-Cursor and Server-Timing.
+    Assertion: Credentialed CORS responses list both headers by name, not "*".
+    """
+    from main import app
+
+    response = TestClient(app).get("/", headers={"Origin": "http://localhost:3000"})
+    exposed = {name.strip().lower() for name in response.headers["access-control-expose-headers"].split(",")}
+    assert response.headers["access-control-allow-credentials"] == "true"
+    assert {"x-next-cursor", "server-timing"} <= exposed
+    assert "*" not in exposed
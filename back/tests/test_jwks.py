@@ -0,0 +1,170 @@
+# Use absolute imports to avoid module not found errors
+import sys
+import asyncio
+import time
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from jose import jwk, jwt
+
+import auth
+from cache import get_token_cache
+from jwks import JWKSKeyStore
+
+JWKS_URL = "https://workos.test/jwks.json"
+
+
+def make_key(kid: str):
+    """Pure function returning (private PEM, public JWK) for a fresh RSA key."""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    public_jwk = jwk.construct(public_pem, "RS256").to_dict()
+    public_jwk.update({"kid": kid, "use": "sig"})
+    return private_pem, public_jwk
+
+
+def sign(private_pem: bytes, kid: str) -> str:
+    claims = {"sub": "user_1", "sid": "session_1", "aud": auth.settings.WORKOS_CLIENT_ID,
+              "exp": int(time.time()) + 300}
+    return jwt.encode(claims, private_pem, algorithm="RS256", headers={"kid": kid})
+
+
+class FakeJWKSEndpoint:
+    """Serves a mutable key set and counts fetches."""
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.fetches = 0
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.fetches += 1
+        return httpx.Response(200, json={"keys": self.keys})
+
+
+def make_store(endpoint: FakeJWKSEndpoint, min_refetch_interval: float = 60.0) -> JWKSKeyStore:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(endpoint.handler))
+    return JWKSKeyStore(JWKS_URL, ttl=3600, min_refetch_interval=min_refetch_interval, http_client=client)
+
+
+@pytest.fixture(autouse=True)
+def empty_token_cache():
+    get_token_cache().clear()
+    yield
+    get_token_cache().clear()
+
+
+@pytest.fixture(scope="module")
+def old_key():
+    return make_key("key-old")
+
+
+@pytest.fixture(scope="module")
+def new_key():
+    return make_key("key-new")
+
+
+def test_keys_are_parsed_once_and_shared(monkeypatch, old_key):
+    """
+    Goal: Verify that validation reuses the parsed keys.
+    Assertion: Many validations cost a single JWKS fetch.
+    """
+    endpoint = FakeJWKSEndpoint([old_key[1]])
+    store = make_store(endpoint)
+    monkeypatch.setattr(auth, "get_jwks_store", lambda: store)
+    token = sign(old_key[0], "key-old")
+
+    async def validate_many():
+        return await asyncio.gather(*(auth.validate_workos_token(token) for _ in range(10)))
+
+    payloads = asyncio.run(validate_many())
+    assert all(payload["sub"] == "user_1" for payload in payloads)
+    assert endpoint.fetches == 1
+
+
+def test_rotated_key_triggers_one_refetch(monkeypatch, old_key, new_key):
+    """
+    Goal: Verify rotation-aware refresh.
+    Setup: The store has loaded the old key set; once the refetch rate limit
+           has passed, WorkOS rotates keys.
+    Assertion:
+        1. A token signed with the new key validates after one refetch.
+        2. Unknown key IDs do not refetch again within the rate limit.
+    """
+    endpoint = FakeJWKSEndpoint([old_key[1]])
+    store = make_store(endpoint, min_refetch_interval=0.2)
+    monkeypatch.setattr(auth, "get_jwks_store", lambda: store)
+
+    async def scenario():
+        await auth.validate_workos_token(sign(old_key[0], "key-old"))
+        await asyncio.sleep(0.25)
+        endpoint.keys = [old_key[1], new_key[1]]
+        payload = await auth.validate_workos_token(sign(new_key[0], "key-new"))
+        assert payload["sid"] == "session_1"
+        assert endpoint.fetches == 2
+
+        with pytest.raises(HTTPException):
+            await auth.validate_workos_token(sign(new_key[0], "key-forged"))
+        assert endpoint.fetches == 2
+
+    asyncio.run(scenario())
+    assert store.stats()["unknown_kid_total"] == 2
+
+
+def test_verified_tokens_skip_signature_check(monkeypatch, old_key):
+    """
+    Goal: Verify the verified-token cache and single-flight validation.
+    Action: Validate the same token concurrently, then again sequentially.
+    Assertion: The signature is checked once and later calls hit the cache.
+    """
+    endpoint = FakeJWKSEndpoint([old_key[1]])
+    store = make_store(endpoint)
+    monkeypatch.setattr(auth, "get_jwks_store", lambda: store)
+    decodes = []
+    real_decode = jwt.decode
+    monkeypatch.setattr(auth.jwt, "decode", lambda *args, **kwargs: decodes.append(1) or real_decode(*args, **kwargs))
+    token = sign(old_key[0], "key-old")
+
+    async def scenario():
+        await asyncio.gather(*(auth.validate_workos_token(token) for _ in range(5)))
+        for _ in range(5):
+            assert (await auth.validate_workos_token(token))["sub"] == "user_1"
+
+    asyncio.run(scenario())
+    assert len(decodes) == 1
+    assert get_token_cache().stats()["hits"] == 5
+
+
+def test_expired_tokens_are_not_cached(monkeypatch, old_key):
+    """
+    Goal: Verify that failed validations are not cached.
+    Setup: A correctly signed token whose exp has passed.
+    Assertion: It is rejected and nothing is cached for it.
+    """
+    endpoint = FakeJWKSEndpoint([old_key[1]])
+    store = make_store(endpoint)
+    monkeypatch.setattr(auth, "get_jwks_store", lambda: store)
+    claims = {"sub": "user_1", "aud": auth.settings.WORKOS_CLIENT_ID, "exp": int(time.time()) - 1}
+    token = jwt.encode(claims, old_key[0], algorithm="RS256", headers={"kid": "key-old"})
+
+    async def scenario():
+        with pytest.raises(HTTPException):
+            await auth.validate_workos_token(token)
+
+    asyncio.run(scenario())
+    assert len(get_token_cache()) == 0
@@ -0,0 +1,128 @@
+# Use absolute imports to avoid module not found errors
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import auth
+import models
+from database import QueryTimingMiddleware
+from pagination import NEXT_CURSOR_HEADER
+from routes import logs
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture(scope="function")
+def logs_app(db):
+    """
+    Two users with 12 logs each, alternating crop and mnist, one per hour.
+    Yields a function returning a TestClient authenticated as a given user.
+    """
+    owner = models.User(email="logs.owner@example.com", full_name="Logs Owner")
+    other = models.User(email="logs.other@example.com", full_name="Logs Other")
+    admin = models.User(email="logs.admin@example.com", full_name="Logs Admin", is_admin=True)
+    db.add_all([owner, other, admin])
+    db.commit()
+    db.add_all([
+        models.Log(
+            user_id=user.id,
+            type=models.LogTypeEnum.crop if index % 2 == 0 else models.LogTypeEnum.mnist,
+            input_data={"index": index},
+            output_result={},
+            created_at=START + timedelta(hours=index)
+        )
+        for user in (owner, other)
+        for index in range(12)
+    ])
+    db.commit()
+
+    app = FastAPI()
+    app.include_router(logs.router)
+    app.add_middleware(QueryTimingMiddleware)
+
+    def client_for(user):
+        app.dependency_overrides[auth.get_current_user] = lambda: user
+        return TestClient(app)
+
+    yield client_for, owner, other, admin
+
+    db.query(models.Log).delete()
+    for user in (owner, other, admin):
+        db.delete(user)
+    db.commit()
+
+
+def test_filters_and_pages(logs_app):
+    """
+    Goal: Verify filtering and keyset pagination of GET /logs/.
+    Setup: A regular user with 12 logs; another user with 12 more.
+    Action: Page through crop logs from hour 2 onwards in pages of 2.
+    Assertion:
+        1. Only the user's own crop logs in [since, until) are returned, newest first.
+        2. Pages follow X-Next-Cursor and the last page has no cursor.
+    """
+    client_for, owner, _, _ = logs_app
+    client = client_for(owner)
+    params = {"type": "crop", "since": (START + timedelta(hours=2)).isoformat(),
+              "until": (START + timedelta(hours=10)).isoformat(), "limit": 2}
+
+    seen, cursor = [], None
+    while True:
+        response = client.get("/logs/", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        seen.extend(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+
+    assert [log["input_data"]["index"] for log in seen] == [8, 6, 4, 2]
+    assert {log["user_id"] for log in seen} == {owner.id}
+
+
+def test_admin_scope_and_count(logs_app):
+    """
+    Goal: Verify admin visibility and the count mode.
+    Assertion:
+        1. Admins see every user's logs and can narrow them to one user.
+        2. /logs/count applies the same filters and, on SQLite, counts exactly.
+    """
+    client_for, owner, other, admin = logs_app
+    client = client_for(admin)
+
+    assert len(client.get("/logs/", params={"limit": 100}).json()) == 24
+    narrowed = client.get("/logs/", params={"user_id": other.id}).json()
+    assert {log["user_id"] for log in narrowed} == {other.id}
+
+    assert client.get("/logs/count").json() == {"count": 24, "estimated": False}
+    assert client.get("/logs/count", params={"type": "mnist"}).json()["count"] == 12
+    assert client_for(owner).get("/logs/count", params={"user_id": other.id}).json()["count"] == 12
+    assert client_for(owner).get("/logs/", params={"user_id": other.id}).json()[0]["user_id"] == owner.id
+
+
+def test_deprecated_skip_still_offsets(logs_app):
+    """
+    Goal: Verify that older clients sending ?skip=N are not silently sent back to the first page.
+    Assertion:
+        1. skip offsets the newest-first list and the page carries a cursor to continue from.
+        2. Combining skip with a cursor is rejected with a 400.
+    """
+    client_for, owner, _, _ = logs_app
+    client = client_for(owner)
+
+    response = client.get("/logs/", params={"skip": 3, "limit": 2})
+    assert response.status_code == 200
+    assert [log["input_data"]["index"] for log in response.json()] == [8, 7]
+
+    cursor = response.headers[NEXT_CURSOR_HEADER]
+    following = client.get("/logs/", params={"cursor": cursor, "limit": 2}).json()
+    assert [log["input_data"]["index"] for log in following] == [6, 5]
+
+    assert client.get("/logs/", params={"skip": 3, "cursor": cursor}).status_code == 400
@@ -0,0 +1,109 @@
+# Use absolute imports to avoid module not found errors
+import sys
+import asyncio
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from cache import SingleFlight, TTLCache
+from routes import ai_service
+from shared_cache import TieredCache
+
+
+class StubAIClient:
+    """Stand-in for the AI client that counts upstream calls."""
+
+    def __init__(self, status_code: int = 200):
+        self.status_code = status_code
+        self.calls = 0
+
+    async def request(self, method, path, affinity_key=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return httpx.Response(
+            self.status_code,
+            json={"predictions": [0.1, 0.9], "metadata": {"model_type": "MLPClassifier"}},
+            request=httpx.Request(method, f"http://ai{path}")
+        )
+
+
+@pytest.fixture(scope="function")
+def stub_ai(monkeypatch):
+    """A stub AI client, an empty two-entry prediction cache and fresh single-flight."""
+    client = StubAIClient()
+    cache = TieredCache("predictions", TTLCache(maxsize=2, ttl=3600))
+    monkeypatch.setattr(ai_service, "get_ai_client", lambda: client)
+    monkeypatch.setattr(ai_service, "get_prediction_cache", lambda: cache)
+    monkeypatch.setattr(ai_service, "_predictions", SingleFlight())
+    return client, cache
+
+
+def test_identical_uploads_share_one_upstream_call(stub_ai):
+    """
+    Goal: Verify single-flight coalescing and caching of predictions.
+    Action: Five identical uploads arrive together, then the file is re-submitted.
+    Assertion:
+        1. The five uploads cause one upstream call and get the same response.
+        2. The re-submission is served from the cache.
+    """
+    client, cache = stub_ai
+
+    async def upload_many():
+        return await asyncio.gather(*(ai_service.process_csv_with_ai(b"a,b\n1,2\n", "f.csv") for _ in range(5)))
+
+    results = asyncio.run(upload_many())
+    assert client.calls == 1
+    assert all(result == results[0] for result in results)
+
+    asyncio.run(ai_service.process_csv_with_ai(b"a,b\n1,2\n", "renamed.csv"))
+    assert client.calls == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_model_version_and_lru_bound(stub_ai, monkeypatch):
+    """
+    Goal: Verify the cache key and the size bound.
+    Assertion:
+        1. A new model version misses the cache.
+        2. With two entries, the least recently used file is evicted, not the oldest.
+    """
+    client, cache = stub_ai
+    predict = lambda content: asyncio.run(ai_service.process_csv_with_ai(content, "f.csv"))
+
+    predict(b"first")
+    monkeypatch.setattr(ai_service.settings, "AI_MODEL_VERSION", "2")
+    predict(b"first")
+    assert client.calls == 2
+
+    cache.clear()
+    predict(b"first")
+    predict(b"second")
+    predict(b"first")
+    predict(b"third")
+    assert client.calls == 5
+    assert cache.stats()["evictions"] == 1
+
+    predict(b"first")
+    assert client.calls == 5
+    predict(b"second")
+    assert client.calls == 6
+
+
+def test_errors_are_not_cached(stub_ai):
+    """
+    Goal: Verify that failed upstream calls are retried.
+    Assertion: Each upload after an upstream error calls the service again.
+    """
+    client, cache = stub_ai
+    client.status_code = 500
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            asyncio.run(ai_service.process_csv_with_ai(b"broken", "f.csv"))
+    assert client.calls == 2
+    assert len(cache) == 0
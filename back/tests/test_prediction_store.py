@@ -0,0 +1,180 @@
+# Use absolute imports to avoid module not found errors
+import sys
+import json
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import models
+from ai_client import content_key
+from auth import get_current_active_user
+from prediction_store import PredictionStore, decode_scores, encode_scores
+from routes import ai_service
+
+CSV = b"N,P,K,label\n90,42,43,1\n85,58,41,0\n"
+RESPONSE = {"predictions": [0.9, 0.2, 0.75, 0.5], "metadata": {"model_type": "MLPClassifier"}}
+
+
+def test_scores_round_trip_compactly():
+    """
+    Goal: Verify the compressed score column.
+    Assertion: Scores survive at float32 precision in far fewer bytes than JSON.
+    """
+    scores = [index / 10000 for index in range(10000)]
+    blob = encode_scores(scores)
+    assert decode_scores(blob) == pytest.approx(scores, abs=1e-6)
+    assert len(blob) < len(json.dumps(scores)) / 2
+
+
+@pytest.fixture(scope="function")
+def predict_client(db, monkeypatch):
+    """
+    TestClient for the AI routes with a stubbed AI service, a fresh
+    prediction store and an authenticated user.
+    """
+    user = models.User(email=f"{uuid.uuid4()}@example.com", full_name="Predicting User")
+    db.add(user)
+    db.commit()
+    store = PredictionStore(max_queue=100, batch_size=10, flush_interval=60)
+
+    async def fake_process(file_content, filename):
+        return RESPONSE
+
+    monkeypatch.setattr(ai_service, "process_csv_with_ai", fake_process)
+    monkeypatch.setattr(ai_service, "get_prediction_store", lambda: store)
+    app = FastAPI()
+    app.include_router(ai_service.router)
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    with TestClient(app) as c:
+        yield c, store, user
+
+
+def test_prediction_is_recorded_after_the_response(predict_client, db):
+    """
+    Goal: Verify that /api/ai/predict records history without waiting on the database.
+    Action: Upload a CSV, then flush the store as the background task would.
+    Assertion:
+        1. The response is returned with nothing written yet.
+        2. The flush writes one summary row with the file digest and compressed scores.
+    """
+    client, store, user = predict_client
+    response = client.post("/api/ai/predict", files={"file": ("field.csv", CSV, "text/csv")})
+    assert response.json() == RESPONSE
+    assert db.query(models.PredictionLog).filter_by(user_id=user.id).count() == 0
+    assert store.stats()["queued"] == 1
+
+    assert store.flush() == 1
+    row = db.query(models.PredictionLog).filter_by(user_id=user.id).one()
+    assert (row.file_name, row.file_digest, row.model_type) == ("field.csv", content_key(CSV), "MLPClassifier")
+    assert (row.row_count, row.positive_count, row.result, row.crop) == (4, 3, "3/4 rows positive", None)
+    assert row.mean_score == pytest.approx(0.5875)
+    assert decode_scores(row.scores) == pytest.approx(RESPONSE["predictions"])
+
+
+def test_flush_batches_and_skips_malformed_results(db):
+    """
+    Goal: Verify batching under load.
+    Setup: 25 queued predictions with a batch size of 10, one of them malformed.
+    Assertion: Three multi-row inserts write the 24 valid rows; the bad one is dropped.
+    """
+    store = PredictionStore(max_queue=100, batch_size=10)
+    user_id = 424242
+    for index in range(25):
+        response = {"predictions": ["not a score"]} if index == 7 else {**RESPONSE, "recommended_crop": "maize"}
+        store.record(user_id, f"batch-{index}.csv", "digest", response)
+
+    inserts = []
+    engine = db.get_bind()
+    listener = lambda *args: inserts.append(args[2]) if args[2].startswith("INSERT INTO prediction_logs") else None
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert store.flush() == 24
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert len(inserts) == 3
+    assert store.stats()["dropped_total"] == 1
+    assert db.query(models.PredictionLog).filter_by(user_id=user_id, result="maize", crop="maize").count() == 24
+
+
+@pytest.fixture(scope="function")
+def poison_day(db):
+    """A UTC day for rows written by the poison row tests; its rows and rollups are removed afterwards."""
+    day = datetime(2002, 5, 5, 12)
+    yield day
+    db.query(models.PredictionLog).filter(models.PredictionLog.file_name.like("poison-%")).delete(synchronize_session=False)
+    for model in (models.DailyRollup, models.DailyCropRollup, models.DailyActiveUser, models.DailyFile):
+        db.query(model).filter(model.day == day.date()).delete()
+    db.commit()
+
+
+def test_rejected_row_does_not_block_the_queue(db, poison_day):
+    """
+    Goal: Verify that a row the database rejects is dropped instead of blocking later rows.
+    Setup: A batch of 10 predictions, one of which has a created_at the database cannot store.
+    Action: Flush twice.
+    Assertion:
+        1. The 9 good rows are written with their rollups; the bad one is counted as rejected.
+        2. Nothing is left queued, so a second flush has nothing to retry.
+    """
+    store = PredictionStore(max_queue=100, batch_size=10)
+    for index in range(10):
+        store.enqueue({
+            "user_id": 434343,
+            "file_name": f"poison-{index}.csv",
+            "file_digest": "d" * 64,
+            "created_at": "not a timestamp" if index == 4 else poison_day,
+            "response": RESPONSE
+        })
+
+    assert store.flush() == 9
+    stats = store.stats()
+    assert (stats["queued"], stats["rejected_total"], stats["flush_errors_total"]) == (0, 1, 1)
+    assert store.flush() == 0
+
+    assert db.query(models.PredictionLog).filter(models.PredictionLog.file_name.like("poison-%")).count() == 9
+    rollup = db.get(models.DailyRollup, poison_day.date())
+    assert (rollup.predictions, rollup.rows_predicted) == (9, 36)
+
+
+def test_unreachable_database_keeps_rows_queued(db, poison_day, monkeypatch, tmp_path):
+    """
+    Goal: Verify that rows are kept, not dropped, while the database is unreachable.
+    Setup: A session factory pointing at a database file that cannot be opened.
+    Action: Flush, then restore the database and flush again.
+    Assertion: The first flush raises and keeps every row queued; the second writes them all.
+    """
+    import write_behind
+    from sqlalchemy import create_engine
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.orm import sessionmaker
+
+    store = PredictionStore(max_queue=100, batch_size=10)
+    for index in range(3):
+        store.enqueue({
+            "user_id": 434343,
+            "file_name": f"poison-{index}.csv",
+            "file_digest": "d" * 64,
+            "created_at": poison_day,
+            "response": RESPONSE
+        })
+
+    unreachable = sessionmaker(bind=create_engine(f"sqlite:///{tmp_path}/missing/db.sqlite"))
+    working = write_behind.get_session_factory
+    monkeypatch.setattr(write_behind, "get_session_factory", lambda: unreachable)
+    with pytest.raises(OperationalError):
+        store.flush()
+    assert store.stats()["queued"] == 3
+    assert store.stats()["rejected_total"] == 0
+
+    monkeypatch.setattr(write_behind, "get_session_factory", working)
+    assert store.flush() == 3
@@ -0,0 +1,90 @@
+# Use absolute imports to avoid module not found errors
+import sys
+import logging
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from database import (
+    QueryBudgetExceeded, QueryTimingMiddleware, get_async_db, get_db, query_budget, redact_parameters
+)
+
+
+@pytest.fixture(scope="function")
+def timed_client():
+    """App with one async and one sync route, each running three statements."""
+    app = FastAPI()
+    app.add_middleware(QueryTimingMiddleware)
+
+    @app.get("/async")
+    @query_budget(3)
+    async def async_route(db: AsyncSession = Depends(get_async_db)):
+        for _ in range(3):
+            await db.execute(text("SELECT 1"))
+        return {}
+
+    @app.get("/sync")
+    @query_budget(2)
+    def sync_route(db=Depends(get_db)):
+        for _ in range(3):
+            db.execute(text("SELECT 1"))
+        return {}
+
+    with TestClient(app) as c:
+        yield c
+
+
+def test_server_timing_reports_query_count(timed_client):
+    """
+    Goal: Verify the per-request query count in Server-Timing.
+    Assertion: The header counts the three statements of the request, and only those.
+    """
+    for _ in range(2):
+        response = timed_client.get("/async")
+        assert response.status_code == 200
+        assert response.headers["Server-Timing"].startswith("db;dur=")
+        assert response.headers["Server-Timing"].endswith('desc="3 queries"')
+
+
+def test_query_budget_fails_in_test_mode(timed_client, monkeypatch, caplog):
+    """
+    Goal: Verify query budgets.
+    Setup: A sync route (threadpool) declared at 2 queries that runs 3.
+    Assertion:
+        1. With enforcement on, the request fails with QueryBudgetExceeded.
+        2. With enforcement off, it succeeds and logs a warning.
+    """
+    assert get_settings().DB_QUERY_BUDGET_ENFORCE
+    with pytest.raises(QueryBudgetExceeded, match="executed 3 queries, budget is 2"):
+        timed_client.get("/sync")
+
+    monkeypatch.setattr(get_settings(), "DB_QUERY_BUDGET_ENFORCE", False)
+    with caplog.at_level(logging.WARNING, logger="database"):
+        assert timed_client.get("/sync").status_code == 200
+    assert "budget is 2" in caplog.text
+
+
+def test_slow_queries_are_logged_without_values(db, monkeypatch, caplog):
+    """
+    Goal: Verify slow query logging.
+    Setup: A threshold every statement exceeds.
+    Assertion: The statement is logged with parameter types, never their values.
+    """
+    monkeypatch.setattr(get_settings(), "DB_SLOW_QUERY_MS", 1e-9)
+    with caplog.at_level(logging.WARNING, logger="database"):
+        db.execute(text("SELECT :secret"), {"secret": "hunter2"})
+    assert "Slow query" in caplog.text
+    assert "SELECT ?" in caplog.text
+    assert "hunter2" not in caplog.text
+    assert "'str'" in caplog.text
+
+    assert redact_parameters([("a", 1), ("b", 2)]) == "2 x ['str', 'int']"
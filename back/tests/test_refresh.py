@@ -0,0 +1,136 @@
+# Use absolute imports to avoid module not found errors
+import sys
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+
+import auth
+import models
+from cache import get_session_cache
+from database import get_async_session_factory
+from refresh import RefreshCoordinator
+
+
+class StubWorkOS:
+    """
+    Local stand-in for WorkOS refresh_authentication.
+
+    Like WorkOS, every refresh token can be used only once, so racing
+    refreshes of one session make the losers fail.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.used = set()
+
+    async def refresh(self, refresh_token: str) -> dict:
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        if refresh_token in self.used:
+            raise RuntimeError("Refresh token already used")
+        self.used.add(refresh_token)
+        return {"access_token": f"access-{self.calls}", "refresh_token": f"refresh-{self.calls}"}
+
+
+@pytest.fixture(scope="function")
+def stub_workos():
+    return StubWorkOS()
+
+
+@pytest.fixture(scope="function")
+def coordinator(stub_workos, monkeypatch):
+    coordinator = RefreshCoordinator(refresh_fn=stub_workos.refresh, lead_time=300, scan_interval=0)
+    monkeypatch.setattr(auth, "get_refresh_coordinator", lambda: coordinator)
+    return coordinator
+
+
+def make_session(db, expires_in: timedelta) -> models.AppSession:
+    user = models.User(email=f"{uuid.uuid4()}@example.com", full_name="Refresh User")
+    db.add(user)
+    db.commit()
+    session = models.AppSession(
+        id=str(uuid.uuid4()),
+        user_id=user.id,
+        workos_session_id=f"session_{uuid.uuid4()}",
+        access_token="access-0",
+        refresh_token="refresh-0",
+        expires_at=datetime.utcnow() + expires_in,
+        is_active=True
+    )
+    db.add(session)
+    db.commit()
+    return session
+
+
+def test_concurrent_refreshes_share_one_upstream_call(db, coordinator, stub_workos):
+    """
+    Goal: Verify per-session single-flight refresh.
+    Setup: A session whose access token expires in 30 seconds.
+    Action: Ten concurrent requests ask for fresh tokens.
+    Assertion: WorkOS is called once and every caller gets the new tokens.
+    """
+    session = make_session(db, timedelta(seconds=30))
+
+    async def refresh_many():
+        return await asyncio.gather(*(coordinator.refresh(session.id) for _ in range(10)))
+
+    results = asyncio.run(refresh_many())
+    assert stub_workos.calls == 1
+    assert {result["access_token"] for result in results} == {"access-1"}
+    assert coordinator.stats()["coalesced_total"] == 9
+
+
+def test_auth_dependency_refreshes_once_for_concurrent_requests(db, coordinator, stub_workos, monkeypatch):
+    """
+    Goal: Verify that concurrent requests near expiry do not race on the
+          single-use refresh token.
+    Action: Resolve the user for five concurrent requests with the same session.
+    Assertion: All of them succeed after a single WorkOS call.
+    """
+    monkeypatch.setattr(auth, "DEBUG_BYPASS_AUTH", False)
+    get_session_cache().clear()
+    session = make_session(db, timedelta(seconds=30))
+
+    async def resolve(session_id):
+        # Each request has its own database session
+        async with get_async_session_factory()() as request_db:
+            return await auth.get_current_active_user(session_id, request_db)
+
+    async def resolve_many():
+        return await asyncio.gather(*(resolve(session.id) for _ in range(5)))
+
+    users = asyncio.run(resolve_many())
+    assert {user.id for user in users} == {session.user_id}
+    assert stub_workos.calls == 1
+    get_session_cache().clear()
+
+
+def test_background_refresh_renews_expiring_sessions(db, coordinator, stub_workos):
+    """
+    Goal: Verify proactive refresh.
+    Setup: One session expiring within the lead time, one expiring much later.
+    Action: Run one background scan, then ask for tokens as a request would.
+    Assertion:
+        1. Only the expiring session is refreshed.
+        2. The request finds fresh tokens and causes no further WorkOS call.
+    """
+    expiring = make_session(db, timedelta(minutes=2))
+    later = make_session(db, timedelta(hours=1))
+
+    assert asyncio.run(coordinator.refresh_expiring()) == 1
+    assert stub_workos.calls == 1
+
+    db.expire_all()
+    assert db.get(models.AppSession, expiring.id).refresh_token == "refresh-1"
+    assert db.get(models.AppSession, later.id).refresh_token == "refresh-0"
+
+    tokens = asyncio.run(coordinator.refresh(expiring.id))
+    assert tokens["access_token"] == "access-1"
+    assert stub_workos.calls == 1
@@ -0,0 +1,159 @@
+# Use absolute imports to avoid module not found errors
+import sys
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import auth
+import models
+from database import QueryTimingMiddleware
+from prediction_store import PredictionStore
+from rollups import backfill_rollups
+from routes import admin
+
+FIRST_DAY = date(2001, 3, 1)
+SECOND_DAY = date(2001, 3, 2)
+MAIZE = {"predictions": [0.9, 0.1], "recommended_crop": "maize", "metadata": {}}
+UNLABELLED = {"predictions": [0.6, 0.7, 0.2], "metadata": {}}
+
+
+def rollup_rows(db):
+    """The rollups of the test days as comparable tuples."""
+    daily = db.query(models.DailyRollup).filter(models.DailyRollup.day <= SECOND_DAY).order_by(models.DailyRollup.day)
+    crops = db.query(models.DailyCropRollup).filter(models.DailyCropRollup.day <= SECOND_DAY).order_by(
+        models.DailyCropRollup.day, models.DailyCropRollup.crop
+    )
+    return (
+        [(r.day, r.predictions, r.rows_predicted, r.active_users, r.files_processed) for r in daily],
+        [(r.day, r.crop, r.predictions, r.rows_predicted, r.positive_rows) for r in crops]
+    )
+
+
+@pytest.fixture(scope="function")
+def recorded(db):
+    """
+    Two users' predictions on two days, written through a prediction store
+    in two flushes. Yields the users.
+    """
+    first = models.User(email=f"{uuid.uuid4()}@example.com", full_name="First Farmer")
+    second = models.User(email=f"{uuid.uuid4()}@example.com", full_name="Second Farmer")
+    db.add_all([first, second])
+    db.commit()
+    store = PredictionStore(max_queue=100, batch_size=100, flush_interval=60)
+
+    def record(user, digest, day, response):
+        store.enqueue({
+            "user_id": user.id,
+            "file_name": f"{digest}.csv",
+            "file_digest": digest * 64,
+            "created_at": datetime.combine(day, datetime.min.time()).replace(hour=12),
+            "response": response
+        })
+
+    record(first, "a", FIRST_DAY, MAIZE)
+    record(first, "a", FIRST_DAY, MAIZE)
+    record(second, "b", FIRST_DAY, UNLABELLED)
+    store.flush()
+    # Already-seen user and file in a later flush must not be counted twice
+    record(first, "a", FIRST_DAY, UNLABELLED)
+    record(second, "a", SECOND_DAY, MAIZE)
+    store.flush()
+
+    yield first, second
+
+    for model in (models.DailyRollup, models.DailyCropRollup, models.DailyActiveUser, models.DailyFile):
+        db.query(model).filter(model.day <= SECOND_DAY).delete()
+    db.query(models.PredictionLog).filter(models.PredictionLog.user_id.in_([first.id, second.id])).delete()
+    db.delete(first)
+    db.delete(second)
+    db.commit()
+
+
+def test_rollups_are_maintained_incrementally(recorded, db):
+    """
+    Goal: Verify that flushing predictions keeps the rollups up to date.
+    Setup: Five predictions by two users over two days, in two flushes.
+    Assertion:
+        1. Daily rows count predictions, rows, distinct users and distinct files.
+        2. Crop rows count predictions per crop, with "unknown" for no crop.
+        3. A backfill rebuilds exactly the same rollups from the history.
+    """
+    incremental = rollup_rows(db)
+    assert incremental == (
+        [(FIRST_DAY, 4, 10, 2, 2), (SECOND_DAY, 1, 2, 1, 1)],
+        [
+            (FIRST_DAY, "maize", 2, 4, 2),
+            (FIRST_DAY, "unknown", 2, 6, 4),
+            (SECOND_DAY, "maize", 1, 2, 1)
+        ]
+    )
+
+    assert backfill_rollups(db, FIRST_DAY) >= 2
+    db.expire_all()
+    assert rollup_rows(db) == incremental
+
+
+@pytest.fixture(scope="function")
+def admin_client(recorded, db):
+    """Yields a function returning a TestClient for the admin routes as a given user."""
+    administrator = models.User(email=f"{uuid.uuid4()}@example.com", full_name="Admin", is_admin=True)
+    db.add(administrator)
+    db.commit()
+    app = FastAPI()
+    app.include_router(admin.router)
+    app.add_middleware(QueryTimingMiddleware)
+
+    def client_for(user):
+        app.dependency_overrides[auth.get_current_user] = lambda: user
+        return TestClient(app)
+
+    yield client_for, administrator, recorded[0]
+
+    db.delete(administrator)
+    db.commit()
+
+
+def test_admin_endpoints_read_the_rollups(admin_client):
+    """
+    Goal: Verify the admin dashboard endpoints.
+    Setup: The recorded predictions, an admin and a regular user.
+    Action: Request daily stats, crop stats and crop totals for the test days.
+    Assertion:
+        1. Regular users are refused.
+        2. Each endpoint answers from the rollups within its query budget.
+        3. Reversed date ranges are rejected.
+    """
+    client_for, administrator, farmer = admin_client
+    days = {"since": FIRST_DAY.isoformat(), "until": SECOND_DAY.isoformat()}
+
+    assert client_for(farmer).get("/admin/stats/daily", params=days).status_code == 403
+
+    client = client_for(administrator)
+    response = client.get("/admin/stats/daily", params=days)
+    assert response.status_code == 200
+    assert response.json() == [
+        {"day": "2001-03-01", "predictions": 4, "rows_predicted": 10, "active_users": 2, "files_processed": 2},
+        {"day": "2001-03-02", "predictions": 1, "rows_predicted": 2, "active_users": 1, "files_processed": 1}
+    ]
+
+    crops = client.get("/admin/stats/crops", params=days).json()
+    assert [(row["day"], row["crop"], row["predictions"]) for row in crops] == [
+        ("2001-03-01", "maize", 2), ("2001-03-01", "unknown", 2), ("2001-03-02", "maize", 1)
+    ]
+
+    totals = client.get("/admin/stats/crops/totals", params=days).json()
+    assert totals == [
+        {"day": None, "crop": "maize", "predictions": 3, "rows_predicted": 6, "positive_rows": 3},
+        {"day": None, "crop": "unknown", "predictions": 2, "rows_predicted": 6, "positive_rows": 4}
+    ]
+
+    reversed_days = {"since": SECOND_DAY.isoformat(), "until": FIRST_DAY.isoformat()}
+    assert client.get("/admin/stats/daily", params=reversed_days).status_code == 400
@@ -0,0 +1,128 @@
+# Use absolute imports to avoid module not found errors
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+import auth
+import crud
+import models
+from cache import TTLCache, get_session_cache
+
+
+@pytest.fixture(scope="function")
+def session_client(db, monkeypatch):
+    """
+    TestClient for an app whose only route depends on get_current_active_user,
+    with the real session lookup (no debug bypass) and an empty cache.
+    """
+    monkeypatch.setattr(auth, "DEBUG_BYPASS_AUTH", False)
+    get_session_cache().clear()
+
+    app = FastAPI()
+
+    @app.get("/whoami")
+    async def whoami(user: models.User = Depends(auth.get_current_active_user)):
+        return {"id": user.id, "full_name": user.full_name}
+
+    with TestClient(app) as c:
+        yield c
+    get_session_cache().clear()
+
+
+@pytest.fixture(scope="function")
+def app_session(db):
+    """A user with one active session whose access token is valid for an hour."""
+    user = models.User(email=f"{uuid.uuid4()}@example.com", full_name="Cached User")
+    db.add(user)
+    db.commit()
+    session = models.AppSession(
+        id=str(uuid.uuid4()),
+        user_id=user.id,
+        workos_session_id=f"session_{uuid.uuid4()}",
+        access_token="access",
+        refresh_token="refresh",
+        expires_at=datetime.utcnow() + timedelta(hours=1),
+        is_active=True
+    )
+    db.add(session)
+    db.commit()
+    return session
+
+
+def test_repeat_requests_are_served_from_cache(session_client, app_session):
+    """
+    Goal: Verify that the session and user are resolved once per session.
+    Assertion: The first request misses the cache and the second one hits it.
+    """
+    session_client.cookies.set("session_token", app_session.id)
+    assert session_client.get("/whoami").status_code == 200
+    assert session_client.get("/whoami").status_code == 200
+
+    stats = get_session_cache().stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+
+
+def test_invalidated_session_is_rejected_immediately(session_client, db, app_session):
+    """
+    Goal: Verify that logging out takes effect before the cache entry expires.
+    Setup: The session is cached by a successful request.
+    Action: Invalidate the session as logout does.
+    Assertion: The very next request with the same cookie is rejected with 401.
+    """
+    session_client.cookies.set("session_token", app_session.id)
+    assert session_client.get("/whoami").status_code == 200
+
+    assert crud.invalidate_session(db, session_id=app_session.id)
+
+    response = session_client.get("/whoami")
+    assert response.status_code == 401
+
+
+def test_user_update_invalidates_cached_sessions(session_client, db, app_session):
+    """
+    Goal: Verify that user updates are visible on the next request.
+    Action: Update the user's name through crud.create_or_update_user.
+    Assertion: The next request returns the new name instead of the cached one.
+    """
+    session_client.cookies.set("session_token", app_session.id)
+    assert session_client.get("/whoami").json()["full_name"] == "Cached User"
+
+    user = crud.get_user(db, app_session.user_id)
+    profile = type("Profile", (), {
+        "id": "user_workos", "email": user.email, "first_name": "Renamed", "last_name": "User"
+    })
+    crud.create_or_update_user(db, profile)
+
+    assert session_client.get("/whoami").json()["full_name"] == "Renamed User"
+
+
+def test_ttl_cache_expires_and_evicts():
+    """
+    Goal: Verify the TTL and size bounds of TTLCache.
+    Assertion:
+        1. Entries expire once the TTL has passed.
+        2. The least recently used entry is evicted when the cache is full.
+    """
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    now[0] = 11.0
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
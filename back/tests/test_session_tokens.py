@@ -0,0 +1,175 @@
+# Use absolute imports to avoid module not found errors
+import asyncio
+import base64
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import auth
+import crud
+import models
+from cache import get_session_cache
+from database import get_async_engine
+from session_tokens import (
+    SESSION_TOKEN_COOKIE, RevocationList, _sign, issue_session_token, verify_session_token
+)
+
+SECRET = "test-secret"
+
+
+def test_token_round_trip_and_tampering():
+    """
+    Goal: Verify signing and verification of session tokens.
+    Assertion:
+        1. A fresh token verifies and carries the user id, session id and role.
+        2. Tokens with a changed payload, a wrong key or a passed exp are rejected.
+    """
+    token = issue_session_token(7, "session-1", "admin", SECRET, ttl=60)
+    claims = verify_session_token(token, SECRET)
+    assert (claims["uid"], claims["sid"], claims["role"]) == (7, "session-1", "admin")
+
+    payload, signature = token.split(".")
+    forged = issue_session_token(8, "session-1", "admin", SECRET, ttl=60).split(".")[0]
+    assert verify_session_token(f"{forged}.{signature}", SECRET) is None
+    assert verify_session_token(token, "other-secret") is None
+    assert verify_session_token(token, SECRET, now=time.time() + 61) is None
+
+
+@pytest.mark.parametrize("cookie", [
+    "a.\u00e9",
+    "\u00e9.abc",
+    "payload.signature\u00e9",
+    "no-separator",
+    "too.many.dots",
+    ".",
+    "\x00.\x00",
+])
+def test_malformed_tokens_are_rejected(cookie):
+    """
+    Goal: Verify that tampered cookies fail verification instead of raising.
+    Assertion: Malformed and non-ASCII tokens verify to None.
+    """
+    assert verify_session_token(cookie, SECRET) is None
+
+
+def test_truncated_and_unsigned_payloads_are_rejected():
+    """
+    Goal: Verify that damaged but ASCII tokens are rejected.
+    Assertion:
+        1. Truncating the payload or the signature makes the token invalid.
+        2. A correctly signed payload that is not a JSON object is rejected.
+    """
+    token = issue_session_token(7, "session-1", "admin", SECRET, ttl=60)
+    payload, signature = token.split(".")
+    assert verify_session_token(f"{payload[:-3]}.{signature}", SECRET) is None
+    assert verify_session_token(f"{payload}.{signature[:-3]}", SECRET) is None
+    assert verify_session_token(f"{payload}.", SECRET) is None
+
+    for body in (b"[1, 2]", b"\xff\xfe"):
+        garbage = base64.urlsafe_b64encode(body).rstrip(b"=")
+        assert verify_session_token(f"{garbage.decode()}.{_sign(garbage, SECRET).decode()}", SECRET) is None
+
+
+@pytest.fixture(scope="function")
+def stateless_client(db, monkeypatch):
+    """TestClient with stateless sessions enabled and real session lookups."""
+    monkeypatch.setattr(auth, "DEBUG_BYPASS_AUTH", False)
+    monkeypatch.setattr(auth.settings, "STATELESS_SESSIONS", True)
+    monkeypatch.setattr(auth.settings, "SECRET_KEY", SECRET)
+    get_session_cache().clear()
+
+    app = FastAPI()
+
+    @app.get("/whoami")
+    async def whoami(user: models.User = Depends(auth.get_current_active_user)):
+        return {"id": user.id, "is_admin": user.is_admin}
+
+    with TestClient(app) as c:
+        yield c
+    get_session_cache().clear()
+
+
+def make_session(db) -> models.AppSession:
+    user = models.User(email=f"{uuid.uuid4()}@example.com", full_name="Stateless User", is_admin=True)
+    db.add(user)
+    db.commit()
+    session = models.AppSession(
+        id=str(uuid.uuid4()),
+        user_id=user.id,
+        workos_session_id=f"session_{uuid.uuid4()}",
+        refresh_token="refresh",
+        expires_at=datetime.utcnow() + timedelta(hours=1),
+        is_active=True
+    )
+    db.add(session)
+    db.commit()
+    return session
+
+
+def test_signed_cookie_skips_database_until_logout(stateless_client, db):
+    """
+    Goal: Verify the stateless session mode end to end.
+    Setup: The first request resolves the session in the database and
+           receives a signed session cookie.
+    Assertion:
+        1. The next request is authenticated without any SQL statement.
+        2. After logout invalidates the session, the same cookie is rejected.
+    """
+    session = make_session(db)
+    stateless_client.cookies.set("session_token", session.id)
+    first = stateless_client.get("/whoami")
+    assert first.status_code == 200
+    assert SESSION_TOKEN_COOKIE in first.cookies
+
+    statements = []
+    engine = get_async_engine().sync_engine
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        get_session_cache().clear()
+        second = stateless_client.get("/whoami")
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert second.json() == {"id": session.user_id, "is_admin": True}
+    assert statements == []
+
+    assert crud.invalidate_session(db, session_id=session.id)
+    assert stateless_client.get("/whoami").status_code == 401
+
+
+def test_tampered_cookie_is_unauthorized(stateless_client):
+    """
+    Goal: Verify that a non-ASCII signed session cookie is rejected by authenticated routes.
+    Assertion: The request gets a 401, not a server error.
+    """
+    cookie = f"{SESSION_TOKEN_COOKIE}=\u00e9.abc".encode("latin-1")
+    assert stateless_client.get("/whoami", headers={"Cookie": cookie}).status_code == 401
+
+
+def test_revocations_reach_other_workers_on_sync(db, monkeypatch):
+    """
+    Goal: Verify that revocations are shared through the database.
+    Setup: A second RevocationList stands in for another worker process.
+    Assertion: It rejects the session only after its next sync.
+    """
+    monkeypatch.setattr(auth.settings, "STATELESS_SESSIONS", True)
+    session = make_session(db)
+    other_worker = RevocationList(retention=300)
+    asyncio.run(other_worker.sync())
+
+    crud.invalidate_session(db, session_id=session.id)
+    assert not other_worker.is_revoked(session.id)
+
+    asyncio.run(other_worker.sync())
+    assert other_worker.is_revoked(session.id)
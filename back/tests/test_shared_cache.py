@@ -0,0 +1,328 @@
+# Use absolute imports to avoid module not found errors
+import sys
+import asyncio
+from datetime import datetime
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+from cache import CachedIdentity, TTLCache, decode_identity, encode_identity, identity_tags
+from shared_cache import RedisBackend, TieredCache, encode_command, read_reply
+
+
+class StandInServer:
+    """In-process server speaking the subset of the Redis protocol the backend uses."""
+
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+        self.subscribers = {}
+        self.transactions = {}
+        self.connections = set()
+        self.commands = []
+        # Seconds to wait before answering each command
+        self.delay = 0.0
+        self._server = None
+
+    async def start(self, port: int = 0) -> str:
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", port)
+        return f"redis://127.0.0.1:{self._server.sockets[0].getsockname()[1]}"
+
+    async def stop(self) -> None:
+        """Close every connection but keep the data, like a network partition."""
+        self._server.close()
+        for writer in self.connections:
+            writer.close()
+        self.connections.clear()
+        self.subscribers.clear()
+        self.transactions.clear()
+        await self._server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        self.connections.add(writer)
+        try:
+            while True:
+                command = await read_reply(reader)
+                name, args = command[0].decode().upper(), command[1:]
+                self.commands.append(name)
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                writer.write(self._transact(name, args, writer))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+            self.connections.discard(writer)
+
+    def _transact(self, name, args, writer) -> bytes:
+        """Queue commands between MULTI and EXEC, then run them in one go."""
+        if name == "MULTI":
+            self.transactions[writer] = []
+            return b"+OK\r\n"
+        if name == "EXEC":
+            queued = self.transactions.pop(writer)
+            return b"*%d\r\n" % len(queued) + b"".join(self._reply(n, a, writer) for n, a in queued)
+        if writer in self.transactions:
+            self.transactions[writer].append((name, args))
+            return b"+QUEUED\r\n"
+        return self._reply(name, args, writer)
+
+    def _reply(self, name, args, writer) -> bytes:
+        if name == "PING":
+            return b"+PONG\r\n"
+        if name == "GET":
+            value = self.values.get(args[0])
+            return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+        if name == "SET":
+            self.values[args[0]] = args[1]
+            return b"+OK\r\n"
+        if name == "DEL":
+            removed = sum(self.values.pop(key, None) is not None or self.sets.pop(key, None) is not None for key in args)
+            return b":%d\r\n" % removed
+        if name == "SADD":
+            self.sets.setdefault(args[0], set()).update(args[1:])
+            return b":1\r\n"
+        if name == "PEXPIRE":
+            return b":1\r\n"
+        if name == "SMEMBERS":
+            members = self.sets.get(args[0], set())
+            return b"*%d\r\n" % len(members) + b"".join(b"$%d\r\n%s\r\n" % (len(m), m) for m in members)
+        if name == "PUBLISH":
+            receivers = self.subscribers.get(args[0], [])
+            for receiver in receivers:
+                receiver.write(encode_command("message", args[0], args[1]))
+            return b":%d\r\n" % len(receivers)
+        if name == "SUBSCRIBE":
+            for channel in args:
+                self.subscribers.setdefault(channel, []).append(writer)
+            return encode_command("subscribe", args[0], 1)
+        return b"-ERR unknown command\r\n"
+
+
+async def wait_for(condition, timeout: float = 2.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+
+def make_worker(url: str, name: str = "sessions", retry_interval: float = 5):
+    """A backend and session-style cache as one worker process would build them."""
+    backend = RedisBackend(url, timeout=0.5, retry_interval=retry_interval)
+    cache = TieredCache(
+        name, TTLCache(maxsize=100, ttl=60), backend=backend,
+        encode=encode_identity, decode=decode_identity, tags_of=identity_tags
+    )
+    return backend, cache
+
+
+def identity(user_id: int) -> CachedIdentity:
+    return CachedIdentity(user_id, {"id": user_id, "created_at": datetime(2024, 5, 1, 12, 30)}, None)
+
+
+def test_entries_are_shared_between_workers():
+    """
+    Goal: Verify that one worker's cache entries serve another worker's misses.
+    Setup: A stand-in server and two workers with empty local caches.
+    Action: Worker A stores a session; worker B looks it up twice.
+    Assertion:
+        1. B's first lookup is an L2 hit that round-trips the identity, datetimes included.
+        2. B's second lookup is served from its L1 without another server read.
+    """
+    async def scenario():
+        server = StandInServer()
+        url = await server.start()
+        backend_a, cache_a = make_worker(url)
+        backend_b, cache_b = make_worker(url)
+        await backend_a.start()
+        await backend_b.start()
+        try:
+            await cache_a.aset("sid-1", identity(7))
+            assert await cache_b.aget("sid-1") == identity(7)
+            reads = server.commands.count("GET")
+            assert await cache_b.aget("sid-1") == identity(7)
+            assert server.commands.count("GET") == reads
+            assert cache_b.stats()["l2_hits"] == 1
+        finally:
+            await backend_a.close()
+            await backend_b.close()
+            await server.stop()
+
+    asyncio.run(scenario())
+
+
+def test_invalidation_reaches_every_worker():
+    """
+    Goal: Verify that invalidations are applied in L2 and in other workers' L1 via pub/sub.
+    Setup: Two subscribed workers that both hold two sessions of user 7 in L1.
+    Action: Worker A invalidates one session, then every session of user 7.
+    Assertion:
+        1. After each invalidation worker B's L1 no longer has the entries.
+        2. The entries are gone from the server, so B cannot reload them.
+    """
+    async def scenario():
+        server = StandInServer()
+        url = await server.start()
+        backend_a, cache_a = make_worker(url)
+        backend_b, cache_b = make_worker(url)
+        await backend_a.start()
+        await backend_b.start()
+        try:
+            await wait_for(lambda: len(server.subscribers.get(b"cache:invalidate", [])) == 2)
+            await cache_a.aset("sid-1", identity(7))
+            await cache_a.aset("sid-2", identity(7))
+            await cache_a.aset("sid-3", identity(8))
+            for key in ("sid-1", "sid-2", "sid-3"):
+                assert await cache_b.aget(key) is not None
+
+            cache_a.invalidate("sid-1")
+            await wait_for(lambda: cache_b.get("sid-1") is None)
+            assert await cache_b.aget("sid-1") is None
+
+            cache_a.invalidate_tag("user:7")
+            await wait_for(lambda: cache_b.get("sid-2") is None)
+            assert await cache_b.aget("sid-2") is None
+            assert cache_b.get("sid-3") == identity(8)
+            assert cache_b.stats()["remote_invalidations"] == 2
+        finally:
+            await backend_a.close()
+            await backend_b.close()
+            await server.stop()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_reads_do_not_queue_on_one_connection():
+    """
+    Goal: Verify that concurrent L2 reads run on pooled connections in parallel.
+    Setup: A server that takes 0.2 seconds per command and a pool of four connections.
+    Action: Four requests miss L1 at once.
+    Assertion:
+        1. They finish in about one round trip, not four.
+        2. The connections stay open for reuse afterwards.
+    """
+    async def scenario():
+        server = StandInServer()
+        url = await server.start()
+        backend = RedisBackend(url, timeout=1, pool_size=4)
+        await backend.start()
+        try:
+            server.delay = 0.2
+            started = asyncio.get_running_loop().time()
+            await asyncio.gather(*(backend.get(f"sessions:sid-{n}") for n in range(4)))
+            assert asyncio.get_running_loop().time() - started < 0.6
+            assert backend.stats()["idle_connections"] == 4
+        finally:
+            await backend.close()
+            await server.stop()
+
+    asyncio.run(scenario())
+
+
+def test_unreachable_server_falls_back_to_local_cache():
+    """
+    Goal: Verify that the cache keeps working in process when the server is down.
+    Setup: A worker whose server URL refuses connections.
+    Action: Store, read and invalidate an entry.
+    Assertion:
+        1. Reads and writes are served locally without raising.
+        2. After the first failure the server is marked down and not retried.
+    """
+    async def scenario():
+        server = StandInServer()
+        url = await server.start()
+        await server.stop()
+        backend, cache = make_worker(url)
+        await backend.start()
+        try:
+            await cache.aset("sid-1", identity(7))
+            assert await cache.aget("sid-1") == identity(7)
+            assert await cache.aget("sid-2") is None
+            cache.invalidate("sid-1")
+            assert cache.get("sid-1") is None
+            assert not backend.available
+            assert backend.errors_total == 1
+        finally:
+            await backend.close()
+
+    asyncio.run(scenario())
+
+
+def test_awaited_invalidation_updates_the_server_before_returning():
+    """
+    Goal: Verify that ainvalidate and ainvalidate_tag are done with L2 when they return.
+    Setup: A worker holding two sessions of user 7 and one of user 8 in L1 and L2.
+    Action: Await the invalidation of one session, then of every session of user 7.
+    Assertion:
+        1. Right after each call the entries are gone from the server.
+        2. The tag set is deleted with its members; user 8's session is untouched.
+    """
+    async def scenario():
+        server = StandInServer()
+        url = await server.start()
+        backend, cache = make_worker(url)
+        await backend.start()
+        try:
+            await wait_for(lambda: len(server.subscribers.get(b"cache:invalidate", [])) == 1)
+            await cache.aset("sid-1", identity(7))
+            await cache.aset("sid-2", identity(7))
+            await cache.aset("sid-3", identity(8))
+
+            assert await cache.ainvalidate("sid-1")
+            assert b"sessions:sid-1" not in server.values
+
+            assert await cache.ainvalidate_tag("user:7") == 1
+            assert b"sessions:sid-2" not in server.values
+            assert b"sessions:tag:user:7" not in server.sets
+            assert b"sessions:sid-3" in server.values
+            assert cache.stats()["pending_invalidations"] == 0
+        finally:
+            await backend.close()
+            await server.stop()
+
+    asyncio.run(scenario())
+
+
+def test_invalidation_during_an_outage_is_replayed():
+    """
+    Goal: Verify that an entry invalidated while the server was unreachable is never served after it returns.
+    Setup: Two workers sharing a session of user 7; the server then drops every
+           connection but keeps its data, like a network partition.
+    Action: Worker A logs the session out during the outage; the server comes back.
+    Assertion:
+        1. During the outage A drops its L1 copy and keeps the invalidation pending.
+        2. After recovery A replays it: the stale L2 entry is deleted and served to neither worker.
+    """
+    async def scenario():
+        server = StandInServer()
+        url = await server.start()
+        port = int(url.rsplit(":", 1)[1])
+        backend_a, cache_a = make_worker(url, retry_interval=0.2)
+        backend_b, cache_b = make_worker(url, retry_interval=0.2)
+        await backend_a.start()
+        await backend_b.start()
+        try:
+            await wait_for(lambda: len(server.subscribers.get(b"cache:invalidate", [])) == 2)
+            await cache_a.aset("sid-1", identity(7))
+            assert await cache_b.aget("sid-1") == identity(7)
+
+            await server.stop()
+            await cache_a.ainvalidate("sid-1")
+            assert cache_a.get("sid-1") is None
+            assert cache_a.stats()["pending_invalidations"] == 1
+            assert b"sessions:sid-1" in server.values
+
+            await server.start(port)
+            await asyncio.sleep(0.25)
+            assert await cache_a.aget("sid-1") is None
+            assert b"sessions:sid-1" not in server.values
+            assert cache_a.stats()["pending_invalidations"] == 0
+            await wait_for(lambda: cache_b.get("sid-1") is None)
+            assert await cache_b.aget("sid-1") is None
+        finally:
+            await backend_a.close()
+            await backend_b.close()
+            await server.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,110 @@
+# Use absolute imports to avoid module not found errors
+import sys
+import time
+from pathlib import Path
+
+# Ensure parent directory is in path
+if str(Path(__file__).parent.parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent.parent))
+
+from upstreams import CircuitBreaker, UpstreamPool
+
+REPLICAS = [f"http://ai-{index}:1337" for index in range(4)]
+KEYS = [f"file-{index}" for index in range(2000)]
+
+
+def owners(pool: UpstreamPool) -> dict:
+    return {key: pool.choose_for_key(key).base_url for key in KEYS}
+
+
+def test_same_key_routes_to_same_replica():
+    """
+    Goal: Verify that repeat uploads of a file reach the same replica.
+    Assertion: Every choice for a key is identical while the pool is idle.
+    """
+    pool = UpstreamPool(REPLICAS)
+    first = owners(pool)
+    assert owners(pool) == first
+    # Keys are spread over every replica
+    assert set(first.values()) == set(REPLICAS)
+
+
+def test_adding_or_removing_a_replica_remaps_few_keys():
+    """
+    Goal: Verify the consistent-hashing property.
+    Assertion:
+        1. Adding a fifth replica only moves keys onto the new replica,
+           roughly 1/5 of them.
+        2. Removing a replica only moves the keys it owned.
+    """
+    pool = UpstreamPool(REPLICAS)
+    before = owners(pool)
+
+    pool.add_replica("http://ai-4:1337")
+    after = owners(pool)
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert all(after[key] == "http://ai-4:1337" for key in moved)
+    assert len(moved) < len(KEYS) * 0.3
+
+    pool.remove_replica(REPLICAS[0])
+    removed = owners(pool)
+    moved = [key for key in KEYS if after[key] != removed[key]]
+    assert all(after[key] == REPLICAS[0] for key in moved)
+
+
+def test_hot_key_spills_over_when_replica_is_overloaded():
+    """
+    Goal: Verify the bounded-load rule.
+    Setup: The owner of a key already holds many more outstanding requests
+           than the average.
+    Assertion: The key is sent to another replica until the load evens out.
+    """
+    pool = UpstreamPool(REPLICAS, load_factor=1.25)
+    owner = pool.choose_for_key("hot-file")
+    for _ in range(5):
+        owner.begin()
+
+    assert pool.choose_for_key("hot-file") is not owner
+
+    for _ in range(5):
+        owner.end(0.0, success=True)
+    assert pool.choose_for_key("hot-file") is owner
+
+
+def test_circuit_breaker_half_open_transitions():
+    """
+    Goal: Verify the circuit breaker state machine.
+    Setup: Failure threshold 2 and a 50 ms reset timeout.
+    Assertion:
+        1. Two consecutive failures open the breaker, which then refuses requests.
+        2. After the reset timeout a single half-open probe is let through.
+        3. A failed probe opens the breaker again; a successful one closes it.
+    """
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.on_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.on_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.available()
+
+    time.sleep(0.06)
+    assert breaker.available()
+    breaker.on_dispatch()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.available()
+
+    breaker.on_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.available()
+
+    time.sleep(0.06)
+    breaker.on_dispatch()
+    breaker.on_abandon()
+    # An abandoned probe frees the slot without deciding anything
+    assert breaker.state == CircuitBreaker.HALF_OPEN and breaker.available()
+    breaker.on_dispatch()
+    breaker.on_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.available()
+
@@ -0,0 +1,279 @@
+"""
+Client-side load balancing across AI microservice replicas.
+
+``UpstreamPool`` keeps one ``Replica`` per configured base URL. Each replica
+tracks its outstanding requests, recent latencies, error counts, the result
+of the last active health check against ``/health``, and a
+``CircuitBreaker``. Requests go to the available replica with the fewest
+outstanding requests, or, when the caller supplies an affinity key (e.g. a
+digest of the uploaded file), to the replica that owns the key on a
+consistent-hash ring, so repeat uploads hit the same replica's cache.
+"""
+import bisect
+import hashlib
+import logging
+import math
+import random
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker with half-open probing.
+
+    - ``closed``: requests flow; ``failure_threshold`` consecutive failures open it
+    - ``open``: requests are refused until ``reset_timeout`` seconds have passed
+    - ``half_open``: a single probe request is let through; success closes the
+      breaker, failure opens it again
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def available(self) -> bool:
+        """Whether a request may be sent now, without changing state."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+        return not self.probe_in_flight
+
+    def on_dispatch(self) -> None:
+        """Record that a request is being sent (claims the half-open probe)."""
+        if self.state == self.OPEN:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            self.probe_in_flight = True
+
+    def on_success(self) -> None:
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+        if self.state != self.CLOSED:
+            logger.info("Circuit breaker closed")
+        self.state = self.CLOSED
+
+    def on_failure(self) -> None:
+        self.consecutive_failures += 1
+        self.probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuit breaker opened after {self.consecutive_failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def on_abandon(self) -> None:
+        """A dispatched request was cancelled before it produced a result."""
+        self.probe_in_flight = False
+
+
+class Replica:
+    """One AI microservice instance and its live statistics."""
+
+    def __init__(self, base_url: str, breaker: CircuitBreaker, latency_window: int = 256):
+        self.base_url = base_url.rstrip("/")
+        self.breaker = breaker
+        self.healthy = True
+        self.last_health_check: Optional[float] = None
+        self.outstanding = 0
+        self.requests_total = 0
+        self.errors_total = 0
+        self.latencies = deque(maxlen=latency_window)
+
+    def available(self) -> bool:
+        return self.healthy and self.breaker.available()
+
+    def begin(self) -> float:
+        """Mark a request as dispatched; returns its start time."""
+        self.breaker.on_dispatch()
+        self.outstanding += 1
+        self.requests_total += 1
+        return time.monotonic()
+
+    def end(self, started: float, success: bool) -> None:
+        """Record the outcome of a request started with ``begin``."""
+        self.outstanding -= 1
+        self.latencies.append(time.monotonic() - started)
+        if success:
+            self.breaker.on_success()
+        else:
+            self.errors_total += 1
+            self.breaker.on_failure()
+
+    def abandon(self) -> None:
+        """Record a request that was cancelled (e.g. the losing hedge)."""
+        self.outstanding -= 1
+        self.breaker.on_abandon()
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(int(len(ordered) * percentile / 100), len(ordered) - 1)
+        return ordered[index]
+
+    def stats(self) -> Dict[str, Any]:
+        def ms(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value * 1000, 2)
+
+        return {
+            "base_url": self.base_url,
+            "healthy": self.healthy,
+            "circuit": self.breaker.state,
+            "outstanding": self.outstanding,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "latency_ms": {
+                "p50": ms(self.latency_percentile(50)),
+                "p95": ms(self.latency_percentile(95)),
+                "p99": ms(self.latency_percentile(99)),
+                "samples": len(self.latencies)
+            }
+        }
+
+
+def _ring_hash(value: str) -> int:
+    """Stable 64-bit position on the ring (Python's ``hash`` is salted per process)."""
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent-hash ring with virtual nodes.
+
+    Each node is placed at ``vnodes`` pseudo-random points. A key belongs to
+    the first point clockwise from its own hash, so adding or removing one
+    of ``n`` nodes only moves about ``1/n`` of the keys.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 100):
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str) -> None:
+        for index in range(self.vnodes):
+            point = _ring_hash(f"{node}#{index}")
+            position = bisect.bisect(self._points, point)
+            self._points.insert(position, point)
+            self._owners.insert(position, node)
+
+    def remove(self, node: str) -> None:
+        kept = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in kept]
+        self._owners = [o for _, o in kept]
+
+    def walk(self, key: str) -> Iterator[str]:
+        """Yield each distinct node once, in ring order starting at ``key``."""
+        if not self._points:
+            return
+        start = bisect.bisect(self._points, _ring_hash(key))
+        seen = set()
+        for offset in range(len(self._points)):
+            owner = self._owners[(start + offset) % len(self._points)]
+            if owner not in seen:
+                seen.add(owner)
+                yield owner
+
+
+class UpstreamPool:
+    """
+    Load balancing over a set of replicas.
+
+    ``choose`` uses least outstanding requests. ``choose_for_key`` uses
+    consistent hashing with bounded loads: a replica is skipped while it
+    has more than ``load_factor`` times the average outstanding requests,
+    and the key spills over to the next replica on the ring.
+    """
+
+    def __init__(
+        self,
+        base_urls: Iterable[str],
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        vnodes: int = 100,
+        load_factor: float = 1.25
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.load_factor = load_factor
+        self.replicas: List[Replica] = []
+        self.ring = HashRing(vnodes=vnodes)
+        for url in base_urls:
+            self.add_replica(url)
+        if not self.replicas:
+            raise ValueError("At least one AI microservice URL is required")
+
+    def add_replica(self, base_url: str) -> Replica:
+        replica = Replica(base_url, CircuitBreaker(self.failure_threshold, self.reset_timeout))
+        if any(r.base_url == replica.base_url for r in self.replicas):
+            raise ValueError(f"Duplicate AI microservice URL: {replica.base_url}")
+        self.replicas.append(replica)
+        self.ring.add(replica.base_url)
+        return replica
+
+    def remove_replica(self, base_url: str) -> None:
+        base_url = base_url.rstrip("/")
+        self.replicas = [r for r in self.replicas if r.base_url != base_url]
+        self.ring.remove(base_url)
+
+    def _candidates(self, exclude: Iterable[Replica]) -> List[Replica]:
+        """
+        Replicas that may take a request, in pool order.
+
+        If health checks mark every replica down, replicas whose breakers
+        allow traffic are still used rather than failing every request.
+        """
+        excluded = set(map(id, exclude))
+        candidates = [r for r in self.replicas if id(r) not in excluded and r.available()]
+        if not candidates:
+            candidates = [
+                r for r in self.replicas
+                if id(r) not in excluded and r.breaker.available()
+            ]
+        return candidates
+
+    def choose(self, exclude: Iterable[Replica] = ()) -> Optional[Replica]:
+        """Pick the available replica with the fewest outstanding requests."""
+        candidates = self._candidates(exclude)
+        if not candidates:
+            return None
+        fewest = min(r.outstanding for r in candidates)
+        return random.choice([r for r in candidates if r.outstanding == fewest])
+
+    def choose_for_key(self, key: str, exclude: Iterable[Replica] = ()) -> Optional[Replica]:
+        """
+        Pick the replica owning ``key`` on the ring, bounded by load.
+
+        The first available replica clockwise from the key is used unless it
+        already holds ``ceil(load_factor * average)`` outstanding requests
+        (counting the new one), in which case the next one on the ring is
+        tried. At least one replica is always under the bound.
+        """
+        candidates = {r.base_url: r for r in self._candidates(exclude)}
+        if not candidates:
+            return None
+        total = sum(r.outstanding for r in candidates.values()) + 1
+        capacity = math.ceil(self.load_factor * total / len(candidates))
+        for base_url in self.ring.walk(key):
+            replica = candidates.get(base_url)
+            if replica is not None and replica.outstanding < capacity:
+                return replica
+        return self.choose(exclude)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [replica.stats() for replica in self.replicas]
@@ -0,0 +1,263 @@
+"""
+Write-behind bulk inserts.
+
+``WriteBehindQueue`` appends rows for one table to a bounded in-memory
+queue and returns immediately. A background task writes the queue out in
+bulk multi-row inserts whenever ``batch_size`` rows are waiting or
+``flush_interval`` seconds have passed, and once more at shutdown.
+
+When the queue is full new rows are dropped (and counted) rather than
+blocking requests or growing memory without bound. Rows still queued when
+a process is killed are lost, so this is for best-effort records such as
+activity logs and prediction history.
+
+A batch that fails because the database is unreachable is put back and
+retried on the next flush. A batch that fails for any other reason (a row
+the database or ``after_insert`` rejects) is retried in halves until the
+offending rows are isolated; those are logged and dropped, so one bad row
+cannot hold up the queue behind it.
+
+Subclasses set ``model`` and may override ``prepare_row`` to turn queued
+items into column values on the flush thread, off the event loop, and
+``after_insert`` to write derived rows in the same transaction.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from database import get_session_factory
+
+logger = logging.getLogger(__name__)
+
+# Longest row description written to the log when a row is rejected
+MAX_LOGGED_ROW_CHARS = 500
+
+
+def is_transient(error: Exception) -> bool:
+    """Pure function telling connection-level failures, worth retrying later, from failures caused by the rows."""
+    if isinstance(error, (OperationalError, InterfaceError, PoolTimeoutError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+def describe_row(row: Dict[str, Any]) -> str:
+    """Pure function summarizing a rejected row for the log, without binary payloads."""
+    shown = {
+        key: f"<{len(value)} bytes>" if isinstance(value, (bytes, bytearray)) else value
+        for key, value in row.items()
+    }
+    return repr(shown)[:MAX_LOGGED_ROW_CHARS]
+
+
+class WriteBehindQueue:
+    """Bounded queue of rows for ``model``, flushed to the database in batches."""
+
+    model = None
+    name = "write-behind"
+
+    def __init__(self, max_queue: int = 10000, batch_size: int = 500, flush_interval: float = 1.0):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self.enqueued_total = 0
+        self.dropped_total = 0
+        self.flushed_total = 0
+        self.flushes_total = 0
+        self.flush_errors_total = 0
+        self.rejected_total = 0
+        self.last_flush_seconds: Optional[float] = None
+
+    async def start(self) -> None:
+        """Start the background flusher. Called from the app lifespan."""
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the flusher and write out everything still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await run_in_threadpool(self.flush)
+        except Exception as e:
+            logger.error(f"Final {self.name} flush failed, {len(self._queue)} rows lost: {e}")
+        self._loop = None
+
+    def enqueue(self, item: Any) -> bool:
+        """Queue an item. Returns False if it was dropped because the queue is full."""
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self.dropped_total += 1
+                return False
+            self._queue.append(item)
+            self.enqueued_total += 1
+            queued = len(self._queue)
+        if queued >= self.batch_size:
+            self._wake()
+        return True
+
+    def prepare_row(self, item: Any) -> Dict[str, Any]:
+        """Column values for a queued item. Runs on the flush thread."""
+        return item
+
+    def after_insert(self, db: Session, rows: List[Dict[str, Any]]) -> None:
+        """Hook run after each batch is inserted, before it is committed."""
+
+    def _wake(self) -> None:
+        if self._loop is None or self._wakeup is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._wakeup.set()
+        else:
+            # Called from a threadpool worker (sync route or dependency)
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await run_in_threadpool(self.flush)
+            except Exception as e:
+                logger.error(f"{self.name} flush failed: {e}")
+
+    def _take_batch(self) -> List[Any]:
+        with self._lock:
+            count = min(self.batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _requeue(self, batch: List[Any]) -> None:
+        """Put a failed batch back at the front, dropping what no longer fits."""
+        with self._lock:
+            room = max(0, self.max_queue - len(self._queue))
+            kept = batch[:room]
+            self._queue.extendleft(reversed(kept))
+            self.dropped_total += len(batch) - len(kept)
+
+    def _prepare_batch(self, batch: List[Any]) -> Tuple[List[Any], List[Dict[str, Any]]]:
+        """Column values for a batch, and the items they came from, in the same order."""
+        items, rows = [], []
+        for item in batch:
+            try:
+                rows.append(self.prepare_row(item))
+                items.append(item)
+            except Exception as e:
+                # A malformed item must not hold up (or be retried with) the rest
+                self.dropped_total += 1
+                self.rejected_total += 1
+                logger.error(f"Dropping unwritable {self.name} row: {e}")
+        return items, rows
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        """Insert ``rows`` and run ``after_insert`` in one transaction."""
+        db = get_session_factory()()
+        try:
+            db.execute(insert(self.model), rows)
+            self.after_insert(db, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _write_isolating(self, items: List[Any], rows: List[Dict[str, Any]]) -> int:
+        """
+        Write a batch that failed as a whole, in ever smaller parts.
+
+        Parts that fail are split in half until single rows remain; a row
+        that fails on its own is logged and dropped. If the database becomes
+        unreachable meanwhile, the rows not yet written are put back and
+        the error is raised. Returns the number of rows written.
+        """
+        written = 0
+        # Ranges still to write, the next one last
+        pending = [(0, len(rows))]
+        while pending:
+            start, end = pending.pop()
+            try:
+                self._write(rows[start:end])
+                written += end - start
+            except Exception as e:
+                if is_transient(e):
+                    unwritten = sorted(pending + [(start, end)])
+                    self._requeue([item for first, last in unwritten for item in items[first:last]])
+                    raise
+                if end - start == 1:
+                    self.dropped_total += 1
+                    self.rejected_total += 1
+                    logger.error(f"Dropping {self.name} row the database rejected: {e}; row: {describe_row(rows[start])}")
+                    continue
+                middle = (start + end) // 2
+                pending.extend([(middle, end), (start, middle)])
+        return written
+
+    def flush(self) -> int:
+        """Write every queued row in multi-row inserts. Returns the number written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+                items, rows = self._prepare_batch(batch)
+                if not rows:
+                    continue
+                started = time.monotonic()
+                try:
+                    self._write(rows)
+                    count = len(rows)
+                except Exception as e:
+                    self.flush_errors_total += 1
+                    if is_transient(e):
+                        # Database unreachable: keep the rows for the next flush
+                        self._requeue(items)
+                        raise
+                    logger.warning(f"{self.name} batch of {len(rows)} rows failed, isolating bad rows: {e}")
+                    count = self._write_isolating(items, rows)
+                written += count
+                self.flushed_total += count
+                self.flushes_total += 1
+                self.last_flush_seconds = round(time.monotonic() - started, 4)
+        return written
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self._queue),
+            "max_queue": self.max_queue,
+            "batch_size": self.batch_size,
+            "enqueued_total": self.enqueued_total,
+            "dropped_total": self.dropped_total,
+            "flushed_total": self.flushed_total,
+            "flushes_total": self.flushes_total,
+            "flush_errors_total": self.flush_errors_total,
+            "rejected_total": self.rejected_total,
+            "last_flush_seconds": self.last_flush_seconds
+        }
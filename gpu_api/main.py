@@ -1,5 +1,9 @@
+import os
+from typing import Any, Dict
+
 from fastapi import FastAPI
 from api.routes import router as prediction_router
+from utils.admission import AdmissionController, AdmissionControlMiddleware
 
 # Crear la app de FastAPI
 app = FastAPI(
@@ -8,5 +12,22 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Control de admisión: limita el trabajo concurrente y rechaza con 503 + Retry-After
+admission = AdmissionController(
+    max_concurrency=int(os.getenv("MAX_CONCURRENT_REQUESTS", "4")),
+    max_queue=int(os.getenv("MAX_QUEUED_REQUESTS", "16")),
+    max_queue_wait=float(os.getenv("MAX_QUEUE_WAIT_SECONDS", "30"))
+)
+app.add_middleware(
+    AdmissionControlMiddleware,
+    controller=admission,
+    max_body_bytes=int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+)
+
 # Incluir las rutas definidas en api/routes.py
 app.include_router(prediction_router)
+
+@app.get("/health")
+async def health_check() -> Dict[str, Any]:
+    """Health check con el trabajo en curso, para los balanceadores"""
+    return {"status": "healthy", "load": admission.stats()}
@@ -0,0 +1,199 @@
+"""
+Admission control and load shedding for the crop prediction API.
+
+This is a copy of ``ai_microservice/admission.py``: each service is built
+and deployed from its own directory, so they cannot import a common module.
+The ai_microservice copy is the tested one; change it there first and keep
+this file identical apart from this docstring
+(``ai_microservice/tests/test_admission.py`` fails when the two drift).
+
+``AdmissionController`` caps the number of requests doing work at once and
+the number waiting for a slot. ``AdmissionControlMiddleware`` applies it to
+every request except the exempt paths, and rejects request bodies larger
+than the configured maximum before they are buffered.
+
+Requests that would wait longer than ``max_queue_wait`` (estimated from the
+recent average service time) are shed straight away with ``503`` and a
+``Retry-After`` header, instead of piling up in memory.
+"""
+import asyncio
+import json
+import logging
+import math
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionController:
+    """Concurrency limit with a bounded, deadline-aware wait queue."""
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int,
+        max_queue_wait: float,
+        initial_service_time: float = 1.0,
+        smoothing: float = 0.2
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self.smoothing = smoothing
+        self.avg_service_time = initial_service_time
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def estimated_wait(self) -> float:
+        """Seconds a new request would wait for a slot, given current load."""
+        if self.in_flight < self.max_concurrency:
+            return 0.0
+        return (self.queued + 1) * self.avg_service_time / self.max_concurrency
+
+    def retry_after(self) -> int:
+        """Retry-After value, in whole seconds, for a shed request."""
+        return max(1, math.ceil(self.estimated_wait()))
+
+    async def acquire(self) -> bool:
+        """Wait for a slot. Returns False if the request should be shed."""
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+        else:
+            if self.queued >= self.max_queue or self.estimated_wait() > self.max_queue_wait:
+                self.shed += 1
+                return False
+
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_queue_wait)
+            except asyncio.TimeoutError:
+                self.shed += 1
+                return False
+            finally:
+                self.queued -= 1
+
+        self.in_flight += 1
+        self.admitted += 1
+        return True
+
+    def release(self, service_time: float) -> None:
+        """Free a slot and fold the request's duration into the average."""
+        self.in_flight -= 1
+        self.avg_service_time += self.smoothing * (service_time - self.avg_service_time)
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "estimated_wait_seconds": round(self.estimated_wait(), 3),
+            "avg_service_seconds": round(self.avg_service_time, 3),
+            "admitted_total": self.admitted,
+            "shed_total": self.shed
+        }
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware enforcing an ``AdmissionController`` and a body size limit.
+
+    Bodies are checked against ``Content-Length`` up front and counted as
+    they are received, so chunked uploads are cut off once they pass the
+    limit as well.
+    """
+
+    def __init__(
+        self,
+        app,
+        controller: AdmissionController,
+        max_body_bytes: int,
+        exempt_paths: Iterable[str] = ("/", "/health", "/docs", "/redoc", "/openapi.json")
+    ) -> None:
+        self.app = app
+        self.controller = controller
+        self.max_body_bytes = max_body_bytes
+        self.exempt_paths = frozenset(exempt_paths)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = _header(scope, b"content-length")
+        if content_length is not None and content_length.isdigit() \
+                and int(content_length) > self.max_body_bytes:
+            await _reject(send, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, self._too_large_detail())
+            return
+
+        if not await self.controller.acquire():
+            retry_after = self.controller.retry_after()
+            logger.warning(f"Shedding {scope['path']}: retry after {retry_after}s")
+            await _reject(
+                send,
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "Service overloaded, please retry later",
+                {"retry-after": str(retry_after)}
+            )
+            return
+
+        started = time.monotonic()
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=self._too_large_detail()
+                    )
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except HTTPException as e:
+            # Raised by limited_receive outside of a route's exception handling
+            if response_started:
+                raise
+            await _reject(send, e.status_code, e.detail)
+        finally:
+            self.controller.release(time.monotonic() - started)
+
+    def _too_large_detail(self) -> str:
+        return f"Request body exceeds the maximum size of {self.max_body_bytes} bytes"
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+async def _reject(send, status_code: int, detail: str, headers: Optional[Dict[str, str]] = None) -> None:
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    raw_headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode("latin-1"))
+    ]
+    for key, value in (headers or {}).items():
+        raw_headers.append((key.encode("latin-1"), value.encode("latin-1")))
+    await send({"type": "http.response.start", "status": status_code, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": body})